@@ -1,292 +1,404 @@
 # Import necessary libraries
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+# Heavy dependencies (pandas, sklearn, nltk, matplotlib) are imported inside the
+# stages that need them so that importing this module stays fast and offline.
 import os
-from datetime import datetime
+import argparse
 from io import StringIO
-from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report, confusion_matrix
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import re
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-import base64
-
-# Download all required NLTK data
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('punkt_tab')
-nltk.download('averaged_perceptron_tagger')
-nltk.download('wordnet')
-
-# Define preprocessing function
-def preprocess_text(text):
-    # Convert to lowercase
-    text = str(text).lower()
-    # Remove special characters and digits
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
-    # Simple word splitting
-    tokens = text.split()
-    # Remove stopwords
-    stop_words = set(stopwords.words('english'))
-    tokens = [t for t in tokens if t not in stop_words]
-    return ' '.join(tokens)
-
-# Create results directory if it doesn't exist
-results_dir = 'results'
-if not os.path.exists(results_dir):
-    os.makedirs(results_dir)
-
-# Create a text file for logging results
-log_file = os.path.join(results_dir, 'analysis_results.txt')
-
-# Function to log text output
-def log_result(text, file=log_file):
-    with open(file, 'a') as f:
-        f.write(text + '\n')
-
-# Clear previous results
-with open(log_file, 'w') as f:
-    f.write(f"Analysis Results - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    f.write("="*50 + "\n\n")
-
-# Read the dataset
-df = pd.read_csv('../../input/cyber-security-incidents/incidents.csv')
-
-# 1. Data Preprocessing
-missing_values = df.isnull().sum()
-log_result("Missing values:\n" + missing_values.to_string())
-
-# Basic information about the dataset - Fixed version
-buffer = StringIO()
-df.info(buf=buffer)
-log_result("\nDataset Info:\n" + "".join(buffer.getvalue().splitlines()))
-
-# 2. Calculate average vulnerability type distribution
-vuln_dist = df['Vulnerability Type'].value_counts()
-log_result("\nVulnerability Type Distribution:\n" + vuln_dist.to_string())
-
-# 3. Create visualization for vulnerability types
-plt.figure(figsize=(12, 6))
-sns.barplot(x=vuln_dist.index, y=vuln_dist.values)
-plt.xticks(rotation=45)
-plt.title('Distribution of Vulnerability Types')
-plt.xlabel('Vulnerability Type')
-plt.ylabel('Count')
-plt.tight_layout()
-plt.savefig(os.path.join(results_dir, 'vulnerability_distribution.png'))
-plt.close()
-
-# 4. Time-based analysis
-df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-df['month'] = df['Timestamp'].dt.month
-df['year'] = df['Timestamp'].dt.year
-
-monthly_incidents = df.groupby('month')['ID'].count()
-plt.figure(figsize=(10, 5))
-sns.lineplot(x=monthly_incidents.index, y=monthly_incidents.values)
-plt.title('Number of Incidents by Month')
-plt.xlabel('Month')
-plt.ylabel('Number of Incidents')
-plt.savefig(os.path.join(results_dir, 'monthly_incidents.png'))
-plt.close()
-
-# 5. Label distribution analysis
-label_dist = df['Label'].value_counts()
-log_result("\nLabel Distribution:\n" + label_dist.to_string())
-
-# 6. Correlation analysis
-correlation_matrix = df.select_dtypes(include=[np.number]).corr()
-plt.figure(figsize=(10, 8))
-sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm')
-plt.title('Correlation Matrix')
-plt.tight_layout()
-plt.savefig(os.path.join(results_dir, 'correlation_matrix.png'))
-plt.close()
-
-# 7. Text length analysis
-df['text_length'] = df['Text'].str.len()
-plt.figure(figsize=(10, 6))
-sns.histplot(data=df, x='text_length', bins=50)
-plt.title('Distribution of Text Length')
-plt.xlabel('Text Length')
-plt.ylabel('Count')
-plt.savefig(os.path.join(results_dir, 'text_length_distribution.png'))
-plt.close()
-
-# 8. Vulnerability Type vs Label
-plt.figure(figsize=(12, 6))
-sns.boxplot(data=df, x='Vulnerability Type', y='Label')
-plt.xticks(rotation=45)
-plt.title('Label Distribution by Vulnerability Type')
-plt.tight_layout()
-plt.savefig(os.path.join(results_dir, 'vulnerability_vs_label.png'))
-plt.close()
-
-# Save summary statistics
-summary_stats = df.describe()
-log_result("\nSummary Statistics:\n" + summary_stats.to_string())
-
-# Text preprocessing
-log_result("\nPerforming text preprocessing...")
-df['processed_text'] = df['Text'].apply(preprocess_text)
-
-# TF-IDF Vectorization
-vectorizer = TfidfVectorizer(max_features=1000)
-X = vectorizer.fit_transform(df['processed_text'])
-y = df['Label']
-
-# Split the data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Train model
-log_result("\nTraining Logistic Regression model...")
-model = LogisticRegression(max_iter=1000)
-model.fit(X_train, y_train)
-
-# Model evaluation
-y_pred = model.predict(X_test)
-log_result("\nClassification Report:")
-log_result(classification_report(y_test, y_pred))
-
-# Confusion Matrix visualization
-plt.figure(figsize=(8, 6))
-sns.heatmap(confusion_matrix(y_test, y_pred), annot=True, fmt='d', cmap='Blues')
-plt.title('Confusion Matrix')
-plt.xlabel('Predicted')
-plt.ylabel('Actual')
-plt.savefig(os.path.join(results_dir, 'confusion_matrix.png'))
-plt.close()
-
-# Feature importance analysis
-feature_importance = pd.DataFrame({
-    'feature': vectorizer.get_feature_names_out(),
-    'importance': abs(model.coef_[0])
-})
-feature_importance = feature_importance.sort_values('importance', ascending=False)
-log_result("\nTop 10 Most Important Features:")
-log_result(feature_importance.head(10).to_string())
-
-# Vulnerability type analysis with labels
-vuln_label_dist = pd.crosstab(df['Vulnerability Type'], df['Label'])
-log_result("\nVulnerability Type vs Label Distribution:")
-log_result(vuln_label_dist.to_string())
-
-# Save model and vectorizer
-import joblib
-joblib.dump(model, os.path.join(results_dir, 'model.pkl'))
-joblib.dump(vectorizer, os.path.join(results_dir, 'vectorizer.pkl'))
-
-print(f"Analysis complete. Results saved in {results_dir}/")
-
-# Add this class after the existing imports
-class SecurityAnalysis:
-    def __init__(self):
-        self.results_dir = 'security_results'
+from typing import List, Optional
+from security import SecurityAnalysis
+from profiling import StageProfiler
+
+DEFAULT_INPUT = '../../input/cyber-security-incidents/incidents.csv'
+
+def __getattr__(name):
+    # Preprocessing helpers are re-exported lazily (importing them pulls in pandas)
+    if name in ('preprocess_text', 'TextPreprocessor'):
+        import preprocessing
+        return getattr(preprocessing, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class AnalysisPipeline:
+    """Incident analysis as explicit stages: load, profile, [indicators,] preprocess, vectorize, train, evaluate, export"""
+
+    STAGES = ('load', 'profile', 'preprocess', 'vectorize', 'train', 'evaluate', 'export')
+
+    def __init__(self, input_path: str = DEFAULT_INPUT, results_dir: str = 'results',
+                 plots: Optional[List[str]] = None, plot_workers: Optional[int] = None,
+                 max_features: int = 1000, test_size: float = 0.2, random_state: int = 42,
+                 profiler: Optional[StageProfiler] = None, templates: bool = False, cache=None,
+                 store_dir: Optional[str] = None, start=None, end=None, indicators: bool = False):
+        self.input_path = input_path
+        # A Parquet store from incident_store.py replaces the CSV; start/end select [start, end)
+        self.store_dir = store_dir
+        self.start = start
+        self.end = end
+        self.results_dir = results_dir
+        self.plot_selection = plots
+        self.plot_workers = plot_workers
+        self.max_features = max_features
+        self.test_size = test_size
+        self.random_state = random_state
+        self.profiler = profiler or StageProfiler(results_dir, enabled=False)
+        self.use_templates = templates
+        self.use_indicators = indicators
+        # Optional StageCache; keys[stage] is the content hash of that stage's inputs
+        self.cache = cache
+        self.keys = {}
+
+        self._results = None
+        self._plots = None
+        self.df = None
+        self.aggregates = None
+        self.indicator_index = None
+        self.vectorizer = None
+        self.model = None
+        self.X = None
+        self.y = None
+        self.split = None
+        self.sample_weight = None
+        self.templates = None
+        self.y_pred = None
+
+    @property
+    def results(self):
+        """Buffered results sink, created on first use"""
+        if self._results is None:
+            from results_log import ResultsSink
+            self._results = ResultsSink(self.results_dir)
+        return self._results
+
+    @property
+    def plots(self):
+        """Background plot renderer, created on first use"""
+        if self._plots is None:
+            from plots import PlotRenderer
+            self._plots = PlotRenderer(self.results_dir, self.plot_selection, self.plot_workers)
+        return self._plots
+
+    def log(self, text: str):
+        self.results.log(text)
+
+    def _cached(self, stage: str, compute, params: Optional[dict] = None, upstream=(), files=(), modules=(),
+                code=()):
+        """Run compute, or load its output from the stage cache when none of its inputs changed
+
+        The key covers the source of compute and of any helpers in code, but not the rest of the
+        stage, so editing logging or plots still reuses the cached output.
+        """
+        if self.cache is None or any(name not in self.keys for name in upstream):
+            return compute()
+        self.keys[stage] = self.cache.key(stage, params, [self.keys[name] for name in upstream], files, modules,
+                                          [compute, *code])
+        return self.cache.get_or_compute(stage, self.keys[stage], compute)
+
+    def load(self):
+        """Read the incidents from the CSV, or only the selected time range from the Parquet store"""
         if not os.path.exists(self.results_dir):
             os.makedirs(self.results_dir)
-    
-    def generate_key(self, password: str, salt: bytes = None) -> tuple:
-        """Generate a key using password and salt"""
-        if salt is None:
-            salt = os.urandom(16)
-        
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-            backend=default_backend()
-        )
-        key = kdf.derive(password.encode())
-        return key, salt
-
-    def encrypt_message(self, message: str, key: bytes) -> tuple:
-        """Encrypt a message using AES-CBC"""
-        iv = os.urandom(16)
-        cipher = Cipher(
-            algorithms.AES(key),
-            modes.CBC(iv),
-            backend=default_backend()
-        )
-        encryptor = cipher.encryptor()
-        
-        # Pad the message
-        padded_message = self._pad_message(message.encode())
-        ciphertext = encryptor.update(padded_message) + encryptor.finalize()
-        
-        return base64.b64encode(iv + ciphertext), iv
-
-    def decrypt_message(self, encrypted_message: bytes, key: bytes, iv: bytes) -> str:
-        """Decrypt a message using AES-CBC"""
-        cipher = Cipher(
-            algorithms.AES(key),
-            modes.CBC(iv),
-            backend=default_backend()
-        )
-        decryptor = cipher.decryptor()
-        
-        # Decode and remove IV
-        ciphertext = base64.b64decode(encrypted_message)[16:]
-        padded_plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-        
-        return self._unpad_message(padded_plaintext).decode()
-
-    def _pad_message(self, message: bytes) -> bytes:
-        """Add PKCS7 padding"""
-        padding_length = 16 - (len(message) % 16)
-        padding = bytes([padding_length] * padding_length)
-        return message + padding
-
-    def _unpad_message(self, padded_message: bytes) -> bytes:
-        """Remove PKCS7 padding"""
-        padding_length = padded_message[-1]
-        return padded_message[:-padding_length]
-
-    def test_encryption_workflow(self, message: str, password: str):
-        """Test the complete encryption/decryption workflow"""
-        results = []
-        
-        # Generate key
-        key, salt = self.generate_key(password)
-        results.append(f"Generated key from password with salt: {base64.b64encode(salt).decode()}")
-        
-        # Encrypt message
-        encrypted, iv = self.encrypt_message(message, key)
-        results.append(f"Encrypted message: {encrypted.decode()}")
-        
-        # Decrypt message
-        decrypted = self.decrypt_message(encrypted, key, iv)
-        results.append(f"Decrypted message: {decrypted}")
-        
-        # Save results
-        with open(os.path.join(self.results_dir, 'security_test_results.txt'), 'w') as f:
-            f.write('\n'.join(results))
-        
-        return results
-
-# Add this to the main analysis script
-def run_security_analysis():
+        if self.store_dir:
+            from incident_store import store_files
+            files, modules = store_files(self.store_dir), ['incident_store']
+        else:
+            files, modules = [self.input_path], ['ingest']
+        # Repeated texts are cached as categories, which unpickle far faster than one object per row
+        self.df = self._cached('load', lambda: self._read().astype({'Text': 'category'}),
+                               {'start': self.start, 'end': self.end}, files=files, modules=modules,
+                               code=[self._read])
+        self.df['Text'] = self.df['Text'].astype(object)
+        return self.df
+
+    def _read(self):
+        if self.store_dir:
+            from incident_store import read_store
+            return read_store(self.store_dir, start=self.start, end=self.end)
+        import pandas as pd
+        from ingest import read_incidents
+        df = read_incidents(self.input_path)
+        # The CSV has to be parsed whole before the range can be applied
+        if self.start is not None:
+            df = df[df['Timestamp'] >= pd.Timestamp(self.start)]
+        if self.end is not None:
+            df = df[df['Timestamp'] < pd.Timestamp(self.end)]
+        return df.reset_index(drop=True)
+
+    def profile(self):
+        """Descriptive statistics, distributions and plots"""
+        from ingest import add_derived_columns, IncidentAggregates, PERIODS
+        df = self.df
+
+        # 1. Data Preprocessing
+        missing_values = df.isnull().sum()
+        self.log("Missing values:\n" + missing_values.to_string())
+        self.results.record('distributions', 'missing_values', missing_values)
+
+        # Basic information about the dataset
+        buffer = StringIO()
+        df.info(buf=buffer)
+        self.log("\nDataset Info:\n" + "".join(buffer.getvalue().splitlines()))
+
+        # Derived columns and the small aggregates used for logging and plots
+        add_derived_columns(df)
+        self.aggregates = aggregates = self._cached('profile', lambda: IncidentAggregates.from_frame(df),
+                                                    upstream=['load'], modules=['ingest'])
+
+        # 2. Vulnerability type distribution
+        vuln_dist = aggregates.vulnerability_distribution()
+        self.log("\nVulnerability Type Distribution:\n" + vuln_dist.to_string())
+        self.results.record('distributions', 'vulnerability_type', vuln_dist)
+        self.plots.submit('vulnerability_distribution', vuln_dist)
+
+        # 3. Time-based analysis
+        monthly_incidents = aggregates.monthly_incidents()
+        self.results.record('distributions', 'monthly_incidents', monthly_incidents)
+        self.plots.submit('monthly_incidents', monthly_incidents)
+        # Calendar counts keep years apart, unlike the month-of-year view above
+        for period in PERIODS:
+            counts = aggregates.period_counts(period)
+            if period in ('year', 'month'):
+                self.log(f"\nIncidents per {period.title()}:\n" + counts.to_string())
+            self.results.record_table(f'incidents_per_{period}', counts.to_frame())
+
+        # 4. Label distribution analysis
+        label_dist = aggregates.label_distribution()
+        self.log("\nLabel Distribution:\n" + label_dist.to_string())
+        self.results.record('distributions', 'label', label_dist)
+
+        # 5. Correlation analysis
+        correlation_matrix = aggregates.correlation_matrix()
+        self.results.record('metrics', 'correlation_matrix', correlation_matrix)
+        self.plots.submit('correlation_matrix', correlation_matrix)
+
+        # 6. Text length analysis
+        self.plots.submit('text_length_distribution', aggregates.text_length_histogram())
+
+        # 7. Vulnerability Type vs Label
+        self.plots.submit('vulnerability_vs_label', aggregates.label_box_stats())
+
+        # Save summary statistics
+        summary_stats = df.describe()
+        self.log("\nSummary Statistics:\n" + summary_stats.to_string())
+        self.results.record_table('summary_statistics', summary_stats)
+
+    def indicators(self):
+        """IPs, subnets, ports and paths from the raw text, which preprocessing strips of digits"""
+        from indicators import IndicatorIndex
+        with self.results.timed('indicators'):
+            self.indicator_index = self._cached('indicators', lambda: IndicatorIndex.from_frames([self.df]),
+                                                upstream=['load'], modules=['indicators'])
+            self.indicator_index.save(os.path.join(self.results_dir, 'indicators'))
+        top_sources = self.indicator_index.top_source_ips(5)
+        self.log("\nTop Source IPs per Vulnerability Type:\n" + top_sources.to_string(index=False))
+        self.results.record_table('top_source_ips', top_sources)
+
+    def preprocess(self):
+        """Batch text preprocessing"""
+        from preprocessing import TextPreprocessor
+        self.log("\nPerforming text preprocessing...")
+        with self.results.timed('preprocess'):
+            processed = self._cached('preprocess', lambda: TextPreprocessor().transform(self.df['Text']).astype('category'),
+                                     upstream=['load'], modules=['preprocessing'])
+            self.df['processed_text'] = processed.astype(object)
+
+    def vectorize(self):
+        """TF-IDF vectorization and train/test split"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.model_selection import train_test_split
+        if self.use_templates:
+            return self._vectorize_templates()
+        def fit():
+            vectorizer = TfidfVectorizer(max_features=self.max_features)
+            return vectorizer, vectorizer.fit_transform(self.df['processed_text'])
+        with self.results.timed('vectorize'):
+            self.vectorizer, self.X = self._cached('vectorize', fit, {'max_features': self.max_features},
+                                                   upstream=['preprocess'])
+        self.y = self.df['Label']
+        self.split = train_test_split(self.X, self.y, test_size=self.test_size, random_state=self.random_state)
+
+    def _vectorize_templates(self):
+        """Same split, but the training rows are collapsed into weighted near-duplicate templates"""
+        import numpy as np
+        from sklearn.model_selection import train_test_split
+        from templates import TemplateClusters, weighted_templates, fit_weighted_vectorizer
+        train_rows, test_rows = train_test_split(np.arange(len(self.df)), test_size=self.test_size,
+                                                 random_state=self.random_state)
+        train_df, test_df = self.df.iloc[train_rows], self.df.iloc[test_rows]
+
+        def fit():
+            templates = TemplateClusters()
+            template_ids = templates.fit(train_df['Text'])
+            # The most frequent variant's processed text stands for the whole template
+            representatives = train_df['processed_text'].iloc[templates.representative_rows]
+            weighted = weighted_templates(template_ids, train_df['Label'], representatives)
+            vectorizer = fit_weighted_vectorizer(weighted['text'], weighted['weight'], self.max_features)
+            return templates, weighted, vectorizer, vectorizer.transform(weighted['text'])
+        params = {'templates': True, 'max_features': self.max_features,
+                  'test_size': self.test_size, 'random_state': self.random_state}
+        with self.results.timed('templates'):
+            self.templates, weighted, self.vectorizer, X_train = self._cached(
+                'vectorize', fit, params, upstream=['load', 'preprocess'], modules=['templates'])
+        self.results.record('metrics', 'templates', self.templates.compression())
+        self.log(f"\nTemplates: {len(self.templates.templates)} templates for {len(train_df)} training rows")
+        with self.results.timed('vectorize'):
+            X_test = self.vectorizer.transform(test_df['processed_text'])
+        self.y = self.df['Label']
+        self.sample_weight = weighted['weight'].to_numpy()
+        self.split = [X_train, X_test, weighted['Label'], test_df['Label']]
+
+    def train(self):
+        """Fit the logistic regression classifier"""
+        from sklearn.linear_model import LogisticRegression
+        X_train, _, y_train, _ = self.split
+        self.log("\nTraining Logistic Regression model...")
+        def fit():
+            return LogisticRegression(max_iter=1000).fit(X_train, y_train, sample_weight=self.sample_weight)
+        params = {'test_size': self.test_size, 'random_state': self.random_state}
+        with self.results.timed('train'):
+            self.model = self._cached('train', fit, params, upstream=['vectorize'])
+
+    def evaluate(self):
+        """Classification report, confusion matrix and feature importance"""
+        import pandas as pd
+        from sklearn.metrics import classification_report, confusion_matrix
+        _, X_test, _, y_test = self.split
+        with self.results.timed('evaluate'):
+            self.y_pred = self.model.predict(X_test)
+        self.log("\nClassification Report:")
+        self.log(classification_report(y_test, self.y_pred))
+        self.results.record('metrics', 'classification_report',
+                            classification_report(y_test, self.y_pred, output_dict=True))
+
+        # Confusion Matrix visualization
+        cm = confusion_matrix(y_test, self.y_pred)
+        self.results.record('metrics', 'confusion_matrix', cm)
+        self.plots.submit('confusion_matrix', cm)
+
+        # Feature importance analysis
+        feature_importance = pd.DataFrame({
+            'feature': self.vectorizer.get_feature_names_out(),
+            'importance': abs(self.model.coef_[0])
+        })
+        feature_importance = feature_importance.sort_values('importance', ascending=False)
+        self.log("\nTop 10 Most Important Features:")
+        self.log(feature_importance.head(10).to_string())
+        self.results.set('top_features', feature_importance.head(10).to_dict(orient='records'))
+
+        # Vulnerability type analysis with labels
+        vuln_label_dist = self.aggregates.vulnerability_label_crosstab()
+        self.log("\nVulnerability Type vs Label Distribution:")
+        self.log(vuln_label_dist.to_string())
+        self.results.record_table('vulnerability_label', vuln_label_dist)
+
+    def export(self):
+        """Save the model and vectorizer (pickle and compact formats)"""
+        import joblib
+        from artifacts import export_compact
+        joblib.dump(self.model, os.path.join(self.results_dir, 'model.pkl'))
+        joblib.dump(self.vectorizer, os.path.join(self.results_dir, 'vectorizer.pkl'))
+
+        # Export the compact, memory-mappable copy used by inference workers
+        export_compact(self.model, self.vectorizer, os.path.join(self.results_dir, 'compact'))
+        if self.templates is not None:
+            # Lets serve.py short-circuit repeated templates
+            self.templates.save(os.path.join(self.results_dir, 'templates.joblib'))
+
+    def finish_plots(self):
+        """Wait for the plot workers to finish"""
+        with self.results.timed('plots'):
+            self.plots.close()
+
+    def run(self, stages=None, security: bool = True) -> dict:
+        """Run the given stages (default: STAGES, plus indicators if enabled) in order and write all buffered results"""
+        if stages is None:
+            stages = self.STAGES
+            if self.use_indicators:
+                # Indicators need the raw text, so they run before preprocessing
+                stages = stages[:2] + ('indicators',) + stages[2:]
+        for stage in stages:
+            with self.profiler.stage(stage):
+                getattr(self, stage)()
+        with self.profiler.stage('plots'):
+            self.finish_plots()
+        if security:
+            with self.profiler.stage('security'):
+                run_security_analysis(self.results)
+        if self.cache is not None:
+            self.results.record('metrics', 'stage_cache', self.cache.stats)
+        paths = self.results.flush()
+        profile_path = self.profiler.write()
+        if profile_path:
+            paths['profile'] = profile_path
+        return paths
+
+def run_security_analysis(results=None) -> list:
+    """Run the encryption workflow test, logging into the results sink if given"""
     security = SecurityAnalysis()
-    
+
     # Test the encryption workflow
     test_message = "This is a test message for encryption"
     test_password = "secure_password123"
-    
-    results = security.test_encryption_workflow(test_message, test_password)
-    
-    # Log security analysis results
-    log_result("\nSecurity Analysis Results:")
-    for result in results:
-        log_result(result)
 
-# Add this at the end of your main script
-run_security_analysis() 
\ No newline at end of file
+    security_results = security.test_encryption_workflow(test_message, test_password)
+
+    # Log security analysis results
+    if results is not None:
+        results.log("\nSecurity Analysis Results:")
+        for result in security_results:
+            results.log(result)
+        results.record('security', 'encryption_workflow', security_results)
+    return security_results
+
+def main(argv=None):
+    from plots import PLOTS, parse_plot_selection
+    parser = argparse.ArgumentParser(description='Incident analysis and classifier training')
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--plots', default='all',
+                        help="'all', 'none' or a comma-separated list of: " + ', '.join(PLOTS))
+    parser.add_argument('--plot-workers', type=int, default=None, help='Processes used to render plots')
+    parser.add_argument('--stream', action='store_true',
+                        help='Only run the chunked descriptive analysis (bounded memory)')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--offline', action='store_true', help='Never download NLTK resources')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record wall/CPU time and peak memory per stage in stage_profile.json')
+    parser.add_argument('--tracemalloc', action='store_true', help='With --profile, also trace Python allocations')
+    parser.add_argument('--cprofile', action='store_true', help='With --profile, dump cProfile stats per stage')
+    parser.add_argument('--templates', action='store_true',
+                        help='Train on weighted near-duplicate templates instead of every row')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Reuse stage outputs (data, processed text, TF-IDF, model) whose inputs are unchanged')
+    parser.add_argument('--indicators', action='store_true',
+                        help='Extract IPs, subnets, ports and paths into results/indicators')
+    parser.add_argument('--store', default=None,
+                        help='Load from a Parquet store written by incident_store.py instead of --input')
+    parser.add_argument('--start', default=None, help='Only analyse incidents at or after this time')
+    parser.add_argument('--end', default=None, help='Only analyse incidents before this time')
+    parser.add_argument('--cache-max-mb', type=int, default=2048, help='Evict least recently used entries above this')
+    args = parser.parse_args(argv)
+    try:
+        plots = parse_plot_selection(args.plots)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from preprocessing import ensure_nltk_resources
+    ensure_nltk_resources(download=not args.offline)
+
+    if args.stream:
+        from ingest import run_streaming_analysis
+        run_streaming_analysis(args.input, args.results_dir, args.chunksize)
+    else:
+        profiler = StageProfiler(args.results_dir, enabled=args.profile,
+                                 trace_memory=args.tracemalloc, cprofile=args.cprofile)
+        cache = None
+        if args.cache_dir:
+            from stage_cache import StageCache
+            cache = StageCache(args.cache_dir, args.cache_max_mb * 2 ** 20)
+        pipeline = AnalysisPipeline(args.input, args.results_dir, plots,
+                                    args.plot_workers, profiler=profiler, templates=args.templates, cache=cache,
+                                    store_dir=args.store, start=args.start, end=args.end,
+                                    indicators=args.indicators)
+        pipeline.run()
+    print(f"Analysis complete. Results saved in {args.results_dir}/")
+
+if __name__ == "__main__":
+    main()
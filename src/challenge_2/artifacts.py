@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import mmap
+import time
+import bisect
+import argparse
+import multiprocessing
+from collections import Counter
+from typing import List
+import numpy as np
+import scipy.sparse as sp
+
+FORMAT_VERSION = 1
+
+def export_compact(model, vectorizer, output_dir: str) -> str:
+    """Write a fitted TfidfVectorizer + linear model as raw arrays and a sorted string table"""
+    params = vectorizer.get_params()
+    if params['analyzer'] != 'word' or tuple(params['ngram_range']) != (1, 1):
+        raise ValueError('Compact export only supports word unigram vectorizers')
+    if params['preprocessor'] is not None or params['tokenizer'] is not None or params['strip_accents']:
+        raise ValueError('Compact export does not support custom preprocessors, tokenizers or accent stripping')
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Sort by UTF-8 bytes so the loader can binary search the raw table
+    vocabulary = sorted((term.encode('utf-8'), column) for term, column in vectorizer.vocabulary_.items())
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(term) for term, _ in vocabulary])
+    with open(os.path.join(output_dir, 'terms.bin'), 'wb') as f:
+        f.write(b''.join(term for term, _ in vocabulary))
+    np.save(os.path.join(output_dir, 'term_offsets.npy'), offsets)
+    np.save(os.path.join(output_dir, 'term_columns.npy'),
+            np.array([column for _, column in vocabulary], dtype=np.int32))
+
+    idf = vectorizer.idf_ if params['use_idf'] else np.ones(len(vocabulary))
+    np.save(os.path.join(output_dir, 'idf.npy'), np.ascontiguousarray(idf, dtype=np.float64))
+    np.save(os.path.join(output_dir, 'coef.npy'), np.ascontiguousarray(model.coef_, dtype=np.float64))
+    np.save(os.path.join(output_dir, 'intercept.npy'), np.ascontiguousarray(model.intercept_, dtype=np.float64))
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'n_features': len(vocabulary),
+        'classes': [c.item() if hasattr(c, 'item') else c for c in model.classes_],
+        'lowercase': params['lowercase'],
+        'token_pattern': params['token_pattern'],
+        'binary': params['binary'],
+        'norm': params['norm'],
+        'sublinear_tf': params['sublinear_tf'],
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return output_dir
+
+class _TermTable:
+    """Sequence view over the memory-mapped sorted string table"""
+
+    def __init__(self, data, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+class CompactClassifier:
+    """Loader for export_compact output; acts as both vectorizer and model"""
+
+    def __init__(self, artifact_dir: str, mmap_arrays: bool = True):
+        with open(os.path.join(artifact_dir, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format {self.manifest['format_version']}")
+
+        mode = 'r' if mmap_arrays else None
+        load = lambda name: np.load(os.path.join(artifact_dir, name), mmap_mode=mode)
+        self.idf_ = load('idf.npy')
+        self.coef_ = load('coef.npy')
+        self.intercept_ = load('intercept.npy')
+        self.term_columns = load('term_columns.npy')
+        offsets = load('term_offsets.npy')
+
+        terms_path = os.path.join(artifact_dir, 'terms.bin')
+        if os.path.getsize(terms_path) == 0:
+            terms = b''
+        elif mmap_arrays:
+            with open(terms_path, 'rb') as f:
+                terms = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with open(terms_path, 'rb') as f:
+                terms = f.read()
+        self.terms = _TermTable(terms, offsets)
+
+        self.classes_ = np.array(self.manifest['classes'])
+        self.token_pattern = re.compile(self.manifest['token_pattern'])
+
+    def lookup(self, term: str) -> int:
+        """Column index of a term, or -1 when it is not in the vocabulary"""
+        key = term.encode('utf-8')
+        position = bisect.bisect_left(self.terms, key)
+        if position < len(self.terms) and self.terms[position] == key:
+            return int(self.term_columns[position])
+        return -1
+
+    def transform(self, texts) -> sp.csr_matrix:
+        """TF-IDF features matching TfidfVectorizer.transform"""
+        columns_cache = {}
+        indptr, indices, values = [0], [], []
+        for text in texts:
+            text = str(text)
+            if self.manifest['lowercase']:
+                text = text.lower()
+            counts = Counter(self.token_pattern.findall(text))
+            row = {}
+            for term, count in counts.items():
+                column = columns_cache.get(term)
+                if column is None:
+                    column = columns_cache[term] = self.lookup(term)
+                if column >= 0:
+                    row[column] = count
+            indices.extend(row.keys())
+            values.extend(row.values())
+            indptr.append(len(indices))
+
+        X = sp.csr_matrix((np.array(values, dtype=np.float64), np.array(indices, dtype=np.int32),
+                           np.array(indptr, dtype=np.int64)), shape=(len(indptr) - 1, self.manifest['n_features']))
+        if self.manifest['binary']:
+            X.data[:] = 1.0
+        if self.manifest['sublinear_tf']:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        X = X @ sp.diags(np.asarray(self.idf_))
+        if self.manifest['norm'] == 'l2':
+            norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        elif self.manifest['norm'] == 'l1':
+            norms = np.asarray(abs(X).sum(axis=1)).ravel()
+        else:
+            return X.tocsr()
+        norms[norms == 0] = 1.0
+        return (sp.diags(1.0 / norms) @ X).tocsr()
+
+    def decision_function(self, X) -> np.ndarray:
+        scores = X @ np.asarray(self.coef_).T + np.asarray(self.intercept_)
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities matching LogisticRegression.predict_proba"""
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return np.column_stack([1.0 - positive, positive])
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp_scores = np.exp(scores)
+        return exp_scores / exp_scores.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+def _memory_mb(process) -> dict:
+    """RSS and (on Linux) proportional set size, which splits shared pages between processes"""
+    info = process.memory_full_info()
+    return {'rss_mb': info.rss / 2 ** 20, 'pss_mb': getattr(info, 'pss', info.rss) / 2 ** 20}
+
+def _load_worker(kind: str, results_dir: str, compact_dir: str, texts: List[str], barrier, queue):
+    """Load artifacts in a fresh process, predict once, then report memory while all workers are alive"""
+    import psutil
+    process = psutil.Process()
+    baseline = _memory_mb(process)
+    start = time.perf_counter()
+    if kind == 'pickle':
+        import joblib
+        model = joblib.load(os.path.join(results_dir, 'model.pkl'))
+        vectorizer = joblib.load(os.path.join(results_dir, 'vectorizer.pkl'))
+    else:
+        model = vectorizer = CompactClassifier(compact_dir)
+    load_seconds = time.perf_counter() - start
+    model.predict(vectorizer.transform(texts))
+    first_prediction_seconds = time.perf_counter() - start
+
+    barrier.wait()
+    memory = _memory_mb(process)
+    queue.put({
+        'load_seconds': load_seconds,
+        'first_prediction_seconds': first_prediction_seconds,
+        'rss_mb': memory['rss_mb'] - baseline['rss_mb'],
+        'pss_mb': memory['pss_mb'] - baseline['pss_mb'],
+    })
+    barrier.wait()
+
+def benchmark_loading(results_dir: str = 'results', compact_dir: str = None, workers: int = 4) -> dict:
+    """Compare cold start and per-worker memory of the pickle and compact artifacts"""
+    compact_dir = compact_dir or os.path.join(results_dir, 'compact')
+    texts = ['Unauthorized login attempt detected from server', 'Standard GET request on port']
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for kind in ('pickle', 'compact'):
+        barrier = context.Barrier(workers)
+        queue = context.Queue()
+        processes = [
+            context.Process(target=_load_worker, args=(kind, results_dir, compact_dir, texts, barrier, queue))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        samples = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        results[kind] = {key: float(np.mean([s[key] for s in samples])) for key in samples[0]}
+        results[kind]['workers'] = workers
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the classifier in the compact format and benchmark loading')
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--compact-dir', default=None)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--export', action='store_true', help='Re-export from model.pkl/vectorizer.pkl first')
+    args = parser.parse_args()
+
+    compact_dir = args.compact_dir or os.path.join(args.results_dir, 'compact')
+    if args.export or not os.path.exists(os.path.join(compact_dir, 'manifest.json')):
+        import joblib
+        model = joblib.load(os.path.join(args.results_dir, 'model.pkl'))
+        vectorizer = joblib.load(os.path.join(args.results_dir, 'vectorizer.pkl'))
+        export_compact(model, vectorizer, compact_dir)
+        print(f"Exported compact artifacts to {compact_dir}/")
+
+    results = benchmark_loading(args.results_dir, compact_dir, args.workers)
+    for kind, stats in results.items():
+        print(f"{kind}: " + ', '.join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}"
+                                      for k, v in stats.items()))
+
+if __name__ == "__main__":
+    main()
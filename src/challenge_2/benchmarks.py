@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tempfile
+from datetime import datetime
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import pandas as pd
+from ingest import DEFAULT_INPUT, iter_incident_chunks, peak_rss_mb
+from preprocessing import TextPreprocessor
+
+# Named benchmark scales -> number of synthetic rows
+SCALES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+# Scratch location for generated datasets (ignored by git; they can be millions of rows)
+DEFAULT_DATA_DIR = 'results/benchmarks/data'
+
+def _record(seconds: float, rows: int, **extra) -> dict:
+    record = {'seconds': seconds, 'rows': rows,
+              'rows_per_second': rows / seconds if seconds > 0 else None,
+              'max_rss_mb': peak_rss_mb()}
+    record.update(extra)
+    return record
+
+def synthetic_dataset(scale: str, data_dir: str = DEFAULT_DATA_DIR, source: str = DEFAULT_INPUT,
+                      seed: int = 42) -> tuple:
+    """Return (path, generation seconds) of the cached synthetic file for a scale, generating it if needed"""
+    from synthetic import IncidentProfile, write_synthetic_csv
+    path = os.path.join(data_dir, f'incidents_{scale}_seed{seed}.csv')
+    if os.path.exists(path):
+        return path, None
+    start = time.perf_counter()
+    write_synthetic_csv(path, SCALES[scale], IncidentProfile.from_csv(source), seed=seed)
+    return path, time.perf_counter() - start
+
+def bench_preprocess(path: str, chunksize: int, batch_rows: int) -> tuple:
+    """Stream the file through ingest + preprocessing, keeping the first batch_rows for the batch model"""
+    preprocessor = TextPreprocessor()
+    kept, rows = [], 0
+    start = time.perf_counter()
+    for chunk in iter_incident_chunks(path, chunksize=chunksize, preprocessor=preprocessor,
+                                      usecols=['ID', 'Text', 'Label']):
+        if rows < batch_rows:
+            kept.append(chunk[['processed_text', 'Label']].head(batch_rows - rows))
+        rows += len(chunk)
+    record = _record(time.perf_counter() - start, rows,
+                     memo_hits=preprocessor.hits, memo_misses=preprocessor.misses)
+    return record, pd.concat(kept, ignore_index=True)
+
+def bench_batch_model(sample: pd.DataFrame, total_rows: int) -> dict:
+    """TF-IDF + LogisticRegression as in analysis.py, on at most batch_rows rows"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    records = {}
+    capped = {'capped': len(sample) < total_rows}
+
+    start = time.perf_counter()
+    vectorizer = TfidfVectorizer(max_features=1000)
+    X = vectorizer.fit_transform(sample['processed_text'])
+    records['vectorize'] = _record(time.perf_counter() - start, len(sample), **capped)
+
+    start = time.perf_counter()
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X, sample['Label'])
+    records['train'] = _record(time.perf_counter() - start, len(sample), **capped)
+
+    # Inference includes vectorizing, as a serving request would
+    start = time.perf_counter()
+    model.predict(vectorizer.transform(sample['processed_text']))
+    records['inference'] = _record(time.perf_counter() - start, len(sample), **capped)
+    return records
+
+def bench_incremental(path: str, chunksize: int, rows: int) -> dict:
+    """Two-pass out-of-core training and evaluation over the whole file"""
+    from incremental import IncrementalTrainer
+    with tempfile.TemporaryDirectory() as results_dir:
+        trainer = IncrementalTrainer(results_dir)
+        start = time.perf_counter()
+        trainer.run(path, chunksize)
+        return _record(time.perf_counter() - start, rows)
+
+def bench_crypto(texts: List[str], workflow_rows: int = 100) -> dict:
+    """SecurityAnalysis crypto: per-message path (KDF per record) against the cached-key bulk API"""
+    from security import SecurityAnalysis
+    security = SecurityAnalysis()
+    password = 'benchmark_password'
+    records = {}
+
+    start = time.perf_counter()
+    key, salt = security.generate_key(password)
+    records['crypto_kdf'] = _record(time.perf_counter() - start, 1)
+
+    # What test_encryption_workflow does for every message; slow, so only a sample
+    sample = texts[:workflow_rows]
+    start = time.perf_counter()
+    for text in sample:
+        message_key, _ = security.generate_key(password)
+        encrypted, iv = security.encrypt_message(text, message_key)
+        security.decrypt_message(encrypted, message_key, iv)
+    records['crypto_per_message'] = _record(time.perf_counter() - start, len(sample))
+
+    start = time.perf_counter()
+    encrypted = [security.encrypt_message(text, key) for text in texts]
+    records['crypto_encrypt'] = _record(time.perf_counter() - start, len(texts))
+
+    start = time.perf_counter()
+    for message, iv in encrypted:
+        security.decrypt_message(message, key, iv)
+    records['crypto_decrypt'] = _record(time.perf_counter() - start, len(texts))
+
+    start = time.perf_counter()
+    encrypted, salt = security.encrypt_records(texts, password, salt)
+    records['crypto_bulk_encrypt'] = _record(time.perf_counter() - start, len(texts))
+
+    start = time.perf_counter()
+    security.decrypt_records(encrypted, password, salt)
+    records['crypto_bulk_decrypt'] = _record(time.perf_counter() - start, len(texts))
+    security.clear_key_cache()
+    return records
+
+def bench_field_crypto(path: str, rows: int, workers: Optional[int], chunksize: int) -> dict:
+    """Parallel Text-column encryption of the whole file to Parquet and back"""
+    from field_crypto import encrypt_file, decrypt_file
+    workers = workers or os.cpu_count() or 1
+    records = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        encrypted_path = os.path.join(tmp_dir, 'encrypted.parquet')
+        start = time.perf_counter()
+        encrypt_file(path, encrypted_path, 'benchmark_password', workers=workers, chunksize=chunksize)
+        records['field_encrypt'] = _record(time.perf_counter() - start, rows, workers=workers)
+
+        start = time.perf_counter()
+        decrypt_file(encrypted_path, os.path.join(tmp_dir, 'decrypted.csv'), 'benchmark_password',
+                     workers=workers, chunksize=chunksize)
+        records['field_decrypt'] = _record(time.perf_counter() - start, rows, workers=workers)
+    return records
+
+def bench_stream_crypto(path: str, rows: int) -> dict:
+    """Chunked AES-GCM encryption of the raw file, reported in MB/s"""
+    import stream_crypto
+    size_mb = os.path.getsize(path) / 2 ** 20
+    records = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        encrypted_path = os.path.join(tmp_dir, 'incidents.enc')
+        start = time.perf_counter()
+        stream_crypto.encrypt_file(path, encrypted_path, 'benchmark_password')
+        seconds = time.perf_counter() - start
+        records['stream_encrypt'] = _record(seconds, rows, megabytes=size_mb, mb_per_second=size_mb / seconds)
+
+        start = time.perf_counter()
+        stream_crypto.decrypt_file(encrypted_path, os.path.join(tmp_dir, 'incidents.csv'), 'benchmark_password')
+        seconds = time.perf_counter() - start
+        records['stream_decrypt'] = _record(seconds, rows, megabytes=size_mb, mb_per_second=size_mb / seconds)
+    return records
+
+def bench_templates(path: str, batch_rows: int) -> dict:
+    """Row-level against template-weighted training and cached inference on the first batch_rows rows"""
+    import templates
+    df = pd.read_csv(path, usecols=['Text', 'Label'], nrows=batch_rows)
+    start = time.perf_counter()
+    result = templates.benchmark(df)
+    result['training_rows'] = result.pop('rows')
+    return {'templates': _record(time.perf_counter() - start, len(df), **result)}
+
+def run_scale(path: str, chunksize: int = 100000, batch_rows: int = 1000000,
+              crypto_rows: int = 10000, crypto_workers: Optional[int] = None) -> dict:
+    """Run every stage against one file; meant to run in a fresh process so peak RSS is per scale"""
+    stages = {}
+    stages['preprocess'], sample = bench_preprocess(path, chunksize, batch_rows)
+    rows = stages['preprocess']['rows']
+    stages.update(bench_batch_model(sample, rows))
+    stages['incremental'] = bench_incremental(path, chunksize, rows)
+    stages.update(bench_templates(path, batch_rows))
+
+    texts = pd.read_csv(path, usecols=['Text'], nrows=crypto_rows)['Text'].astype(str).tolist()
+    stages.update(bench_crypto(texts))
+    stages.update(bench_field_crypto(path, rows, crypto_workers, chunksize))
+    stages.update(bench_stream_crypto(path, rows))
+    return {'rows': rows, 'stages': stages, 'max_rss_mb': peak_rss_mb()}
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _versions() -> dict:
+    import numpy, sklearn, cryptography
+    return {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': numpy.__version__,
+            'scikit-learn': sklearn.__version__, 'cryptography': cryptography.__version__}
+
+def run_benchmarks(scales: List[str], data_dir: str = DEFAULT_DATA_DIR, results_dir: str = 'results/benchmarks',
+                   chunksize: int = 100000, batch_rows: int = 1000000, crypto_rows: int = 10000,
+                   seed: int = 42, crypto_workers: Optional[int] = None) -> str:
+    """Benchmark each scale in its own process and write a JSON report"""
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'versions': _versions(),
+        'host': {'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'settings': {'chunksize': chunksize, 'batch_rows': batch_rows,
+                     'crypto_rows': crypto_rows, 'crypto_workers': crypto_workers, 'seed': seed},
+        'scales': {},
+    }
+    for scale in scales:
+        path, generation_seconds = synthetic_dataset(scale, data_dir, seed=seed)
+        print(f"⏱️  Benchmarking {scale} ({SCALES[scale]} rows)...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            result = executor.submit(run_scale, path, chunksize, batch_rows, crypto_rows,
+                                     crypto_workers).result()
+        result['generation_seconds'] = generation_seconds
+        report['scales'][scale] = result
+        for stage, record in result['stages'].items():
+            rate = record['rows_per_second']
+            line = f"   {stage:<20} {record['seconds']:9.3f}s  {rate or 0:>14,.0f} rows/s"
+            if 'mb_per_second' in record:
+                line += f"  {record['mb_per_second']:8.1f} MB/s"
+            print(line)
+        print(f"   peak RSS {result['max_rss_mb']:.1f} MB")
+
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def compare_reports(baseline_path: str, current_path: str) -> pd.DataFrame:
+    """Throughput and memory of two reports side by side, per scale and stage"""
+    reports = []
+    for path in (baseline_path, current_path):
+        with open(path) as f:
+            reports.append(json.load(f))
+    rows = []
+    for scale, current in reports[1]['scales'].items():
+        baseline = reports[0]['scales'].get(scale)
+        if baseline is None:
+            continue
+        for stage, record in current['stages'].items():
+            before = baseline['stages'].get(stage)
+            if before is None:
+                continue
+            rows.append({
+                'scale': scale, 'stage': stage,
+                'baseline_rows_per_second': before['rows_per_second'],
+                'current_rows_per_second': record['rows_per_second'],
+                'speedup': (record['rows_per_second'] / before['rows_per_second']
+                            if before['rows_per_second'] and record['rows_per_second'] else None),
+                'baseline_max_rss_mb': before['max_rss_mb'],
+                'current_max_rss_mb': record['max_rss_mb'],
+            })
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic incidents')
+    parser.add_argument('--scales', default='10k', help=f"Comma-separated list of: {', '.join(SCALES)}")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated datasets are cached')
+    parser.add_argument('--results-dir', default='results/benchmarks')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--batch-rows', type=int, default=1000000,
+                        help='Row cap for the in-memory TF-IDF/LogisticRegression stages')
+    parser.add_argument('--crypto-rows', type=int, default=10000)
+    parser.add_argument('--crypto-workers', type=int, default=None,
+                        help='Processes for field-level encryption (default: all cores)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare the new report against an earlier one')
+    args = parser.parse_args()
+
+    scales = [scale.strip().lower() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {', '.join(unknown)}")
+
+    path = run_benchmarks(scales, args.data_dir, args.results_dir, args.chunksize,
+                          args.batch_rows, args.crypto_rows, args.seed, args.crypto_workers)
+    print(f"✅ Benchmark report saved to {path}")
+    if args.compare:
+        print(compare_reports(args.compare, path).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import os
+import json
+import base64
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence
+import pandas as pd
+from ingest import DEFAULT_INPUT, INCIDENT_DTYPES
+from security import SecurityAnalysis
+
+# Stored next to the encrypted columns so the file can be decrypted with just the password
+METADATA_KEY = b'incident_field_encryption'
+ENCRYPTED_COLUMNS = ['Text']
+
+# Per-worker state, set once by the pool initializer so keys are not re-sent with every shard
+_worker_security = None
+_worker_key = None
+
+def _init_worker(key: bytes):
+    global _worker_security, _worker_key
+    _worker_security = SecurityAnalysis()
+    _worker_key = key
+
+def _encrypt_shard(values: list, key: Optional[bytes] = None) -> tuple:
+    """Encrypt one shard of a column as text; nulls stay null"""
+    security = _worker_security or SecurityAnalysis()
+    key = key or _worker_key
+    present = [i for i, value in enumerate(values) if not pd.isna(value)]
+    ivs, ciphertexts = [None] * len(values), [None] * len(values)
+    for i, (iv, ciphertext) in zip(present, security.iter_encrypt_raw((str(values[i]) for i in present), key)):
+        ivs[i], ciphertexts[i] = iv, ciphertext
+    return ivs, ciphertexts
+
+def _decrypt_shard(ivs: list, ciphertexts: list, key: Optional[bytes] = None) -> list:
+    security = _worker_security or SecurityAnalysis()
+    key = key or _worker_key
+    # Null IVs come back as None or NaN depending on the file format
+    present = [i for i, iv in enumerate(ivs) if not pd.isna(iv)]
+    values = [None] * len(ivs)
+    pairs = ((ivs[i], ciphertexts[i]) for i in present)
+    for i, value in zip(present, security.iter_decrypt_raw(pairs, key)):
+        values[i] = value
+    return values
+
+def _restore_dtype(values: list, dtype: Optional[str], index: pd.Index) -> pd.Series:
+    """Turn decrypted text back into the column's original dtype"""
+    series = pd.Series(values, index=index, dtype=object)
+    if dtype is None or dtype in ('object', 'str'):
+        return series
+    if dtype == 'bool':
+        return series.map({'True': True, 'False': False})
+    return series.astype(dtype)
+
+class FieldEncryptor:
+    """Encrypts selected DataFrame columns into binary <col>_iv / <col>_ciphertext columns across a process pool"""
+
+    def __init__(self, password: str, salt: bytes = None, columns: Sequence[str] = ENCRYPTED_COLUMNS,
+                 workers: Optional[int] = None, shard_size: int = 20000, dtypes: Optional[dict] = None):
+        self.security = SecurityAnalysis()
+        self.salt = salt or os.urandom(16)
+        # One KDF run for the whole dataset; workers receive the derived key once
+        self.key = bytes(self.security.derive_key(password, self.salt))
+        self.columns = list(columns)
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        # Source dtype per column, filled by encrypt_frame and read back from the metadata on decrypt
+        self.dtypes = dict(dtypes or {})
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.security.clear_key_cache()
+
+    def metadata(self) -> dict:
+        return {'cipher': 'AES-256-CBC', 'kdf': 'PBKDF2-HMAC-SHA256', 'kdf_iterations': 100000,
+                'salt': base64.b64encode(self.salt).decode(), 'columns': self.columns, 'dtypes': self.dtypes}
+
+    def _shards(self, n_rows: int) -> List[slice]:
+        return [slice(start, start + self.shard_size) for start in range(0, n_rows, self.shard_size)]
+
+    def _parallel(self, n_rows: int) -> bool:
+        if self.workers <= 1 or n_rows <= self.shard_size:
+            return False
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                initargs=(self.key,))
+        return True
+
+    def encrypt_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Return a copy of df with each selected column replaced by binary IV and ciphertext columns"""
+        encrypted = df.copy()
+        for column in self.columns:
+            self.dtypes.setdefault(column, str(df[column].dtype))
+            values = df[column].astype(object).tolist()
+            if self._parallel(len(values)):
+                shards = [values[s] for s in self._shards(len(values))]
+                results = list(self.executor.map(_encrypt_shard, shards))
+            else:
+                results = [_encrypt_shard(values, self.key)]
+            position = encrypted.columns.get_loc(column)
+            encrypted = encrypted.drop(columns=column)
+            encrypted.insert(position, f'{column}_iv', [iv for ivs, _ in results for iv in ivs])
+            encrypted.insert(position + 1, f'{column}_ciphertext', [c for _, cts in results for c in cts])
+        return encrypted
+
+    def decrypt_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Inverse of encrypt_frame"""
+        decrypted = df.copy()
+        for column in self.columns:
+            ivs = df[f'{column}_iv'].tolist()
+            ciphertexts = df[f'{column}_ciphertext'].tolist()
+            if self._parallel(len(ivs)):
+                shards = self._shards(len(ivs))
+                results = self.executor.map(_decrypt_shard, [ivs[s] for s in shards],
+                                            [ciphertexts[s] for s in shards])
+                values = [value for shard in results for value in shard]
+            else:
+                values = _decrypt_shard(ivs, ciphertexts, self.key)
+            position = decrypted.columns.get_loc(f'{column}_iv')
+            decrypted = decrypted.drop(columns=[f'{column}_iv', f'{column}_ciphertext'])
+            decrypted.insert(position, column, _restore_dtype(values, self.dtypes.get(column), df.index))
+        return decrypted
+
+    def encrypt_chunks(self, chunks) -> Iterator[pd.DataFrame]:
+        """Encrypt a stream of DataFrame chunks, reusing one process pool"""
+        for chunk in chunks:
+            yield self.encrypt_frame(chunk)
+
+    def decrypt_chunks(self, chunks) -> Iterator[pd.DataFrame]:
+        for chunk in chunks:
+            yield self.decrypt_frame(chunk)
+
+def _is_parquet(path: str) -> bool:
+    return path.endswith('.parquet')
+
+def _csv_metadata_path(path: str) -> str:
+    return path + '.meta.json'
+
+def _to_hex(frame: pd.DataFrame, columns: list) -> pd.DataFrame:
+    # CSV has no binary type, so binary columns are written as hex
+    frame = frame.copy()
+    for column in columns:
+        frame[column] = [value.hex() if value is not None else None for value in frame[column]]
+    return frame
+
+def _from_hex(frame: pd.DataFrame, columns: list) -> pd.DataFrame:
+    for column in columns:
+        frame[column] = [bytes.fromhex(value) if isinstance(value, str) else None for value in frame[column]]
+    return frame
+
+def _binary_columns(columns: list) -> list:
+    return [f'{column}{suffix}' for column in columns for suffix in ('_iv', '_ciphertext')]
+
+class _ChunkWriter:
+    """Appends DataFrame chunks to a Parquet (single schema) or CSV file"""
+
+    def __init__(self, path: str, metadata: Optional[dict] = None, binary_columns: Sequence[str] = ()):
+        self.path = path
+        self.metadata = metadata
+        self.binary_columns = list(binary_columns)
+        self.writer = None
+        self.schema = None
+        self.rows = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def write(self, frame: pd.DataFrame):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self.writer is None:
+                schema = pa.Schema.from_pandas(frame, preserve_index=False)
+                # An all-null column in the first chunk must not pin the type to null
+                for i, field in enumerate(schema):
+                    if field.name in self.binary_columns:
+                        schema = schema.set(i, field.with_type(pa.binary()))
+                    elif pa.types.is_null(field.type):
+                        schema = schema.set(i, field.with_type(pa.string()))
+                if self.metadata is not None:
+                    schema = schema.with_metadata({**(schema.metadata or {}),
+                                                   METADATA_KEY: json.dumps(self.metadata).encode()})
+                self.schema = schema
+                self.writer = pq.ParquetWriter(self.path, schema)
+            self.writer.write_table(pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+        else:
+            if self.binary_columns:
+                frame = _to_hex(frame, self.binary_columns)
+            frame.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+            if self.rows == 0 and self.metadata is not None:
+                with open(_csv_metadata_path(self.path), 'w') as f:
+                    json.dump(self.metadata, f, indent=2)
+        self.rows += len(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def read_encryption_metadata(path: str) -> dict:
+    """Salt and column list of an encrypted file"""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(path).metadata or {}
+        if METADATA_KEY not in metadata:
+            raise ValueError(f"{path} has no field encryption metadata")
+        return json.loads(metadata[METADATA_KEY])
+    with open(_csv_metadata_path(path)) as f:
+        return json.load(f)
+
+def _iter_encrypted_chunks(path: str, chunksize: int, binary_columns: list) -> Iterator[pd.DataFrame]:
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype={c: object for c in binary_columns}):
+            yield _from_hex(chunk, binary_columns)
+
+def encrypt_file(input_path: str, output_path: str, password: str, columns: Sequence[str] = ENCRYPTED_COLUMNS,
+                 workers: Optional[int] = None, chunksize: int = 500000) -> int:
+    """Stream an incident CSV into an encrypted Parquet (or hex CSV) file; returns the row count"""
+    # Per-chunk categories would differ between chunks, and an all-null first chunk must not read as float
+    dtypes = {**INCIDENT_DTYPES, 'Vulnerability Type': 'object'}
+    with FieldEncryptor(password, columns=columns, workers=workers) as encryptor:
+        # metadata()['dtypes'] is filled in by the first encrypted chunk, before the writer stores it
+        writer = _ChunkWriter(output_path, encryptor.metadata(), _binary_columns(encryptor.columns))
+        try:
+            for chunk in encryptor.encrypt_chunks(pd.read_csv(input_path, chunksize=chunksize, dtype=dtypes)):
+                writer.write(chunk)
+        finally:
+            writer.close()
+    return writer.rows
+
+def decrypt_file(input_path: str, output_path: str, password: str, workers: Optional[int] = None,
+                 chunksize: int = 500000) -> int:
+    """Decrypt a file written by encrypt_file into CSV (or Parquet); returns the row count"""
+    metadata = read_encryption_metadata(input_path)
+    salt = base64.b64decode(metadata['salt'])
+    with FieldEncryptor(password, salt, metadata['columns'], workers, dtypes=metadata.get('dtypes')) as encryptor:
+        writer = _ChunkWriter(output_path)
+        try:
+            chunks = _iter_encrypted_chunks(input_path, chunksize, _binary_columns(encryptor.columns))
+            for chunk in encryptor.decrypt_chunks(chunks):
+                writer.write(chunk)
+        finally:
+            writer.close()
+    return writer.rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Encrypt or decrypt incident columns in parallel')
+    parser.add_argument('mode', choices=['encrypt', 'decrypt'])
+    parser.add_argument('output', help='.parquet for binary columns, anything else for CSV')
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--password', default=os.environ.get('INCIDENT_ENCRYPTION_PASSWORD'),
+                        help='Defaults to $INCIDENT_ENCRYPTION_PASSWORD')
+    parser.add_argument('--columns', default=','.join(ENCRYPTED_COLUMNS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=500000)
+    args = parser.parse_args()
+    if not args.password:
+        parser.error('a password is required (--password or $INCIDENT_ENCRYPTION_PASSWORD)')
+
+    if args.mode == 'encrypt':
+        columns = [column.strip() for column in args.columns.split(',') if column.strip()]
+        rows = encrypt_file(args.input, args.output, args.password, columns, args.workers, args.chunksize)
+    else:
+        rows = decrypt_file(args.input, args.output, args.password, args.workers, args.chunksize)
+    print(f"{args.mode.capitalize()}ed {rows} rows into {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import uuid
+import argparse
+from typing import Iterator, List, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from ingest import DEFAULT_INPUT, INCIDENT_DTYPES, INCIDENT_COLUMNS, PERIODS, parse_timestamps, peak_rss_mb
+
+FORMAT_VERSION = 1
+MANIFEST = '_manifest.json'
+
+# Hive partition columns for each partitioning granularity (year=2024/month=9[/day=21])
+PARTITIONS = {'month': ['year', 'month'], 'day': ['year', 'month', 'day']}
+PARTITION_TYPES = {'year': pa.int16(), 'month': pa.int8(), 'day': pa.int8()}
+
+def store_schema(levels: List[str]) -> pa.Schema:
+    """Arrow schema of the stored incidents; Vulnerability Type is dictionary encoded"""
+    return pa.schema([
+        ('ID', pa.int64()),
+        ('Text', pa.string()),
+        ('Label', pa.int8()),
+        ('Vulnerability Type', pa.dictionary(pa.int32(), pa.string())),
+        ('Timestamp', pa.timestamp('ns')),
+    ] + [(level, PARTITION_TYPES[level]) for level in levels])
+
+def _partitioning(levels: List[str]) -> ds.Partitioning:
+    return ds.partitioning(pa.schema([(level, PARTITION_TYPES[level]) for level in levels]), flavor='hive')
+
+def read_manifest(store_dir: str) -> dict:
+    with open(os.path.join(store_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest['format_version'] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported store format {manifest['format_version']}")
+    return manifest
+
+def write_store(csv_path: str, store_dir: str, partition: str = 'month', chunksize: int = 500000,
+                compression: str = 'zstd') -> dict:
+    """Append the incidents of a CSV to a date-partitioned Parquet dataset"""
+    if os.path.exists(os.path.join(store_dir, MANIFEST)):
+        manifest = read_manifest(store_dir)
+        if manifest['partition'] != partition:
+            raise ValueError(f"{store_dir} is partitioned by {manifest['partition']}, not {partition}")
+    else:
+        manifest = {'format_version': FORMAT_VERSION, 'partition': partition, 'rows': 0, 'sources': []}
+    levels = PARTITIONS[partition]
+    schema = store_schema(levels)
+    rows = 0
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        nonlocal rows
+        for chunk in pd.read_csv(csv_path, dtype=INCIDENT_DTYPES, chunksize=chunksize):
+            chunk['Timestamp'] = parse_timestamps(chunk['Timestamp'])
+            for level in levels:
+                chunk[level] = getattr(chunk['Timestamp'].dt, level)
+            rows += len(chunk)
+            yield pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+    os.makedirs(store_dir, exist_ok=True)
+    ds.write_dataset(
+        batches(), store_dir, schema=schema, format='parquet', partitioning=_partitioning(levels),
+        # A unique name per run lets later ingests add files next to earlier ones
+        basename_template=f'part-{uuid.uuid4().hex[:12]}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+        max_partitions=1 << 16,
+    )
+    manifest['rows'] += rows
+    manifest['sources'].append({'path': os.path.abspath(csv_path), 'rows': rows})
+    tmp_path = os.path.join(store_dir, MANIFEST + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(store_dir, MANIFEST))
+    return {'rows': rows, 'store_rows': manifest['rows'], 'files': len(store_files(store_dir))}
+
+def open_store(store_dir: str) -> ds.Dataset:
+    manifest = read_manifest(store_dir)
+    return ds.dataset(store_dir, format='parquet', partitioning=_partitioning(PARTITIONS[manifest['partition']]))
+
+def store_files(store_dir: str) -> List[str]:
+    """Sorted Parquet files of the store (e.g. for cache keys)"""
+    return sorted(ds.dataset(store_dir, format='parquet').files)
+
+def _partition_bound(levels: List[str], values: List[int], upper: bool) -> ds.Expression:
+    """Lexicographic (year, month[, day]) >= or <= values, so whole partitions are skipped"""
+    field = ds.field(levels[0])
+    if len(levels) == 1:
+        return field <= values[0] if upper else field >= values[0]
+    beyond = field < values[0] if upper else field > values[0]
+    return beyond | ((field == values[0]) & _partition_bound(levels[1:], values[1:], upper))
+
+def time_filter(levels: List[str], start=None, end=None) -> Optional[ds.Expression]:
+    """Filter for Timestamp in [start, end) on both the partition columns and the column statistics"""
+    expression = None
+    for bound, upper in ((start, False), (end, True)):
+        if bound is None:
+            continue
+        bound = pd.Timestamp(bound)
+        timestamp = pa.scalar(bound.to_datetime64().astype('datetime64[ns]'), pa.timestamp('ns'))
+        rows = ds.field('Timestamp') < timestamp if upper else ds.field('Timestamp') >= timestamp
+        part = _partition_bound(levels, [getattr(bound, level) for level in levels], upper) & rows
+        expression = part if expression is None else expression & part
+    return expression
+
+def read_store(store_dir: str, columns: Optional[List[str]] = None, start=None, end=None,
+               vulnerability_types: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load selected columns of the incidents in [start, end) in the frame layout read_incidents returns"""
+    dataset = open_store(store_dir)
+    levels = PARTITIONS[read_manifest(store_dir)['partition']]
+    expression = time_filter(levels, start, end)
+    if vulnerability_types is not None:
+        types = ds.field('Vulnerability Type').isin(list(vulnerability_types))
+        expression = types if expression is None else expression & types
+    table = dataset.to_table(columns=columns or INCIDENT_COLUMNS, filter=expression)
+    if 'ID' in table.column_names:
+        # Files are read in directory order (month=1, month=10, ...); restore the CSV's row order
+        table = table.sort_by('ID')
+    # Dictionary columns come back as pandas categories; text stays object like the CSV path
+    frame = table.to_pandas()
+    if 'Text' in frame.columns:
+        frame['Text'] = frame['Text'].astype(object)
+    return frame
+
+def period_counts(store_dir: str, period: str = 'month', start=None, end=None) -> pd.Series:
+    """Incidents per year, month, day or hour, reading only the Timestamp column"""
+    hours = read_store(store_dir, ['Timestamp'], start, end)['Timestamp'].to_numpy().astype('datetime64[h]')
+    values, counts = np.unique(hours, return_counts=True)
+    hourly = pd.Series(counts, index=pd.DatetimeIndex(values))
+    result = hourly.groupby(hourly.index.to_period(PERIODS[period])).sum()
+    result.index = result.index.astype(str).rename(period)
+    return result.rename('incidents')
+
+def benchmark(csv_path: str, store_dir: str, start=None, end=None) -> dict:
+    """Full CSV parse vs full and time-ranged loads from the store"""
+    from ingest import read_incidents
+    results = {}
+
+    def timed(name, fn):
+        started = time.perf_counter()
+        frame = fn()
+        results[f'{name}_seconds'] = time.perf_counter() - started
+        results[f'{name}_rows'] = len(frame)
+        results[f'{name}_frame_mb'] = frame.memory_usage(deep=True).sum() / 2 ** 20
+
+    timed('csv', lambda: read_incidents(csv_path))
+    timed('store', lambda: read_store(store_dir))
+    if start is not None or end is not None:
+        timed('store_range', lambda: read_store(store_dir, start=start, end=end))
+    timed('store_timestamps', lambda: read_store(store_dir, ['Timestamp']))
+    results['csv_mb'] = os.path.getsize(csv_path) / 2 ** 20
+    results['store_mb'] = sum(os.path.getsize(path) for path in store_files(store_dir)) / 2 ** 20
+    results['peak_rss_mb'] = peak_rss_mb()
+    for key, value in results.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Date-partitioned Parquet store of incidents')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help='Append a CSV to the store')
+    convert.add_argument('store')
+    convert.add_argument('--input', default=DEFAULT_INPUT)
+    convert.add_argument('--partition', choices=sorted(PARTITIONS), default='month')
+    convert.add_argument('--chunksize', type=int, default=500000)
+    convert.add_argument('--compression', default='zstd')
+
+    counts = subparsers.add_parser('counts', help='Incidents per year, month, day or hour')
+    counts.add_argument('store')
+    counts.add_argument('--period', choices=list(PERIODS), default='month')
+    counts.add_argument('--start', default=None, help='Inclusive start time')
+    counts.add_argument('--end', default=None, help='Exclusive end time')
+
+    bench = subparsers.add_parser('benchmark', help='Compare loading the CSV and the store')
+    bench.add_argument('store')
+    bench.add_argument('--input', default=DEFAULT_INPUT)
+    bench.add_argument('--start', default=None)
+    bench.add_argument('--end', default=None)
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        stats = write_store(args.input, args.store, args.partition, args.chunksize, args.compression)
+        print(f"Wrote {stats['rows']} incidents; {args.store} now holds {stats['store_rows']} in {stats['files']} files")
+    elif args.command == 'counts':
+        print(period_counts(args.store, args.period, args.start, args.end).to_string())
+    else:
+        benchmark(args.input, args.store, args.start, args.end)
+
+if __name__ == "__main__":
+    main()
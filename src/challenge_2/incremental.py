@@ -0,0 +1,185 @@
+import os
+import argparse
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+from preprocessing import TextPreprocessor
+from ingest import DEFAULT_INPUT, iter_incident_chunks
+
+CLASSES = np.array([0, 1])
+
+def make_vectorizer(n_features: int = 2 ** 20) -> HashingVectorizer:
+    """Stateless replacement for the fitted TfidfVectorizer"""
+    return HashingVectorizer(n_features=n_features, alternate_sign=False, norm='l2')
+
+def make_classifier(random_state: int = 42) -> SGDClassifier:
+    """Logistic regression trained by SGD so it can learn chunk by chunk"""
+    return SGDClassifier(loss='log_loss', alpha=1e-5, random_state=random_state)
+
+def holdout_mask(ids: pd.Series, test_percent: int = 20) -> np.ndarray:
+    """Deterministically assign rows to the test split by hashing their ID"""
+    return pd.util.hash_pandas_object(ids, index=False).to_numpy() % 100 < test_percent
+
+def classification_report_from_confusion(cm: np.ndarray, labels=CLASSES, digits: int = 2) -> str:
+    """Format a classification report (sklearn layout) from a confusion matrix"""
+    # Expand the matrix into one weighted sample per cell so memory stays constant
+    y_true = np.repeat(np.arange(len(labels)), len(labels))
+    y_pred = np.tile(np.arange(len(labels)), len(labels))
+    weights = cm.ravel()
+    precision, recall, f1, support = precision_recall_fscore_support(
+        y_true, y_pred, labels=np.arange(len(labels)), sample_weight=weights, zero_division=0
+    )
+    support = cm.sum(axis=1)
+    total = int(support.sum())
+
+    names = [str(label) for label in labels]
+    width = max(len(name) for name in names + ['weighted avg'])
+    headers = ['precision', 'recall', 'f1-score', 'support']
+    report = ("{:>{width}s} " + " {:>9}" * len(headers)).format('', *headers, width=width) + "\n\n"
+    row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+    for name, p, r, f, s in zip(names, precision, recall, f1, support):
+        report += row_fmt.format(name, p, r, f, int(s), width=width, digits=digits)
+    report += "\n"
+
+    accuracy = np.trace(cm) / total if total else 0.0
+    report += ("{:>{width}s} " + " {:>9}" * 2 + " {:>9.{digits}f}" + " {:>9}\n").format(
+        'accuracy', '', '', accuracy, total, width=width, digits=digits)
+    report += row_fmt.format('macro avg', precision.mean(), recall.mean(), f1.mean(), total,
+                             width=width, digits=digits)
+    share = support / total if total else support
+    report += row_fmt.format('weighted avg', (precision * share).sum(), (recall * share).sum(),
+                             (f1 * share).sum(), total, width=width, digits=digits)
+    return report
+
+class IncrementalTrainer:
+    """Out-of-core training over the chunked incident stream with checkpoints"""
+
+    def __init__(self, results_dir: str = 'results', checkpoint_every: int = 10,
+                 test_percent: int = 20, n_features: int = 2 ** 20):
+        self.results_dir = results_dir
+        self.checkpoint_path = os.path.join(results_dir, 'checkpoints', 'incremental.pkl')
+        self.checkpoint_every = checkpoint_every
+        self.test_percent = test_percent
+        self.vectorizer = make_vectorizer(n_features)
+        self.preprocessor = TextPreprocessor()
+        self.model = make_classifier()
+        # offset is the byte position in the CSV where the current pass resumes
+        self.state = {'phase': 'train', 'rows_seen': 0, 'chunks_seen': 0, 'offset': 0,
+                      'confusion': np.zeros((len(CLASSES), len(CLASSES)), dtype=np.int64)}
+
+    def save_checkpoint(self):
+        """Atomically write the model and stream position to disk"""
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = self.checkpoint_path + '.tmp'
+        joblib.dump({'model': self.model, 'state': self.state,
+                     'n_features': self.vectorizer.n_features,
+                     'test_percent': self.test_percent}, tmp_path)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def load_checkpoint(self) -> bool:
+        """Restore model and stream position from the last checkpoint"""
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        checkpoint = joblib.load(self.checkpoint_path)
+        if 'offset' not in checkpoint['state']:
+            # Written before byte offsets were recorded; its position cannot be resumed exactly
+            return False
+        self.model = checkpoint['model']
+        self.state = checkpoint['state']
+        self.test_percent = checkpoint['test_percent']
+        self.vectorizer = make_vectorizer(checkpoint['n_features'])
+        return True
+
+    def _chunks(self, path: str, chunksize: int):
+        return iter_incident_chunks(path, chunksize=chunksize, preprocessor=self.preprocessor,
+                                    usecols=['ID', 'Text', 'Label'],
+                                    start_offset=self.state['offset'])
+
+    def _advance(self, chunk: pd.DataFrame):
+        self.state['rows_seen'] += len(chunk)
+        self.state['offset'] = chunk.attrs['end_offset']
+        self.state['chunks_seen'] += 1
+        if self.state['chunks_seen'] % self.checkpoint_every == 0:
+            self.save_checkpoint()
+
+    def train(self, path: str, chunksize: int):
+        """First pass: partial_fit on every training row"""
+        for chunk in self._chunks(path, chunksize):
+            train_rows = chunk[~holdout_mask(chunk['ID'], self.test_percent)]
+            if len(train_rows):
+                X = self.vectorizer.transform(train_rows['processed_text'])
+                self.model.partial_fit(X, train_rows['Label'].to_numpy(), classes=CLASSES)
+            self._advance(chunk)
+        self.state.update(phase='evaluate', rows_seen=0, chunks_seen=0, offset=0)
+        self.save_checkpoint()
+
+    def evaluate(self, path: str, chunksize: int):
+        """Second pass: accumulate the confusion matrix over held-out rows"""
+        for chunk in self._chunks(path, chunksize):
+            test_rows = chunk[holdout_mask(chunk['ID'], self.test_percent)]
+            if len(test_rows):
+                y_pred = self.model.predict(self.vectorizer.transform(test_rows['processed_text']))
+                self.state['confusion'] += confusion_matrix(test_rows['Label'].to_numpy(), y_pred,
+                                                            labels=CLASSES)
+            self._advance(chunk)
+        self.state.update(phase='done', rows_seen=0, chunks_seen=0, offset=0)
+        self.save_checkpoint()
+
+    def run(self, path: str = DEFAULT_INPUT, chunksize: int = 100000, resume: bool = False) -> str:
+        """Train and evaluate, resuming from the checkpoint when requested"""
+        if not (resume and self.load_checkpoint()):
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+        if self.state['phase'] == 'train':
+            self.train(path, chunksize)
+        if self.state['phase'] == 'evaluate':
+            self.evaluate(path, chunksize)
+        return self.write_results()
+
+    def write_results(self) -> str:
+        """Write the classification report, confusion matrix plot and model"""
+        os.makedirs(self.results_dir, exist_ok=True)
+        cm = self.state['confusion']
+        report = classification_report_from_confusion(cm)
+
+        with open(os.path.join(self.results_dir, 'incremental_results.txt'), 'w') as f:
+            f.write(f"Incremental Training Results - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write("=" * 50 + "\n\n")
+            f.write("Classification Report:\n")
+            f.write(report + "\n")
+
+        plt.figure(figsize=(8, 6))
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
+        plt.title('Confusion Matrix (Incremental Model)')
+        plt.xlabel('Predicted')
+        plt.ylabel('Actual')
+        plt.savefig(os.path.join(self.results_dir, 'incremental_confusion_matrix.png'))
+        plt.close()
+
+        joblib.dump(self.model, os.path.join(self.results_dir, 'incremental_model.pkl'))
+        joblib.dump(self.vectorizer, os.path.join(self.results_dir, 'hashing_vectorizer.pkl'))
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the incident classifier out of core')
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--checkpoint-every', type=int, default=10, help='Checkpoint every N chunks')
+    parser.add_argument('--resume', action='store_true', help='Continue from the last checkpoint')
+    args = parser.parse_args()
+
+    trainer = IncrementalTrainer(args.results_dir, checkpoint_every=args.checkpoint_every)
+    report = trainer.run(args.input, args.chunksize, resume=args.resume)
+    print(report)
+
+if __name__ == "__main__":
+    main()
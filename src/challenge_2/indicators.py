@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import argparse
+import ipaddress
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+from ingest import DEFAULT_INPUT, iter_incident_chunks
+
+FORMAT_VERSION = 1
+DEFAULT_INDEX_DIR = 'results/indicators'
+
+# "from IP 185.86.151.11", "to server 198.51.100.1", "from port 25 to port 587": the word before
+# an indicator (allowing two words in between) gives its direction
+_DIRECTION = r'(?:\b(?P<direction>from|to)\s+(?:[A-Za-z]+\s+){0,2})?'
+IP_REGEX = _DIRECTION + r'(?<![\d.])(?P<ip>\d{1,3}(?:\.\d{1,3}){3})(?:/(?P<prefix>\d{1,2}))?(?![\d.])'
+PORT_REGEX = r'\bport\s+(?P<port>\d{1,5})\b'
+PATH_REGEX = r'(?<![\w/])(?P<path>/[A-Za-z0-9_.\-]+(?:/[A-Za-z0-9_.\-]+)*)'
+
+ROLES = {'other': 0, 'src': 1, 'dst': 2}
+
+def ip_to_int(addresses: pd.Series) -> pd.Series:
+    """Dotted quads -> integers, <NA> where an octet is out of range"""
+    if addresses.empty:
+        return pd.Series([], index=addresses.index, dtype='Int64')
+    octets = addresses.str.split('.', expand=True).to_numpy('int64')
+    values = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    return pd.Series(values, index=addresses.index).where((octets <= 255).all(axis=1)).astype('Int64')
+
+def int_to_ip(values) -> list:
+    return [None if pd.isna(value) or value < 0 else str(ipaddress.IPv4Address(int(value))) for value in values]
+
+def _first(matches: pd.DataFrame, column: str, n_texts: int, mask=None) -> pd.Series:
+    """First match per text (by position), as a Series indexed by text number"""
+    selected = matches if mask is None else matches[mask]
+    first = selected.groupby(level=0)[column].first()
+    return first.reindex(range(n_texts))
+
+def extract_indicators(texts: pd.Series) -> tuple:
+    """Typed indicator columns per text, plus every IP mention as (row, ip, role) postings
+
+    Extraction runs once per distinct text; templated incidents make that a small fraction of rows.
+    """
+    codes, uniques = pd.factorize(texts.astype(str), use_na_sentinel=False)
+    uniques = pd.Series(uniques, dtype=object)
+    n_texts = len(uniques)
+
+    ips = uniques.str.extractall(IP_REGEX)
+    ips['value'] = ip_to_int(ips['ip'])
+    ips = ips[ips['value'].notna()]
+    ips['prefix'] = pd.to_numeric(ips['prefix']).astype('Int64')
+    hosts = ips[ips['prefix'].isna() | (ips['prefix'] > 32)]
+    cidrs = ips[ips['prefix'].notna() & (ips['prefix'] <= 32)]
+    ports = uniques.str.extractall(PORT_REGEX)
+    paths = uniques.str.extractall(PATH_REGEX)
+
+    per_text = pd.DataFrame({
+        'src_ip': _first(hosts, 'value', n_texts, hosts['direction'] == 'from'),
+        'dst_ip': _first(hosts, 'value', n_texts, hosts['direction'] == 'to'),
+        'cidr_network': _first(cidrs, 'value', n_texts),
+        'cidr_prefix': _first(cidrs, 'prefix', n_texts),
+        'port': pd.to_numeric(_first(ports, 'port', n_texts)),
+        'path': _first(paths, 'path', n_texts),
+    })
+    # Mask host bits: "172.16.0.5/24" covers 172.16.0.0/24
+    host_bits = 32 - per_text['cidr_prefix'].fillna(32).to_numpy('int64')
+    network_mask = ((1 << 32) - 1) ^ ((1 << host_bits) - 1)
+    per_text['cidr_network'] = per_text['cidr_network'].astype('Int64') & network_mask
+    per_text['port'] = per_text['port'].where(per_text['port'] <= 65535)
+    dtypes = {'src_ip': 'UInt32', 'dst_ip': 'UInt32', 'cidr_network': 'UInt32', 'cidr_prefix': 'UInt8',
+              'port': 'UInt16', 'path': 'category'}
+    columns = pd.DataFrame({name: per_text[name].astype(dtype).array.take(codes) for name, dtype in dtypes.items()},
+                           index=texts.index)
+
+    # Expand per-text IP mentions to per-row postings without a Python loop over rows
+    # An empty extractall result has an object index, which bincount cannot take
+    text_of_mention = hosts.index.get_level_values(0).to_numpy().astype(np.int64)
+    order = np.argsort(text_of_mention, kind='stable')
+    mention_values = hosts['value'].to_numpy('int64')[order]
+    mention_roles = hosts['direction'].map({'from': ROLES['src'], 'to': ROLES['dst']}).fillna(ROLES['other'])
+    mention_roles = mention_roles.to_numpy('int8')[order]
+    counts = np.bincount(text_of_mention, minlength=n_texts)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype('int64')
+    per_row = counts[codes]
+    rows = np.repeat(np.arange(len(codes)), per_row)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+    positions = np.repeat(offsets[codes], per_row) + within
+    postings = pd.DataFrame({'row': rows, 'ip': mention_values[positions].astype('uint32'),
+                             'role': mention_roles[positions]})
+    return columns, postings
+
+class IndicatorIndex:
+    """Incident indicators as flat arrays with sorted IP and CIDR postings for prefix queries
+
+    A CIDR is a contiguous integer range, so "every IP inside 172.16.0.0/12" is two binary searches
+    over the sorted IP postings. Subnets mentioned in incidents are bucketed by prefix length:
+    a longer subnet overlaps the query when its network falls in the range, a shorter one when it
+    equals the query network masked to its own length.
+    """
+
+    ARRAYS = ('ids', 'times', 'vulnerability', 'src_ip', 'dst_ip', 'port', 'path', 'cidr_network', 'cidr_prefix',
+              'ip_values', 'ip_rows', 'ip_roles', 'cidr_networks', 'cidr_rows', 'cidr_offsets')
+
+    def __init__(self, arrays: dict, vulnerability_types: list, paths: list):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.vulnerability_types = list(vulnerability_types)
+        self.paths = list(paths)
+        self._source_counts = None
+
+    @classmethod
+    def from_frames(cls, frames: Iterable[pd.DataFrame]) -> 'IndicatorIndex':
+        """Build from incident frames (ID, Text, Vulnerability Type, Timestamp), e.g. CSV chunks"""
+        vulnerability_types, paths = {}, {}
+        parts = {name: [] for name in ('ids', 'times', 'vulnerability', 'src_ip', 'dst_ip', 'port', 'path',
+                                       'ip_values', 'ip_rows', 'ip_roles', 'cidr_network', 'cidr_prefix')}
+        row_offset = 0
+        for frame in frames:
+            columns, postings = extract_indicators(frame['Text'])
+            # Chunk-local category codes -> codes shared by the whole index; read_csv turns the
+            # dataset's "None" type into NaN, which json.dump would write as a bare NaN
+            vulnerability = frame['Vulnerability Type'].astype(object).fillna('None').astype(str)
+            for value in vulnerability.unique():
+                vulnerability_types.setdefault(value, len(vulnerability_types))
+            for value in columns['path'].cat.categories:
+                paths.setdefault(value, len(paths))
+            parts['ids'].append(frame['ID'].to_numpy('int64'))
+            parts['times'].append(frame['Timestamp'].to_numpy('datetime64[ns]').view('int64'))
+            parts['vulnerability'].append(vulnerability.map(vulnerability_types).to_numpy('int16'))
+            for name in ('src_ip', 'dst_ip', 'port'):
+                parts[name].append(columns[name].astype('Int64').fillna(-1).to_numpy('int64'))
+            parts['path'].append(columns['path'].astype(object).map(paths).fillna(-1).to_numpy('int32'))
+            parts['cidr_network'].append(columns['cidr_network'].astype('Int64').fillna(-1).to_numpy('int64'))
+            parts['cidr_prefix'].append(columns['cidr_prefix'].astype('Int64').fillna(-1).to_numpy('int64'))
+            parts['ip_values'].append(postings['ip'].to_numpy('uint32'))
+            parts['ip_rows'].append(postings['row'].to_numpy('int64') + row_offset)
+            parts['ip_roles'].append(postings['role'].to_numpy('int8'))
+            row_offset += len(frame)
+
+        arrays = {name: np.concatenate(values) if values else np.empty(0, 'int64') for name, values in parts.items()}
+        order = np.argsort(arrays['ip_values'], kind='stable')
+        for name in ('ip_values', 'ip_rows', 'ip_roles'):
+            arrays[name] = arrays[name][order]
+
+        cidr_rows = np.flatnonzero(arrays['cidr_prefix'] >= 0)
+        prefixes = arrays['cidr_prefix'][cidr_rows]
+        networks = arrays['cidr_network'][cidr_rows]
+        order = np.lexsort((networks, prefixes))
+        arrays['cidr_networks'] = networks[order].astype('uint32')
+        arrays['cidr_rows'] = cidr_rows[order]
+        arrays['cidr_offsets'] = np.searchsorted(prefixes[order], np.arange(34))
+        for name, dtype in (('ids', 'int64'), ('times', 'int64'), ('vulnerability', 'int16'),
+                            ('path', 'int32'), ('cidr_prefix', 'int8'), ('ip_values', 'uint32'), ('ip_roles', 'int8')):
+            arrays[name] = arrays[name].astype(dtype)
+        return cls(arrays, sorted(vulnerability_types, key=vulnerability_types.get),
+                   sorted(paths, key=paths.get))
+
+    def save(self, index_dir: str) -> str:
+        os.makedirs(index_dir, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(index_dir, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        manifest = {'format_version': FORMAT_VERSION, 'rows': len(self),
+                    'vulnerability_types': self.vulnerability_types, 'paths': self.paths}
+        with open(os.path.join(index_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return index_dir
+
+    @classmethod
+    def load(cls, index_dir: str, mmap_arrays: bool = True) -> 'IndicatorIndex':
+        with open(os.path.join(index_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format {manifest['format_version']}")
+        mode = 'r' if mmap_arrays else None
+        arrays = {name: np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode=mode) for name in cls.ARRAYS}
+        return cls(arrays, manifest['vulnerability_types'], manifest['paths'])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _time_mask(self, rows: np.ndarray, start, end) -> np.ndarray:
+        times = self.times[rows]
+        mask = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            mask &= times >= pd.Timestamp(start).value
+        if end is not None:
+            mask &= times < pd.Timestamp(end).value
+        return mask
+
+    def query(self, cidr: str, start=None, end=None, role: Optional[str] = None) -> np.ndarray:
+        """Sorted row numbers of incidents touching a CIDR in [start, end), by IP or mentioned subnet"""
+        network = ipaddress.ip_network(cidr, strict=False)
+        low, high = int(network.network_address), int(network.broadcast_address)
+        prefix = network.prefixlen
+
+        begin = np.searchsorted(self.ip_values, low)
+        stop = np.searchsorted(self.ip_values, high, side='right')
+        hits = [self.ip_rows[begin:stop]]
+        if role is not None:
+            hits[0] = hits[0][np.asarray(self.ip_roles[begin:stop]) == ROLES[role]]
+        else:
+            for length in range(33):
+                bucket = slice(self.cidr_offsets[length], self.cidr_offsets[length + 1])
+                networks = self.cidr_networks[bucket]
+                if not len(networks):
+                    continue
+                if length >= prefix:
+                    # Subnets inside the query range
+                    lo, hi = np.searchsorted(networks, low), np.searchsorted(networks, high, side='right')
+                else:
+                    # Subnets containing the query range
+                    key = low & (((1 << 32) - 1) ^ ((1 << (32 - length)) - 1))
+                    lo, hi = np.searchsorted(networks, key), np.searchsorted(networks, key, side='right')
+                hits.append(self.cidr_rows[bucket][lo:hi])
+        rows = np.unique(np.concatenate(hits))
+        if start is not None or end is not None:
+            rows = rows[self._time_mask(rows, start, end)]
+        return rows
+
+    def frame(self, rows: np.ndarray) -> pd.DataFrame:
+        """Readable indicator columns for the given rows"""
+        vulnerability = np.asarray(self.vulnerability[rows])
+        ports = np.asarray(self.port[rows])
+        paths = np.asarray(self.path[rows])
+        networks, prefixes = int_to_ip(np.asarray(self.cidr_network[rows])), np.asarray(self.cidr_prefix[rows])
+        return pd.DataFrame({
+            'ID': np.asarray(self.ids[rows]),
+            'Timestamp': pd.to_datetime(np.asarray(self.times[rows])),
+            'Vulnerability Type': [self.vulnerability_types[code] for code in vulnerability],
+            'src_ip': int_to_ip(np.asarray(self.src_ip[rows])),
+            'dst_ip': int_to_ip(np.asarray(self.dst_ip[rows])),
+            'port': pd.Series(ports, dtype='Int64').where(ports >= 0).astype('UInt16'),
+            'subnet': [f"{network}/{prefix}" if prefix >= 0 else None for network, prefix in zip(networks, prefixes)],
+            'path': [self.paths[code] if code >= 0 else None for code in paths],
+        })
+
+    def incidents(self, cidr: str, start=None, end=None, role: Optional[str] = None) -> pd.DataFrame:
+        return self.frame(self.query(cidr, start, end, role))
+
+    def source_counts(self) -> pd.DataFrame:
+        """Incident counts per (Vulnerability Type, source IP), computed once"""
+        if self._source_counts is None:
+            src_ip = np.asarray(self.src_ip)
+            present = src_ip >= 0
+            keys = (np.asarray(self.vulnerability)[present].astype('int64') << 32) | src_ip[present]
+            keys, counts = np.unique(keys, return_counts=True)
+            self._source_counts = pd.DataFrame({'vulnerability': (keys >> 32).astype('int16'),
+                                                'src_ip': keys & 0xFFFFFFFF, 'incidents': counts})
+        return self._source_counts
+
+    def top_source_ips(self, n: int = 5, vulnerability_type: Optional[str] = None) -> pd.DataFrame:
+        """The n most frequent source IPs for each Vulnerability Type (or just one type)"""
+        counts = self.source_counts()
+        if vulnerability_type is not None:
+            if vulnerability_type not in self.vulnerability_types:
+                return pd.DataFrame(columns=['Vulnerability Type', 'src_ip', 'incidents'])
+            counts = counts[counts['vulnerability'] == self.vulnerability_types.index(vulnerability_type)]
+        top = (counts.sort_values(['vulnerability', 'incidents'], ascending=[True, False], kind='stable')
+               .groupby('vulnerability').head(n))
+        return pd.DataFrame({
+            'Vulnerability Type': [self.vulnerability_types[code] for code in top['vulnerability']],
+            'src_ip': int_to_ip(top['src_ip']),
+            'incidents': top['incidents'].to_numpy(),
+        })
+
+def build_index(path: str = DEFAULT_INPUT, chunksize: int = 100000) -> IndicatorIndex:
+    """Extract indicators from a CSV chunk by chunk"""
+    return IndicatorIndex.from_frames(iter_incident_chunks(
+        path, chunksize=chunksize, usecols=['ID', 'Text', 'Vulnerability Type', 'Timestamp']))
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract IPs, subnets, ports and paths from incidents and query them')
+    parser.add_argument('command', choices=['build', 'query', 'top-sources'])
+    parser.add_argument('cidr', nargs='?', help="Network for 'query', e.g. 172.16.0.0/12")
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--start', default=None, help='Inclusive start time for query')
+    parser.add_argument('--end', default=None, help='Exclusive end time for query')
+    parser.add_argument('--role', choices=['src', 'dst', 'other'], default=None)
+    parser.add_argument('--vulnerability-type', default=None)
+    parser.add_argument('-n', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = build_index(args.input, args.chunksize)
+        index.save(args.index_dir)
+        print(f"Indexed {len(index)} incidents ({len(index.ip_values)} IP mentions, {len(index.cidr_rows)} subnets) "
+              f"in {time.perf_counter() - start:.1f}s ({args.index_dir}/)")
+        return
+
+    index = IndicatorIndex.load(args.index_dir)
+    start = time.perf_counter()
+    if args.command == 'query':
+        if not args.cidr:
+            parser.error("'query' needs a CIDR")
+        rows = index.query(args.cidr, args.start, args.end, args.role)
+        elapsed = time.perf_counter() - start
+        print(index.frame(rows[:20]).to_string(index=False))
+        print(f"\n{len(rows)} incidents touching {args.cidr} ({elapsed * 1000:.1f} ms)")
+    else:
+        top = index.top_source_ips(args.n, args.vulnerability_type)
+        elapsed = time.perf_counter() - start
+        print(top.to_string(index=False))
+        print(f"\n({elapsed * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
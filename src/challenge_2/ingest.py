@@ -0,0 +1,299 @@
+import io
+import os
+import csv
+import argparse
+import resource
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+from preprocessing import TextPreprocessor
+
+DEFAULT_INPUT = '../../input/cyber-security-incidents/incidents.csv'
+
+# Explicit schema so pandas never has to infer types chunk by chunk
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+INCIDENT_DTYPES = {
+    'ID': 'int64',
+    'Text': 'object',
+    'Label': 'int8',
+    'Vulnerability Type': 'category',
+}
+INCIDENT_COLUMNS = ['ID', 'Text', 'Label', 'Vulnerability Type', 'Timestamp']
+
+# Numeric columns covered by the correlation matrix
+CORRELATION_COLUMNS = ['ID', 'Label', 'month', 'year']
+
+# Calendar periods reported by IncidentAggregates.period_counts, rolled up from hourly counts
+PERIODS = {'year': 'Y', 'month': 'M', 'day': 'D', 'hour': 'h'}
+
+def parse_timestamps(timestamps: pd.Series) -> pd.Series:
+    """Parse the Timestamp column using the fixed export format"""
+    return pd.to_datetime(timestamps, format=TIMESTAMP_FORMAT)
+
+def read_incidents(path: str = DEFAULT_INPUT, usecols: Optional[list] = None) -> pd.DataFrame:
+    """Read the whole incident CSV with the explicit schema"""
+    dtypes = {k: v for k, v in INCIDENT_DTYPES.items() if usecols is None or k in usecols}
+    df = pd.read_csv(path, usecols=usecols, dtype=dtypes)
+    if 'Timestamp' in df.columns:
+        df['Timestamp'] = parse_timestamps(df['Timestamp'])
+    return df
+
+def add_derived_columns(chunk: pd.DataFrame, preprocessor: Optional[TextPreprocessor] = None) -> pd.DataFrame:
+    """Add the columns the analysis derives from each incident"""
+    if 'Text' in chunk.columns:
+        chunk['text_length'] = chunk['Text'].str.len()
+        if preprocessor is not None:
+            chunk['processed_text'] = preprocessor.transform(chunk['Text'])
+    if 'Timestamp' in chunk.columns:
+        chunk['month'] = chunk['Timestamp'].dt.month.astype('int8')
+        chunk['year'] = chunk['Timestamp'].dt.year.astype('int16')
+    return chunk
+
+def _iter_csv_blocks(path: str, chunksize: int, start_offset: int) -> Iterator[tuple]:
+    """(column names, bytes of up to chunksize complete records, end byte offset) from a byte offset on"""
+    with open(path, 'rb') as f:
+        names = next(csv.reader([f.readline().decode()]))
+        if start_offset:
+            f.seek(start_offset)
+        offset = f.tell()
+        while True:
+            block = b''.join(islice(f, chunksize))
+            if not block:
+                return
+            # An odd number of quotes means a quoted field continues on the next line
+            while block.count(b'"') % 2:
+                line = f.readline()
+                if not line:
+                    break
+                block += line
+            offset += len(block)
+            yield names, block, offset
+
+def iter_incident_chunks(path: str = DEFAULT_INPUT, chunksize: int = 100000,
+                         preprocessor: Optional[TextPreprocessor] = None,
+                         usecols: Optional[list] = None, start_offset: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Stream the incident CSV in typed chunks with derived columns added
+
+    With start_offset, reading starts at that byte offset (0: the first data row) and each chunk's
+    attrs['end_offset'] is where the next one starts, so a consumer can checkpoint and later resume
+    with a seek instead of re-parsing the rows it has already seen.
+    """
+    dtypes = {k: v for k, v in INCIDENT_DTYPES.items() if usecols is None or k in usecols}
+    if start_offset is None:
+        reader = pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+    else:
+        reader = _read_blocks(path, chunksize, start_offset, usecols, dtypes)
+    for chunk in reader:
+        if 'Timestamp' in chunk.columns:
+            chunk['Timestamp'] = parse_timestamps(chunk['Timestamp'])
+        yield add_derived_columns(chunk, preprocessor)
+
+def _read_blocks(path: str, chunksize: int, start_offset: int, usecols: Optional[list],
+                 dtypes: dict) -> Iterator[pd.DataFrame]:
+    for names, block, end_offset in _iter_csv_blocks(path, chunksize, start_offset):
+        chunk = pd.read_csv(io.BytesIO(block), names=names, header=None, usecols=usecols, dtype=dtypes)
+        chunk.attrs['end_offset'] = end_offset
+        yield chunk
+
+def _accumulate(total: Optional[pd.Series], counts: pd.Series) -> pd.Series:
+    """Add per-chunk counts into a running total"""
+    if isinstance(counts.index, pd.CategoricalIndex):
+        counts.index = counts.index.astype(object)
+    if total is None:
+        return counts.astype('int64')
+    return total.add(counts, fill_value=0).astype('int64')
+
+class IncidentAggregates:
+    """Incrementally maintained summaries of the incident dataset"""
+
+    def __init__(self):
+        self.rows = 0
+        self.missing = None
+        self.vuln_counts = None
+        self.label_counts = None
+        self.monthly_counts = None
+        self.hourly_counts = None
+        self.vuln_label_counts = None
+        self.text_length_counts = None
+        # Running mean and co-moment matrix for the correlation matrix
+        self.moment_rows = 0
+        self.moment_mean = None
+        self.comoment = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'IncidentAggregates':
+        """Build aggregates from an in-memory DataFrame"""
+        aggregates = cls()
+        aggregates.update(df)
+        return aggregates
+
+    def update(self, chunk: pd.DataFrame):
+        """Fold one chunk into the running aggregates"""
+        self.rows += len(chunk)
+        raw_columns = [c for c in INCIDENT_COLUMNS if c in chunk.columns]
+        self.missing = _accumulate(self.missing, chunk[raw_columns].isnull().sum())
+
+        if 'Vulnerability Type' in chunk.columns:
+            self.vuln_counts = _accumulate(self.vuln_counts, chunk['Vulnerability Type'].value_counts())
+        if 'Label' in chunk.columns:
+            self.label_counts = _accumulate(self.label_counts, chunk['Label'].value_counts())
+        if 'month' in chunk.columns:
+            self.monthly_counts = _accumulate(self.monthly_counts, chunk.groupby('month')['ID'].count())
+        if 'Timestamp' in chunk.columns:
+            self.hourly_counts = _accumulate(self.hourly_counts, chunk['Timestamp'].dt.floor('h').value_counts())
+        if 'Vulnerability Type' in chunk.columns and 'Label' in chunk.columns:
+            pairs = chunk.groupby(['Vulnerability Type', 'Label'], observed=True).size()
+            pairs.index = pairs.index.set_levels(pairs.index.levels[0].astype(object), level=0)
+            self.vuln_label_counts = _accumulate(self.vuln_label_counts, pairs)
+        if 'text_length' in chunk.columns:
+            self.text_length_counts = _accumulate(self.text_length_counts, chunk['text_length'].value_counts())
+        if all(c in chunk.columns for c in CORRELATION_COLUMNS):
+            self._update_moments(chunk[CORRELATION_COLUMNS].dropna().to_numpy(dtype=np.float64))
+
+    def _update_moments(self, values: np.ndarray):
+        """Merge a chunk's mean and co-moments into the running totals (Chan et al.)"""
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean(axis=0)
+        centered = values - mean
+        comoment = centered.T @ centered
+        if self.moment_rows == 0:
+            self.moment_rows, self.moment_mean, self.comoment = n, mean, comoment
+            return
+        total = self.moment_rows + n
+        delta = mean - self.moment_mean
+        self.comoment = self.comoment + comoment + np.outer(delta, delta) * self.moment_rows * n / total
+        self.moment_mean = self.moment_mean + delta * n / total
+        self.moment_rows = total
+
+    def vulnerability_distribution(self) -> pd.Series:
+        """Equivalent of df['Vulnerability Type'].value_counts()"""
+        dist = self.vuln_counts.sort_values(ascending=False, kind='stable')
+        dist.index.name = 'Vulnerability Type'
+        return dist.rename('count')
+
+    def label_distribution(self) -> pd.Series:
+        """Equivalent of df['Label'].value_counts()"""
+        dist = self.label_counts.sort_values(ascending=False, kind='stable')
+        dist.index.name = 'Label'
+        return dist.rename('count')
+
+    def monthly_incidents(self) -> pd.Series:
+        """Equivalent of df.groupby('month')['ID'].count()"""
+        monthly = self.monthly_counts.sort_index()
+        monthly.index.name = 'month'
+        return monthly.rename('ID')
+
+    def period_counts(self, period: str = 'month') -> pd.Series:
+        """Incidents per calendar year, month, day or hour (unlike monthly_incidents, years are kept apart)"""
+        hourly = self.hourly_counts.sort_index()
+        counts = hourly.groupby(hourly.index.to_period(PERIODS[period])).sum()
+        counts.index = counts.index.astype(str).rename(period)
+        return counts.rename('incidents')
+
+    def vulnerability_label_crosstab(self) -> pd.DataFrame:
+        """Equivalent of pd.crosstab(df['Vulnerability Type'], df['Label'])"""
+        crosstab = self.vuln_label_counts.unstack(fill_value=0).sort_index()
+        crosstab.index.name = 'Vulnerability Type'
+        crosstab.columns.name = 'Label'
+        return crosstab
+
+    def correlation_matrix(self) -> pd.DataFrame:
+        """Pearson correlation of CORRELATION_COLUMNS from the streamed co-moments"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(np.diag(self.comoment))
+            corr = self.comoment / np.outer(std, std)
+        return pd.DataFrame(corr, index=CORRELATION_COLUMNS, columns=CORRELATION_COLUMNS)
+
+    def label_box_stats(self) -> list:
+        """Box plot statistics of Label per Vulnerability Type, computed from the crosstab"""
+        crosstab = self.vulnerability_label_crosstab()
+        values = crosstab.columns.to_numpy(dtype=float)
+        return [_box_stats(values, counts, label=name)
+                for name, counts in zip(crosstab.index, crosstab.to_numpy())]
+
+    def text_length_histogram(self, bins: int = 50) -> tuple:
+        """Histogram of text lengths as (counts, bin_edges)"""
+        lengths = self.text_length_counts.index.to_numpy(dtype=float)
+        return np.histogram(lengths, bins=bins, weights=self.text_length_counts.to_numpy())
+
+def _weighted_percentile(values: np.ndarray, counts: np.ndarray, q: float) -> float:
+    """np.percentile (linear interpolation) of values repeated counts times"""
+    position = (counts.sum() - 1) * q / 100
+    cumulative = np.cumsum(counts)
+    lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+    upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+    return lower + (upper - lower) * (position - np.floor(position))
+
+def _box_stats(values: np.ndarray, counts: np.ndarray, label: str, whis: float = 1.5) -> dict:
+    """Same statistics as matplotlib.cbook.boxplot_stats, for discrete value counts"""
+    present = counts > 0
+    values, counts = values[present], counts[present]
+    q1, med, q3 = (_weighted_percentile(values, counts, q) for q in (25, 50, 75))
+    iqr = q3 - q1
+    inside = values[(values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)]
+    whislo = min(inside.min(), q1) if len(inside) else q1
+    whishi = max(inside.max(), q3) if len(inside) else q3
+    return {
+        'label': label, 'med': med, 'q1': q1, 'q3': q3,
+        'whislo': whislo, 'whishi': whishi,
+        'mean': float((values * counts).sum() / counts.sum()),
+        'fliers': values[(values < whislo) | (values > whishi)],
+    }
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_streaming_analysis(path: str = DEFAULT_INPUT, results_dir: str = 'results',
+                           chunksize: int = 100000, preprocess: bool = True) -> IncidentAggregates:
+    """Run the descriptive analysis over the CSV without loading it whole"""
+    preprocessor = TextPreprocessor() if preprocess else None
+    aggregates = IncidentAggregates()
+    chunks = 0
+    for chunk in iter_incident_chunks(path, chunksize=chunksize, preprocessor=preprocessor):
+        aggregates.update(chunk)
+        chunks += 1
+
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+
+    counts, edges = aggregates.text_length_histogram()
+    histogram = pd.Series(counts.astype('int64'),
+                          index=[f"{lo:.1f}-{hi:.1f}" for lo, hi in zip(edges[:-1], edges[1:])])
+    sections = [
+        f"Streaming Analysis Results - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n" + "=" * 50 + "\n",
+        f"Rows: {aggregates.rows} in {chunks} chunks of {chunksize}",
+        "Missing values:\n" + aggregates.missing.to_string(),
+        "\nVulnerability Type Distribution:\n" + aggregates.vulnerability_distribution().to_string(),
+        "\nLabel Distribution:\n" + aggregates.label_distribution().to_string(),
+        "\nIncidents by Month:\n" + aggregates.monthly_incidents().to_string(),
+        "\nIncidents by Year:\n" + aggregates.period_counts('year').to_string(),
+        "\nText Length Histogram:\n" + histogram[histogram > 0].to_string(),
+        "\nVulnerability Type vs Label Distribution:\n" + aggregates.vulnerability_label_crosstab().to_string(),
+    ]
+    if preprocessor is not None:
+        sections.append(f"\nPreprocessing memo: {preprocessor.hits} hits, {preprocessor.misses} misses")
+    sections.append(f"\nPeak RSS: {peak_rss_mb():.1f} MB")
+
+    with open(os.path.join(results_dir, 'streaming_analysis_results.txt'), 'w') as f:
+        f.write('\n'.join(sections) + '\n')
+    return aggregates
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream the incident CSV through the descriptive analysis')
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--no-preprocess', action='store_true', help='Skip text preprocessing of each chunk')
+    args = parser.parse_args()
+
+    aggregates = run_streaming_analysis(args.input, args.results_dir, args.chunksize, not args.no_preprocess)
+    print(f"Streamed {aggregates.rows} incidents. Results saved in {args.results_dir}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+def plot_vulnerability_distribution(vuln_dist, path: str):
+    plt.figure(figsize=(12, 6))
+    sns.barplot(x=vuln_dist.index, y=vuln_dist.values)
+    plt.xticks(rotation=45)
+    plt.title('Distribution of Vulnerability Types')
+    plt.xlabel('Vulnerability Type')
+    plt.ylabel('Count')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def plot_monthly_incidents(monthly_incidents, path: str):
+    plt.figure(figsize=(10, 5))
+    sns.lineplot(x=monthly_incidents.index, y=monthly_incidents.values)
+    plt.title('Number of Incidents by Month')
+    plt.xlabel('Month')
+    plt.ylabel('Number of Incidents')
+    plt.savefig(path)
+    plt.close()
+
+def plot_correlation_matrix(correlation_matrix, path: str):
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm')
+    plt.title('Correlation Matrix')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def plot_text_length_distribution(histogram, path: str):
+    counts, edges = histogram
+    plt.figure(figsize=(10, 6))
+    sns.histplot(data={'text_length': edges[:-1], 'count': counts}, x='text_length', weights='count', bins=list(edges))
+    plt.title('Distribution of Text Length')
+    plt.xlabel('Text Length')
+    plt.ylabel('Count')
+    plt.savefig(path)
+    plt.close()
+
+def plot_vulnerability_vs_label(box_stats, path: str):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bxp(box_stats, patch_artist=True)
+    plt.xticks(rotation=45)
+    plt.title('Label Distribution by Vulnerability Type')
+    plt.xlabel('Vulnerability Type')
+    plt.ylabel('Label')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close(fig)
+
+def plot_confusion_matrix(matrix, path: str):
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(matrix, annot=True, fmt='d', cmap='Blues')
+    plt.title('Confusion Matrix')
+    plt.xlabel('Predicted')
+    plt.ylabel('Actual')
+    plt.savefig(path)
+    plt.close()
+
+# Plot name -> renderer; each one writes results/<name>.png from a small aggregate
+PLOTS = {
+    'vulnerability_distribution': plot_vulnerability_distribution,
+    'monthly_incidents': plot_monthly_incidents,
+    'correlation_matrix': plot_correlation_matrix,
+    'text_length_distribution': plot_text_length_distribution,
+    'vulnerability_vs_label': plot_vulnerability_vs_label,
+    'confusion_matrix': plot_confusion_matrix,
+}
+
+def parse_plot_selection(value: str) -> List[str]:
+    """Parse the --plots option: 'all', 'none' or a comma-separated list of plot names"""
+    value = value.strip().lower()
+    if value == 'all':
+        return list(PLOTS)
+    if value in ('none', ''):
+        return []
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in PLOTS]
+    if unknown:
+        raise ValueError(f"Unknown plot(s): {', '.join(unknown)}. Choose from: {', '.join(PLOTS)}")
+    return names
+
+def _render(name: str, data, path: str) -> str:
+    PLOTS[name](data, path)
+    return path
+
+class PlotRenderer:
+    """Renders the selected plots in a process pool while the pipeline keeps working"""
+
+    def __init__(self, results_dir: str, selected: Optional[List[str]] = None, workers: Optional[int] = None):
+        self.results_dir = results_dir
+        self.selected = set(PLOTS if selected is None else selected)
+        self.workers = workers
+        self.executor = None
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(wait=exc_type is None)
+
+    def submit(self, name: str, data):
+        """Queue a plot; ignored when the plot was not selected"""
+        if name not in self.selected:
+            return
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers or min(len(self.selected), os.cpu_count() or 1))
+        path = os.path.join(self.results_dir, f'{name}.png')
+        self.futures.append(self.executor.submit(_render, name, data, path))
+
+    def close(self, wait: bool = True) -> List[str]:
+        """Wait for all queued plots and return the written paths"""
+        paths = [future.result() for future in self.futures] if wait else []
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
+        self.futures = []
+        return paths
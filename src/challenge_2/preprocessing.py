@@ -0,0 +1,171 @@
+import re
+import time
+import argparse
+from itertools import islice
+from typing import Iterable, Iterator
+import pandas as pd
+
+# Characters kept by the preprocessing step (letters and whitespace)
+NON_ALPHA_PATTERN = r'[^a-zA-Z\s]'
+
+# NLTK resources the analysis needs; nltk itself is only imported on first use
+NLTK_RESOURCES = {'stopwords': 'corpora/stopwords'}
+
+_stopword_cache = {}
+
+def ensure_nltk_resources(download: bool = True) -> bool:
+    """Check the local NLTK cache, downloading missing resources only when allowed"""
+    import nltk
+    available = True
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            if not download or not nltk.download(name, quiet=True):
+                print(f"NLTK resource '{name}' is not available in {nltk.data.path}")
+                available = False
+    return available
+
+def load_stopwords(language: str = 'english') -> frozenset:
+    """Stopword set from the local NLTK cache, loaded once per process"""
+    if language not in _stopword_cache:
+        from nltk.corpus import stopwords
+        _stopword_cache[language] = frozenset(stopwords.words(language))
+    return _stopword_cache[language]
+
+def preprocess_text(text):
+    """Row-at-a-time preprocessing (reference implementation used by the benchmark)"""
+    from nltk.corpus import stopwords
+    # Convert to lowercase
+    text = str(text).lower()
+    # Remove special characters and digits
+    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    # Simple word splitting
+    tokens = text.split()
+    # Remove stopwords
+    stop_words = set(stopwords.words('english'))
+    tokens = [t for t in tokens if t not in stop_words]
+    return ' '.join(tokens)
+
+class TextPreprocessor:
+    """Batch preprocessing engine producing the same output as preprocess_text"""
+
+    def __init__(self, language: str = 'english', cache_size: int = 100000):
+        # Stopwords and patterns are built once per engine, not once per row
+        self.stop_words = load_stopwords(language)
+        self.cache_size = cache_size
+        self._memo = {}
+        self.hits = 0
+        self.misses = 0
+
+        # Stopwords containing apostrophes can never match once non-letters are removed
+        words = sorted((w for w in self.stop_words if w.isalpha()), key=len, reverse=True)
+        self._non_alpha = re.compile(NON_ALPHA_PATTERN)
+        self._stopword_pattern = re.compile(r'\b(?:' + '|'.join(words) + r')\b')
+        self._whitespace = re.compile(r'\s+')
+
+    def _clean(self, texts: pd.Series) -> pd.Series:
+        """Apply the preprocessing steps to a Series of unique texts"""
+        cleaned = texts.str.lower()
+        cleaned = cleaned.str.replace(self._non_alpha, '', regex=True)
+        cleaned = cleaned.str.replace(self._stopword_pattern, ' ', regex=True)
+        cleaned = cleaned.str.replace(self._whitespace, ' ', regex=True)
+        return cleaned.str.strip()
+
+    def _remember(self, keys: list, values: list):
+        """Store results in the memo, evicting the oldest entries when full"""
+        if self.cache_size <= 0:
+            return
+        keys = keys[-self.cache_size:]
+        values = values[-self.cache_size:]
+        overflow = len(self._memo) + len(keys) - self.cache_size
+        if overflow > 0:
+            for key in list(islice(iter(self._memo), overflow)):
+                del self._memo[key]
+        self._memo.update(zip(keys, values))
+
+    def transform(self, texts) -> pd.Series:
+        """Preprocess a Series (or list) of texts, deduplicating identical entries"""
+        if not isinstance(texts, pd.Series):
+            texts = pd.Series(list(texts), dtype=object)
+        codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+        uniques = [str(text) for text in uniques]
+
+        results = [self._memo.get(text) for text in uniques]
+        missing = [i for i, result in enumerate(results) if result is None]
+        self.misses += len(missing)
+        self.hits += len(uniques) - len(missing)
+
+        if missing:
+            fresh_keys = [uniques[i] for i in missing]
+            fresh = self._clean(pd.Series(fresh_keys, dtype=object)).tolist()
+            for i, value in zip(missing, fresh):
+                results[i] = value
+            self._remember(fresh_keys, fresh)
+
+        processed = pd.Series(results, dtype=object).to_numpy()[codes]
+        return pd.Series(processed, index=texts.index, name=texts.name, dtype=object)
+
+    def transform_iter(self, texts: Iterable, batch_size: int = 10000) -> Iterator[str]:
+        """Preprocess an iterator of texts in batches, yielding one result per input"""
+        iterator = iter(texts)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield from self.transform(batch)
+
+    def clear_cache(self):
+        """Drop memoised results and reset hit/miss counters"""
+        self._memo.clear()
+        self.hits = 0
+        self.misses = 0
+
+def benchmark(texts: pd.Series, repeat: int = 3) -> dict:
+    """Compare the row-wise preprocess_text with the batch engine"""
+    def best_of(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings), output
+
+    legacy_time, legacy_output = best_of(lambda: texts.apply(preprocess_text))
+    cold_time, batch_output = best_of(lambda: TextPreprocessor().transform(texts))
+
+    warm_engine = TextPreprocessor()
+    warm_engine.transform(texts)
+    warm_time, _ = best_of(lambda: warm_engine.transform(texts))
+
+    rows = len(texts)
+    return {
+        'rows': rows,
+        'unique_texts': int(texts.nunique()),
+        'outputs_match': bool((legacy_output == batch_output).all()),
+        'legacy_seconds': legacy_time,
+        'batch_cold_seconds': cold_time,
+        'batch_warm_seconds': warm_time,
+        'legacy_rows_per_sec': rows / legacy_time if legacy_time else float('inf'),
+        'batch_cold_rows_per_sec': rows / cold_time if cold_time else float('inf'),
+        'speedup_cold': legacy_time / cold_time if cold_time else float('inf'),
+        'speedup_warm': legacy_time / warm_time if warm_time else float('inf'),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch text preprocessing')
+    parser.add_argument('--input', default='../../input/cyber-security-incidents/incidents.csv')
+    parser.add_argument('--scale', type=int, default=1, help='Replicate the dataset N times')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.input, usecols=['Text'])['Text']
+    if args.scale > 1:
+        texts = pd.concat([texts] * args.scale, ignore_index=True)
+
+    results = benchmark(texts, repeat=args.repeat)
+    for name, value in results.items():
+        print(f"{name}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import resource
+import tracemalloc
+from contextlib import nullcontext
+from datetime import datetime
+
+# Returned for every stage when profiling is disabled, so there is no per-stage cost
+_DISABLED = nullcontext()
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class _StageTimer:
+    """Context manager measuring one stage"""
+
+    def __init__(self, profiler: 'StageProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.cprofile = None
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            tracemalloc.reset_peak()
+        if self.profiler.cprofile:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.rss_before = _max_rss_mb()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        max_rss = _max_rss_mb()
+
+        record = {
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'max_rss_mb': max_rss,
+            'max_rss_growth_mb': max_rss - self.rss_before,
+            'failed': exc_type is not None,
+        }
+        if self.profiler.trace_memory:
+            record['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        if self.cprofile is not None:
+            record['cprofile'] = self.profiler.dump_cprofile(self.name, self.cprofile)
+        self.profiler.stages[self.name] = record
+        return False
+
+class StageProfiler:
+    """Records wall time, CPU time and peak memory per pipeline stage"""
+
+    def __init__(self, results_dir: str = 'results', enabled: bool = False,
+                 trace_memory: bool = False, cprofile: bool = False):
+        self.results_dir = results_dir
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.cprofile = enabled and cprofile
+        self.stages = {}
+        self._started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def stage(self, name: str):
+        """Context manager for one stage; a shared no-op when disabled"""
+        if not self.enabled:
+            return _DISABLED
+        return _StageTimer(self, name)
+
+    def dump_cprofile(self, name: str, profile) -> str:
+        """Write the cProfile stats of a stage to results/profiles/<stage>.prof"""
+        profile_dir = os.path.join(self.results_dir, 'profiles')
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f'{name}.prof')
+        profile.dump_stats(path)
+        return path
+
+    def write(self, name: str = 'stage_profile.json') -> str:
+        """Write the collected stage records as JSON; returns None when disabled"""
+        if not self.enabled:
+            return None
+        os.makedirs(self.results_dir, exist_ok=True)
+        path = os.path.join(self.results_dir, name)
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'tracemalloc': self.trace_memory,
+            'stages': self.stages,
+            'total_wall_seconds': sum(s['wall_seconds'] for s in self.stages.values()),
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return path
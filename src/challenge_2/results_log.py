@@ -0,0 +1,106 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+def to_jsonable(value):
+    """Convert pandas/numpy results into plain JSON types"""
+    if isinstance(value, pd.DataFrame):
+        return {str(index): to_jsonable(row) for index, row in value.to_dict(orient='index').items()}
+    if isinstance(value, pd.Series):
+        return {str(index): to_jsonable(item) for index, item in value.items()}
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+class ResultsSink:
+    """Buffers the text log and a structured results document, written once on flush"""
+
+    def __init__(self, results_dir: str = 'results', name: str = 'analysis_results',
+                 title: str = 'Analysis Results', parquet: bool = True):
+        self.results_dir = results_dir
+        self.name = name
+        self.parquet = parquet
+        self.started = time.perf_counter()
+        self.generated_at = datetime.now()
+        self.lines = [f"{title} - {self.generated_at.strftime('%Y-%m-%d %H:%M:%S')}", "=" * 50 + "\n"]
+        self.document = {
+            'generated_at': self.generated_at.isoformat(timespec='seconds'),
+            'metrics': {},
+            'distributions': {},
+            'top_features': [],
+            'timings': {},
+        }
+        self.tables = {}
+
+    def log(self, text: str):
+        """Append a line (or block) to the text log"""
+        self.lines.append(text)
+
+    def record(self, section: str, key: str, value):
+        """Store a value under document[section][key]"""
+        self.document.setdefault(section, {})[key] = to_jsonable(value)
+
+    def set(self, key: str, value):
+        """Store a value at the top level of the document"""
+        self.document[key] = to_jsonable(value)
+
+    def record_table(self, name: str, table: pd.DataFrame):
+        """Store a table for the Parquet output and the JSON document"""
+        self.tables[name] = table
+        self.document.setdefault('tables', {})[name] = to_jsonable(table.reset_index().to_dict(orient='records'))
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Record the wall time of a block under timings[stage]"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.document['timings'][stage] = time.perf_counter() - start
+
+    def flush(self) -> dict:
+        """Write the text log, JSON document and Parquet tables in one go"""
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.document['timings']['total'] = time.perf_counter() - self.started
+        paths = {'text': os.path.join(self.results_dir, f'{self.name}.txt'),
+                 'json': os.path.join(self.results_dir, f'{self.name}.json')}
+
+        self._write_atomic(paths['text'], '\n'.join(self.lines) + '\n')
+        self._write_atomic(paths['json'], json.dumps(self.document, indent=2) + '\n')
+
+        if self.parquet and self.tables:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                print("pyarrow is not installed; skipping Parquet results")
+            else:
+                table_dir = os.path.join(self.results_dir, f'{self.name}_tables')
+                os.makedirs(table_dir, exist_ok=True)
+                for name, table in self.tables.items():
+                    frame = table.reset_index()
+                    frame.columns = [str(c) for c in frame.columns]
+                    # Mixed-type columns (e.g. describe() over timestamps) are stored as text
+                    for column in frame.columns[frame.dtypes == object]:
+                        frame[column] = frame[column].astype(str)
+                    frame.to_parquet(os.path.join(table_dir, f'{name}.parquet'), index=False)
+                paths['parquet'] = table_dir
+        return paths
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
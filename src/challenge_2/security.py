@@ -0,0 +1,206 @@
+import os
+import hmac
+import base64
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.backends import default_backend
+
+# Keys the key cache's password fingerprints; random per process so they are useless as a guessing oracle
+_CACHE_SECRET = os.urandom(32)
+
+class KeyCache:
+    """Bounded LRU of derived keys, zeroized when evicted or cleared
+
+    Callers get copies; only the cache's own buffers are zeroized, so a key handed out stays valid.
+    """
+
+    def __init__(self, max_keys: int = 16):
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cache_key(password: str, salt: bytes) -> tuple:
+        # Never keep the password (or an unsalted hash of it) around as a dictionary key
+        return hmac.new(_CACHE_SECRET, password.encode(), hashlib.sha256).digest(), bytes(salt)
+
+    def get(self, password: str, salt: bytes) -> Optional[bytes]:
+        cache_key = self._cache_key(password, salt)
+        key = self._keys.get(cache_key)
+        if key is None:
+            self.misses += 1
+            return None
+        self._keys.move_to_end(cache_key)
+        self.hits += 1
+        return bytes(key)
+
+    def put(self, password: str, salt: bytes, key: bytes) -> bytes:
+        stored = bytearray(key)
+        cache_key = self._cache_key(password, salt)
+        replaced = self._keys.pop(cache_key, None)
+        if replaced is not None:
+            self._zeroize(replaced)
+        self._keys[cache_key] = stored
+        while len(self._keys) > self.max_keys:
+            _, evicted = self._keys.popitem(last=False)
+            self._zeroize(evicted)
+        return bytes(stored)
+
+    def clear(self):
+        while self._keys:
+            _, key = self._keys.popitem()
+            self._zeroize(key)
+
+    @staticmethod
+    def _zeroize(key: bytearray):
+        key[:] = bytes(len(key))
+
+    def __len__(self):
+        return len(self._keys)
+
+class SecurityAnalysis:
+    def __init__(self, key_cache_size: int = 16):
+        # Created only when results are written, so using the class as a cipher helper has no side effects
+        self.results_dir = 'security_results'
+        self.key_cache = KeyCache(key_cache_size)
+    
+    def generate_key(self, password: str, salt: bytes = None) -> tuple:
+        """Generate a key using password and salt"""
+        if salt is None:
+            salt = os.urandom(16)
+        
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=100000,
+            backend=default_backend()
+        )
+        key = kdf.derive(password.encode())
+        return key, salt
+
+    def encrypt_message(self, message: str, key: bytes) -> tuple:
+        """Encrypt a message using AES-CBC"""
+        iv = os.urandom(16)
+        cipher = Cipher(
+            algorithms.AES(key),
+            modes.CBC(iv),
+            backend=default_backend()
+        )
+        encryptor = cipher.encryptor()
+        
+        # Pad the message
+        padded_message = self._pad_message(message.encode())
+        ciphertext = encryptor.update(padded_message) + encryptor.finalize()
+        
+        return base64.b64encode(iv + ciphertext), iv
+
+    def decrypt_message(self, encrypted_message: bytes, key: bytes, iv: bytes) -> str:
+        """Decrypt a message using AES-CBC"""
+        cipher = Cipher(
+            algorithms.AES(key),
+            modes.CBC(iv),
+            backend=default_backend()
+        )
+        decryptor = cipher.decryptor()
+        
+        # Decode and remove IV
+        ciphertext = base64.b64decode(encrypted_message)[16:]
+        padded_plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+        
+        return self._unpad_message(padded_plaintext).decode()
+
+    def _pad_message(self, message: bytes) -> bytes:
+        """Add PKCS7 padding"""
+        padding_length = 16 - (len(message) % 16)
+        padding = bytes([padding_length] * padding_length)
+        return message + padding
+
+    def _unpad_message(self, padded_message: bytes) -> bytes:
+        """Remove PKCS7 padding"""
+        padding_length = padded_message[-1]
+        return padded_message[:-padding_length]
+
+    def derive_key(self, password: str, salt: bytes) -> bytes:
+        """Derive the key for (password, salt) once and serve repeats from the key cache"""
+        key = self.key_cache.get(password, salt)
+        if key is None:
+            derived, _ = self.generate_key(password, salt)
+            key = self.key_cache.put(password, salt, derived)
+        return key
+
+    def clear_key_cache(self):
+        """Zeroize and drop all cached keys"""
+        self.key_cache.clear()
+
+    def iter_encrypt_raw(self, messages: Iterable[str], key: bytes) -> Iterator[tuple]:
+        """Encrypt a stream of messages under one key; yields binary (iv, ciphertext) pairs"""
+        algorithm = algorithms.AES(key)
+        backend = default_backend()
+        for message in messages:
+            iv = os.urandom(16)
+            encryptor = Cipher(algorithm, modes.CBC(iv), backend=backend).encryptor()
+            padder = padding.PKCS7(128).padder()
+            padded_message = padder.update(message.encode()) + padder.finalize()
+            yield iv, encryptor.update(padded_message) + encryptor.finalize()
+
+    def iter_decrypt_raw(self, pairs: Iterable[tuple], key: bytes) -> Iterator[str]:
+        """Decrypt a stream of binary (iv, ciphertext) pairs"""
+        algorithm = algorithms.AES(key)
+        backend = default_backend()
+        for iv, ciphertext in pairs:
+            decryptor = Cipher(algorithm, modes.CBC(iv), backend=backend).decryptor()
+            padded_plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+            unpadder = padding.PKCS7(128).unpadder()
+            yield (unpadder.update(padded_plaintext) + unpadder.finalize()).decode()
+
+    def iter_encrypt(self, messages: Iterable[str], key: bytes) -> Iterator[tuple]:
+        """Encrypt a stream of messages under one key; yields the same (base64, iv) pairs as encrypt_message"""
+        for iv, ciphertext in self.iter_encrypt_raw(messages, key):
+            yield base64.b64encode(iv + ciphertext), iv
+
+    def iter_decrypt(self, encrypted_messages: Iterable[tuple], key: bytes) -> Iterator[str]:
+        """Decrypt a stream of (base64, iv) pairs produced by encrypt_message or iter_encrypt"""
+        pairs = ((iv, base64.b64decode(encrypted_message)[16:]) for encrypted_message, iv in encrypted_messages)
+        return self.iter_decrypt_raw(pairs, key)
+
+    def encrypt_records(self, messages: Iterable[str], password: str, salt: bytes = None) -> tuple:
+        """Encrypt many records with a single key derivation; returns ([(base64, iv), ...], salt)"""
+        if salt is None:
+            salt = os.urandom(16)
+        key = self.derive_key(password, salt)
+        return list(self.iter_encrypt(messages, key)), salt
+
+    def decrypt_records(self, encrypted_messages: Iterable[tuple], password: str, salt: bytes) -> List[str]:
+        """Decrypt records produced by encrypt_records with the same password and salt"""
+        key = self.derive_key(password, salt)
+        return list(self.iter_decrypt(encrypted_messages, key))
+
+    def test_encryption_workflow(self, message: str, password: str):
+        """Test the complete encryption/decryption workflow"""
+        results = []
+        
+        # Generate key
+        key, salt = self.generate_key(password)
+        results.append(f"Generated key from password with salt: {base64.b64encode(salt).decode()}")
+        
+        # Encrypt message
+        encrypted, iv = self.encrypt_message(message, key)
+        results.append(f"Encrypted message: {encrypted.decode()}")
+        
+        # Decrypt message
+        decrypted = self.decrypt_message(encrypted, key, iv)
+        results.append(f"Decrypted message: {decrypted}")
+        
+        # Save results
+        os.makedirs(self.results_dir, exist_ok=True)
+        with open(os.path.join(self.results_dir, 'security_test_results.txt'), 'w') as f:
+            f.write('\n'.join(results))
+        
+        return results
@@ -0,0 +1,241 @@
+import os
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, List
+import joblib
+import numpy as np
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from preprocessing import TextPreprocessor
+from artifacts import CompactClassifier
+
+def load_artifacts(results_dir: str = 'results', compact: bool = False) -> tuple:
+    """Load the model and vectorizer written by analysis.py"""
+    if compact:
+        # Memory-mapped arrays are shared between all worker processes
+        classifier = CompactClassifier(os.path.join(results_dir, 'compact'))
+        return classifier, classifier
+    model = joblib.load(os.path.join(results_dir, 'model.pkl'))
+    vectorizer = joblib.load(os.path.join(results_dir, 'vectorizer.pkl'))
+    return model, vectorizer
+
+class InferenceModel:
+    """Runs preprocessing, vectorization and prediction over a whole batch at once"""
+
+    def __init__(self, model, vectorizer, preprocessor: TextPreprocessor = None):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.preprocessor = preprocessor or TextPreprocessor()
+
+    def predict_batch(self, texts: List[str]) -> List[dict]:
+        """One sparse transform and one predict_proba call for all texts"""
+        X = self.vectorizer.transform(self.preprocessor.transform(texts))
+        probabilities = self.model.predict_proba(X)
+        labels = self.model.classes_[np.argmax(probabilities, axis=1)]
+        return [
+            {'prediction': int(label), 'probability': float(row.max())}
+            for label, row in zip(labels, probabilities)
+        ]
+
+class LatencyTracker:
+    """Rolling window of request latencies for p50/p99 and throughput"""
+
+    def __init__(self, window: int = 10000):
+        self.samples = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.batched_items = 0
+
+    def record(self, latency: float):
+        self.samples.append((time.monotonic(), latency))
+        self.requests += 1
+
+    def record_batch(self, size: int):
+        self.batches += 1
+        self.batched_items += size
+
+    def snapshot(self) -> dict:
+        """Current latency percentiles (ms) and throughput (requests/sec)"""
+        stats = {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.batched_items / self.batches if self.batches else 0.0,
+            'p50_ms': None,
+            'p99_ms': None,
+            'throughput_rps': 0.0,
+        }
+        if self.samples:
+            times, latencies = zip(*self.samples)
+            stats['p50_ms'] = float(np.percentile(latencies, 50) * 1000)
+            stats['p99_ms'] = float(np.percentile(latencies, 99) * 1000)
+            span = times[-1] - times[0]
+            stats['throughput_rps'] = len(times) / span if span > 0 else float(len(times))
+        return stats
+
+class MicroBatcher:
+    """Collects concurrent requests into batches for a single predict call"""
+
+    def __init__(self, predict_fn: Callable[[List[str]], List[dict]], max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0, tracker: LatencyTracker = None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.tracker = tracker
+        self.queue = None
+        self.worker = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, texts: List[str]) -> List[dict]:
+        """Queue texts and wait for their predictions"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    async def _collect(self) -> list:
+        """Wait for one request, then gather more until the batch is full or the wait expires"""
+        pending = [await self.queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                # Keep the event loop free while sklearn works on the batch
+                results = await loop.run_in_executor(None, self.predict_fn, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            if self.tracker is not None:
+                self.tracker.record_batch(len(texts))
+            offset = 0
+            for item_texts, future in pending:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+def create_app(results_dir: str = 'results', max_batch_size: int = 64, max_wait_ms: float = 2.0,
+               compact: bool = False, templates: bool = False) -> Starlette:
+    """Build the ASGI app; artifacts are loaded once when the app starts"""
+    tracker = LatencyTracker()
+    state = {}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        model, vectorizer = load_artifacts(results_dir, compact)
+        state['model'] = InferenceModel(model, vectorizer)
+        predict_fn = state['model'].predict_batch
+        if templates:
+            from templates import TemplateCache, TemplateClusters
+            # Texts matching a known template reuse that template's prediction
+            clusters = TemplateClusters.load(os.path.join(results_dir, 'templates.joblib'))
+            predict_fn = TemplateCache(clusters, predict_fn, state['model'].preprocessor).predict_batch
+        state['batcher'] = MicroBatcher(predict_fn, max_batch_size, max_wait_ms, tracker)
+        state['batcher'].start()
+        yield
+        await state['batcher'].stop()
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({'status': 'ok', 'model_loaded': 'model' in state})
+
+    async def predict(request: Request) -> JSONResponse:
+        start = time.perf_counter()
+        try:
+            payload = await request.json()
+        except ValueError:
+            return JSONResponse({'error': 'Request body must be JSON'}, status_code=400)
+        if not isinstance(payload, dict):
+            return JSONResponse({'error': "Expected a JSON object with 'input' or 'inputs'"}, status_code=400)
+
+        batch = isinstance(payload.get('inputs'), list)
+        if batch:
+            texts = [str(text) for text in payload['inputs']]
+        elif 'input' in payload:
+            texts = [str(payload['input'])]
+        else:
+            return JSONResponse({'error': "Expected a JSON object with 'input' or 'inputs'"}, status_code=400)
+
+        results = await state['batcher'].submit(texts) if texts else []
+        tracker.record(time.perf_counter() - start)
+        if batch:
+            return JSONResponse({'predictions': results})
+        return JSONResponse(results[0])
+
+    async def metrics(request: Request) -> JSONResponse:
+        return JSONResponse(tracker.snapshot())
+
+    return Starlette(
+        routes=[
+            Route('/health', health, methods=['GET']),
+            Route('/predict', predict, methods=['POST']),
+            Route('/metrics', metrics, methods=['GET']),
+        ],
+        lifespan=lifespan,
+    )
+
+def run_local_server(results_dir: str = 'results', host: str = '127.0.0.1', port: int = 0, **app_options) -> tuple:
+    """Start the service in a background thread; returns (server, base_url)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    config = uvicorn.Config(create_app(results_dir, **app_options), log_level='warning')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError('Inference server failed to start')
+        time.sleep(0.01)
+    return server, f"http://{host}:{sock.getsockname()[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the incident classifier over HTTP')
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--compact', action='store_true', help='Serve the memory-mapped compact artifacts')
+    parser.add_argument('--templates', action='store_true',
+                        help='Cache predictions per template (needs analysis.py --templates)')
+    args = parser.parse_args()
+
+    app = create_app(args.results_dir, args.max_batch_size, args.max_wait_ms, args.compact, args.templates)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
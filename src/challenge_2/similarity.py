@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import argparse
+import threading
+from typing import Iterable, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from ingest import DEFAULT_INPUT, iter_incident_chunks
+from preprocessing import TextPreprocessor
+
+FORMAT_VERSION = 1
+DEFAULT_DIM = 128
+DEFAULT_INDEX_DIR = 'results/similarity'
+
+class TfidfEncoder:
+    """TF-IDF features (analysis.py's vectorizer) projected to dense, L2-normalised float32 vectors
+
+    Any object with `dim` and `encode(texts) -> (n, dim) float32` can stand in for it, e.g. a local
+    embedding model playing the part of the Voyager /v1/embeddings endpoint.
+    """
+
+    def __init__(self, vectorizer, dim: int = DEFAULT_DIM, seed: int = 42,
+                 preprocessor: Optional[TextPreprocessor] = None, components: Optional[sp.csr_matrix] = None):
+        self.vectorizer = vectorizer
+        self.preprocessor = preprocessor or TextPreprocessor()
+        n_features = _n_features(vectorizer)
+        if components is None and n_features > dim:
+            from sklearn.random_projection import SparseRandomProjection
+            # Only the input width matters for fitting; the seed makes the projection reproducible
+            projection = SparseRandomProjection(n_components=dim, random_state=seed)
+            projection.fit(sp.csr_matrix((1, n_features)))
+            components = sp.csr_matrix(projection.components_.T, dtype=np.float32)
+        # Narrow vocabularies are used as they are
+        self.components = components
+        self.dim = components.shape[1] if components is not None else n_features
+
+    def encode(self, texts) -> np.ndarray:
+        X = self.vectorizer.transform(self.preprocessor.transform(texts))
+        X = X @ self.components if self.components is not None else X
+        vectors = np.asarray(X.toarray() if sp.issparse(X) else X, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def save(self, path: str):
+        if self.components is not None:
+            sp.save_npz(path, self.components.tocsr())
+
+    @classmethod
+    def load(cls, vectorizer, path: str, dim: int) -> 'TfidfEncoder':
+        """Encoder for an index of dim-d vectors: its saved projection, or the raw features when none was needed"""
+        n_features = _n_features(vectorizer)
+        if os.path.exists(path):
+            components = sp.load_npz(path).astype(np.float32)
+        elif dim == n_features:
+            components = None
+        else:
+            raise ValueError(f"{path} is missing; the index holds {dim}-d vectors but the vectorizer "
+                             f"has {n_features} features")
+        if components is not None and components.shape != (n_features, dim):
+            raise ValueError(f"Projection {components.shape} does not map {n_features} features to {dim} dimensions")
+        return cls(vectorizer, dim, components=components)
+
+def _n_features(vectorizer) -> int:
+    if hasattr(vectorizer, 'manifest'):
+        return vectorizer.manifest['n_features']
+    if hasattr(vectorizer, 'vocabulary_'):
+        return len(vectorizer.vocabulary_)
+    return vectorizer.n_features
+
+def load_encoder(results_dir: str = 'results', index_dir: Optional[str] = None, dim: int = DEFAULT_DIM,
+                 compact: bool = False) -> TfidfEncoder:
+    """Encoder over the vectorizer written by analysis.py, reusing an index's saved projection"""
+    from serve import load_artifacts
+    _, vectorizer = load_artifacts(results_dir, compact)
+    manifest_path = os.path.join(index_dir, 'manifest.json') if index_dir else None
+    if manifest_path and os.path.exists(manifest_path):
+        # The index's dimension decides the encoder, so a reload never builds a different projection
+        with open(manifest_path) as f:
+            index_dim = json.load(f)['dim']
+        return TfidfEncoder.load(vectorizer, os.path.join(index_dir, 'projection.npz'), index_dim)
+    return TfidfEncoder(vectorizer, dim)
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 20, seed: int = 42) -> np.ndarray:
+    """Unit-length centroids maximising cosine similarity to their members"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.bincount(assignments, minlength=n_clusters) == 0
+        # Reseed empty clusters from random points rather than letting them die
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+class SimilarityIndex:
+    """Inverted-file (IVF) cosine index over a memory-mapped float32 matrix
+
+    Vectors, incident IDs and cluster assignments live in flat files that grow by doubling, so
+    inserts append in place and readers only page in the clusters a query probes.
+    """
+
+    def __init__(self, index_dir: str, mode: str = 'r'):
+        self.index_dir = index_dir
+        self.mode = mode
+        with open(self._path('manifest.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format {self.manifest['format_version']}")
+        self.dim = self.manifest['dim']
+        self.count = self.manifest['count']
+        self.capacity = self.manifest['capacity']
+        self.centroids = (np.load(self._path('centroids.npy'))
+                          if os.path.exists(self._path('centroids.npy')) else None)
+        self._lock = threading.RLock()
+        self._map()
+        self._build_lists()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _map(self):
+        mode = 'r' if self.mode == 'r' else 'r+'
+        self.vectors = np.memmap(self._path('vectors.f32'), np.float32, mode, shape=(self.capacity, self.dim))
+        self.ids = np.memmap(self._path('ids.i64'), np.int64, mode, shape=(self.capacity,))
+        self.assignments = np.memmap(self._path('lists.i32'), np.int32, mode, shape=(self.capacity,))
+
+    def _build_lists(self):
+        """Row numbers grouped by cluster; later inserts are appended as extra chunks"""
+        self._lists = []
+        if self.centroids is None:
+            return
+        assigned = np.asarray(self.assignments[:self.count])
+        order = np.argsort(assigned, kind='stable').astype(np.int64)
+        bounds = np.searchsorted(assigned[order], np.arange(len(self.centroids) + 1))
+        self._lists = [[order[bounds[c]:bounds[c + 1]]] for c in range(len(self.centroids))]
+
+    @classmethod
+    def create(cls, index_dir: str, dim: int, capacity: int = 1024, **info) -> 'SimilarityIndex':
+        os.makedirs(index_dir, exist_ok=True)
+        for name in ('vectors.f32', 'ids.i64', 'lists.i32', 'centroids.npy', 'projection.npz'):
+            path = os.path.join(index_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        for name, width in (('vectors.f32', 4 * dim), ('ids.i64', 8), ('lists.i32', 4)):
+            with open(os.path.join(index_dir, name), 'wb') as f:
+                f.truncate(capacity * width)
+        manifest = {'format_version': FORMAT_VERSION, 'dim': dim, 'count': 0, 'capacity': capacity, **info}
+        with open(os.path.join(index_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return cls(index_dir, mode='r+')
+
+    def _grow(self, needed: int):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self.flush()
+        del self.vectors, self.ids, self.assignments
+        for name, width in (('vectors.f32', 4 * self.dim), ('ids.i64', 8), ('lists.i32', 4)):
+            os.truncate(self._path(name), capacity * width)
+        self.capacity = capacity
+        self._map()
+
+    def _append(self, vectors: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        start, end = self.count, self.count + len(vectors)
+        if end > self.capacity:
+            self._grow(end)
+        self.vectors[start:end] = vectors
+        self.ids[start:end] = ids
+        self.count = end
+        return np.arange(start, end)
+
+    def _assign(self, rows: np.ndarray, block: int = 65536):
+        """Assign rows to their nearest centroid and add them to the inverted lists"""
+        for offset in range(0, len(rows), block):
+            chunk = rows[offset:offset + block]
+            clusters = np.argmax(np.asarray(self.vectors[chunk[0]:chunk[-1] + 1]) @ self.centroids.T, axis=1)
+            self.assignments[chunk[0]:chunk[-1] + 1] = clusters
+            order = np.argsort(clusters, kind='stable')
+            bounds = np.searchsorted(clusters[order], np.arange(len(self.centroids) + 1))
+            for c in np.flatnonzero(np.diff(bounds)):
+                self._lists[c].append(chunk[order[bounds[c]:bounds[c + 1]]])
+
+    def train(self, n_clusters: Optional[int] = None, sample_size: int = 100000, seed: int = 42):
+        """Cluster a sample of the stored vectors and (re)assign every row"""
+        with self._lock:
+            if self.count == 0:
+                raise ValueError('Add vectors before training the index')
+            # About sqrt(n) lists keeps both the centroid scan and the probed lists short
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(self.count, min(sample_size, self.count), replace=False))
+            # Templated incidents repeat; more clusters than distinct vectors would stay empty
+            sample = np.unique(np.asarray(self.vectors[sample]), axis=0)
+            n_clusters = min(n_clusters or max(1, int(np.sqrt(self.count))), len(sample))
+            self.centroids = spherical_kmeans(sample, n_clusters, seed=seed)
+            np.save(self._path('centroids.npy'), self.centroids)
+            self._lists = [[] for _ in range(n_clusters)]
+            self._assign(np.arange(self.count))
+
+    def add(self, vectors: np.ndarray, ids: Iterable[int]):
+        """Insert new vectors; they are searchable immediately when the index is trained"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = np.asarray(list(ids) if not isinstance(ids, np.ndarray) else ids, dtype=np.int64)
+        if vectors.shape[1:] != (self.dim,) or len(vectors) != len(ids):
+            raise ValueError(f"Expected {len(ids)} vectors of dimension {self.dim}")
+        with self._lock:
+            rows = self._append(vectors, ids)
+            if self.centroids is not None:
+                self._assign(rows)
+
+    def _members(self, cluster: int) -> np.ndarray:
+        chunks = self._lists[cluster]
+        if len(chunks) > 1:
+            # Merge insert chunks on first use so later queries see one array
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0] if chunks else np.empty(0, dtype=np.int64)
+
+    def search(self, queries: np.ndarray, k: int = 10, nprobe: int = 8,
+               exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """(incident IDs, cosine scores) of the k nearest stored vectors for each query, best first"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        with self._lock:
+            if self.centroids is None:
+                exact = True
+            if not exact:
+                # Probe the nearest lists that have members
+                sizes = np.array([sum(len(chunk) for chunk in chunks) for chunks in self._lists])
+                ranked = np.argsort(-(queries @ self.centroids.T), axis=1)
+            for i, query in enumerate(queries):
+                if exact:
+                    rows = np.arange(self.count)
+                else:
+                    probes = ranked[i][sizes[ranked[i]] > 0][:nprobe]
+                    # Sorted rows read the memory map front to back
+                    rows = np.sort(np.concatenate([self._members(c) for c in probes] or [np.empty(0, np.int64)]))
+                if len(rows) == 0:
+                    continue
+                scores = np.asarray(self.vectors[rows]) @ query
+                top = min(k, len(rows))
+                best = np.argpartition(-scores, top - 1)[:top]
+                best = best[np.argsort(-scores[best])]
+                all_ids[i, :top] = self.ids[rows[best]]
+                all_scores[i, :top] = scores[best]
+        return all_ids, all_scores
+
+    def flush(self):
+        """Write buffered vectors and the row count to disk"""
+        if self.mode == 'r':
+            return
+        with self._lock:
+            for array in (self.vectors, self.ids, self.assignments):
+                array.flush()
+            self.manifest.update({'count': self.count, 'capacity': self.capacity,
+                                  'n_clusters': None if self.centroids is None else len(self.centroids)})
+            with open(self._path('manifest.json'), 'w') as f:
+                json.dump(self.manifest, f, indent=2)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+def add_incidents(index: SimilarityIndex, encoder, path: str, chunksize: int = 100000) -> int:
+    """Encode and insert every incident in a CSV, streaming chunk by chunk"""
+    rows = 0
+    for chunk in iter_incident_chunks(path, chunksize=chunksize, usecols=['ID', 'Text']):
+        index.add(encoder.encode(chunk['Text'].astype(str)), chunk['ID'].to_numpy())
+        rows += len(chunk)
+    index.flush()
+    return rows
+
+def build_index(path: str = DEFAULT_INPUT, index_dir: str = DEFAULT_INDEX_DIR, encoder=None,
+                results_dir: str = 'results', n_clusters: Optional[int] = None,
+                chunksize: int = 100000) -> SimilarityIndex:
+    """Encode a CSV into a new index, then cluster it"""
+    encoder = encoder or load_encoder(results_dir, dim=DEFAULT_DIM)
+    index = SimilarityIndex.create(index_dir, encoder.dim, source=os.path.abspath(path))
+    if isinstance(encoder, TfidfEncoder):
+        encoder.save(os.path.join(index_dir, 'projection.npz'))
+    add_incidents(index, encoder, path, chunksize)
+    index.train(n_clusters)
+    index.flush()
+    return index
+
+def benchmark(index: SimilarityIndex, queries: np.ndarray, k: int = 10, nprobe: int = 8) -> dict:
+    """Query latency of the IVF search and its recall against exact search"""
+    latencies, recalls = [], []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k, nprobe)
+        latencies.append((time.perf_counter() - start) * 1000)
+        _, scores = index.search(query, k, nprobe)
+        _, exact_scores = index.search(query, k, exact=True)
+        found = exact_scores[0] > -np.inf
+        if found.any():
+            # Templated incidents tie, so a hit is any result scoring at least the exact k-th score
+            kth = exact_scores[0][found][-1]
+            recalls.append(float(np.sum(scores[0] >= kth - 1e-6)) / found.sum())
+    latencies.sort()
+    return {
+        'rows': len(index),
+        'clusters': len(index.centroids),
+        'queries': len(queries),
+        'k': k,
+        'nprobe': nprobe,
+        'p50_ms': latencies[len(latencies) // 2],
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        f'recall_at_{k}': float(np.mean(recalls)) if recalls else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Similarity search over past incidents')
+    parser.add_argument('command', choices=['build', 'add', 'query', 'benchmark'])
+    parser.add_argument('texts', nargs='*', help="Incident texts for 'query'")
+    parser.add_argument('--input', default=DEFAULT_INPUT, help="CSV for 'build', 'add' and 'benchmark' queries")
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--results-dir', default='results', help='Where analysis.py saved the vectorizer')
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM)
+    parser.add_argument('--clusters', type=int, default=None)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        encoder = load_encoder(args.results_dir, dim=args.dim)
+        start = time.perf_counter()
+        index = build_index(args.input, args.index_dir, encoder, n_clusters=args.clusters, chunksize=args.chunksize)
+        print(f"Indexed {len(index)} incidents into {len(index.centroids)} clusters "
+              f"in {time.perf_counter() - start:.1f}s ({args.index_dir}/)")
+        return
+
+    encoder = load_encoder(args.results_dir, args.index_dir)
+    if args.command == 'add':
+        with SimilarityIndex(args.index_dir, mode='r+') as index:
+            rows = add_incidents(index, encoder, args.input, args.chunksize)
+        print(f"Added {rows} incidents; index now holds {len(index)}")
+        return
+
+    index = SimilarityIndex(args.index_dir)
+    if args.command == 'query':
+        ids, scores = index.search(encoder.encode(args.texts), args.k, args.nprobe)
+        for text, row_ids, row_scores in zip(args.texts, ids, scores):
+            print(f"\n{text}")
+            for incident_id, score in zip(row_ids, row_scores):
+                if incident_id >= 0:
+                    print(f"   ID {incident_id}  similarity {score:.3f}")
+    else:
+        import pandas as pd
+        texts = pd.read_csv(args.input, usecols=['Text'], nrows=args.queries)['Text'].astype(str)
+        results = benchmark(index, encoder.encode(texts), args.k, args.nprobe)
+        for name, value in results.items():
+            print(f"{name}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
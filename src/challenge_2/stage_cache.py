@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import pickle
+import inspect
+import marshal
+import hashlib
+import argparse
+import importlib.util
+from typing import Callable, Iterable, Optional
+import joblib
+
+# Bump when the layout of cached values changes so old entries are never loaded
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = '.stage_cache'
+DEFAULT_MAX_BYTES = 2 * 2 ** 30
+ENTRY_SUFFIX = '.joblib'
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def environment() -> dict:
+    """Library versions that change what a stage produces"""
+    versions = {'python': '.'.join(map(str, sys.version_info[:3]))}
+    for name in ('numpy', 'pandas', 'scipy', 'sklearn'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return versions
+
+def module_digest(name: str) -> str:
+    """Hash of a sibling module's source, so editing a stage's code invalidates its entries"""
+    spec = importlib.util.find_spec(name)
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        return None
+    with open(spec.origin, 'rb') as f:
+        return _digest(f.read())
+
+def code_digest(fn: Callable) -> str:
+    """Hash of a function's source, so editing the code that computes a stage invalidates its entries"""
+    try:
+        return _digest(inspect.getsource(fn).encode())
+    except (OSError, TypeError):
+        # No source available (e.g. defined interactively): fall back to the compiled code and constants
+        return _digest(marshal.dumps(fn.__code__))
+
+class StageCache:
+    """Content-addressed store of stage outputs with least-recently-used eviction by total size"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.environment = environment()
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_written': 0, 'evicted': 0, 'stages': {}}
+        self._file_digests = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, stage: str, params: Optional[dict] = None, upstream: Iterable[str] = (),
+            files: Iterable[str] = (), modules: Iterable[str] = (), code: Iterable[Callable] = ()) -> str:
+        """Hash of everything a stage output depends on"""
+        payload = {
+            'version': CACHE_VERSION,
+            'stage': stage,
+            'environment': self.environment,
+            'params': params or {},
+            'upstream': list(upstream),
+            'files': [self.file_digest(path) for path in files],
+            'modules': {name: module_digest(name) for name in modules},
+            'code': [code_digest(fn) for fn in code],
+        }
+        return _digest(json.dumps(payload, sort_keys=True, default=str).encode())
+
+    def file_digest(self, path: str, chunk_size: int = 2 ** 24) -> str:
+        """Content hash of a file, remembered by (size, mtime) so unchanged inputs are not re-read"""
+        if self._file_digests is None:
+            self._file_digests = self._read_json('files.json')
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        known = self._file_digests.get(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['digest']
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                digest.update(block)
+        self._file_digests[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                    'digest': digest.hexdigest()}
+        self._write_json('files.json', self._file_digests)
+        return self._file_digests[path]['digest']
+
+    def path(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{stage}-{key}{ENTRY_SUFFIX}')
+
+    def get_or_compute(self, stage: str, key: str, compute: Callable):
+        """Load the entry for key, or compute, store and return it"""
+        path = self.path(stage, key)
+        counts = self.stats['stages'].setdefault(stage, {'hits': 0, 'misses': 0, 'seconds': 0.0})
+        start = time.perf_counter()
+        try:
+            value = joblib.load(path)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # Missing, truncated or unreadable entries are simply recomputed
+            value = compute()
+            self.put(path, value)
+            self.stats['misses'] += 1
+            counts['misses'] += 1
+        else:
+            # Refresh the access time used for eviction
+            os.utime(path)
+            self.stats['hits'] += 1
+            counts['hits'] += 1
+        counts['seconds'] += time.perf_counter() - start
+        return value
+
+    def put(self, path: str, value):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+        self.stats['bytes_written'] += os.path.getsize(path)
+        self.evict(keep=path)
+
+    def entries(self) -> list:
+        """(last use, size, path) of every entry, oldest first"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(ENTRY_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.stats['evicted'] += removed
+        return removed
+
+    def usage(self) -> dict:
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes}
+
+    def clear(self) -> int:
+        entries = self.entries()
+        for _, _, path in entries:
+            os.remove(path)
+        return len(entries)
+
+    def _read_json(self, name: str) -> dict:
+        try:
+            with open(os.path.join(self.cache_dir, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, name: str, data: dict):
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or clear the analysis stage cache')
+    parser.add_argument('command', choices=['stats', 'clear'])
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = StageCache(args.cache_dir)
+    if args.command == 'clear':
+        print(f"Removed {cache.clear()} entries from {args.cache_dir}")
+    else:
+        for key, value in cache.usage().items():
+            print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import os
+import io
+import sys
+import json
+import math
+import time
+import argparse
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from ingest import INCIDENT_COLUMNS, TIMESTAMP_FORMAT, peak_rss_mb
+from preprocessing import TextPreprocessor
+
+READ_SIZE = 1 << 20
+
+def iter_line_batches(fd: int, batch_size: int = 10000, follow: bool = False,
+                      poll_interval: float = 0.2) -> Iterator[List[bytes]]:
+    """Complete lines from a file descriptor, in batches of whatever has arrived (at most batch_size)
+
+    A slow feed yields small batches straight away; a fast one fills them. With follow, EOF means
+    "wait for more" as in tail -f, and a truncated file is read again from the start.
+    """
+    pending = b''
+    while True:
+        chunk = os.read(fd, READ_SIZE)
+        if not chunk:
+            if not follow:
+                if pending.strip():
+                    yield [pending]
+                return
+            position = os.lseek(fd, 0, os.SEEK_CUR) if not os.isatty(fd) else 0
+            if os.fstat(fd).st_size < position:
+                os.lseek(fd, 0, os.SEEK_SET)
+                pending = b''
+            time.sleep(poll_interval)
+            continue
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        lines = [line for line in lines if line.strip()]
+        for start in range(0, len(lines), batch_size):
+            yield lines[start:start + batch_size]
+
+class RecordParser:
+    """Parses batches of JSONL or CSV lines into incident frames; the format is detected from the first line"""
+
+    def __init__(self, fmt: str = 'auto'):
+        self.format = None if fmt == 'auto' else fmt
+        self.columns = INCIDENT_COLUMNS
+
+    def parse(self, lines: List[bytes]) -> pd.DataFrame:
+        if self.format is None:
+            self.format = 'jsonl' if lines[0].lstrip().startswith(b'{') else 'csv'
+        if self.format == 'jsonl':
+            frame = pd.DataFrame.from_records([json.loads(line) for line in lines])
+        else:
+            if lines[0].startswith(b'ID,') or lines[0].startswith(b'"ID",'):
+                # Header line: remember its column order for the rest of the feed
+                self.columns = lines[0].decode().strip().replace('"', '').split(',')
+                lines = lines[1:]
+                if not lines:
+                    return pd.DataFrame(columns=self.columns)
+            frame = pd.read_csv(io.BytesIO(b'\n'.join(lines)), names=self.columns, header=None)
+        if 'Timestamp' in frame.columns:
+            timestamps = frame['Timestamp']
+            frame['Timestamp'] = pd.to_datetime(timestamps, format=TIMESTAMP_FORMAT, errors='coerce')
+            missing = frame['Timestamp'].isna() & timestamps.notna()
+            if missing.any():
+                frame.loc[missing, 'Timestamp'] = pd.to_datetime(timestamps[missing], format='ISO8601', errors='coerce')
+        return frame
+
+class StreamClassifier:
+    """Micro-batch classification with the saved vectorizer and model
+
+    Each batch is classified once per distinct text, and results are memoised across batches
+    up to cache_size texts, so templated feeds mostly skip the model.
+    """
+
+    def __init__(self, model, vectorizer, preprocessor: Optional[TextPreprocessor] = None,
+                 cache_size: int = 100000):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.preprocessor = preprocessor or TextPreprocessor()
+        self.cache_size = cache_size
+        self._memo = {}
+
+    def _remember(self, texts: list, labels: np.ndarray, probabilities: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        overflow = len(self._memo) + len(texts) - self.cache_size
+        if overflow > 0:
+            for key in list(islice(iter(self._memo), overflow)):
+                del self._memo[key]
+        self._memo.update(zip(texts[-self.cache_size:], zip(labels[-self.cache_size:],
+                                                            probabilities[-self.cache_size:])))
+
+    def classify(self, texts: pd.Series) -> tuple:
+        """(predicted labels, probability of the predicted label) for a batch of texts"""
+        codes, uniques = pd.factorize(texts.astype(str), use_na_sentinel=False)
+        uniques = list(uniques)
+        labels = np.zeros(len(uniques), dtype=np.int64)
+        probabilities = np.zeros(len(uniques))
+        missing = []
+        for i, text in enumerate(uniques):
+            known = self._memo.get(text)
+            if known is None:
+                missing.append(i)
+            else:
+                labels[i], probabilities[i] = known
+        if missing:
+            fresh = [uniques[i] for i in missing]
+            proba = self.model.predict_proba(self.vectorizer.transform(self.preprocessor.transform(fresh)))
+            best = np.argmax(proba, axis=1)
+            labels[missing] = self.model.classes_[best]
+            probabilities[missing] = proba[np.arange(len(fresh)), best]
+            self._remember(fresh, labels[missing], probabilities[missing])
+        return labels[codes], probabilities[codes]
+
+class SlidingWindowCounter:
+    """Event counts per key over the last `window` seconds, kept in a ring of time buckets
+
+    Adding an event is one increment of its bucket and of a running total; a bucket leaving the
+    window is subtracted from the totals once, so the cost per event is constant and memory is
+    buckets x keys however long the stream runs.
+    """
+
+    def __init__(self, window: float = 60, resolution: float = 1, initial_keys: int = 64):
+        self.window = window
+        self.resolution = resolution
+        self.n_buckets = max(1, math.ceil(window / resolution))
+        self.counts = np.zeros((self.n_buckets, initial_keys), dtype=np.int64)
+        self.totals = np.zeros(initial_keys, dtype=np.int64)
+        self.keys = {}
+        self.head = None
+        self.dropped = 0
+
+    def columns(self, keys: list) -> np.ndarray:
+        """Column of each key, adding new keys as they appear"""
+        for key in keys:
+            if key not in self.keys:
+                self.keys[key] = len(self.keys)
+        if len(self.keys) > len(self.totals):
+            width = max(len(self.keys), 2 * len(self.totals))
+            self.counts = np.pad(self.counts, ((0, 0), (0, width - len(self.totals))))
+            self.totals = np.pad(self.totals, (0, width - len(self.totals)))
+        return np.array([self.keys[key] for key in keys], dtype=np.int64)
+
+    def advance(self, bucket: int):
+        """Move the window's head to a bucket number, expiring buckets that fall out"""
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        if bucket - self.head >= self.n_buckets:
+            self.counts[:] = 0
+            self.totals[:] = 0
+        else:
+            slots = np.arange(self.head + 1, bucket + 1) % self.n_buckets
+            self.totals -= self.counts[slots].sum(axis=0)
+            self.counts[slots] = 0
+        self.head = bucket
+
+    def add(self, times: np.ndarray, keys: list, on_step: Optional[Callable[[float], None]] = None):
+        """Count events at the given times (seconds) under their keys, in time order
+
+        Only events already older than the window when they arrive are dropped as late; events
+        that age out afterwards simply expire. on_step(time) is called after each bucket's events
+        are counted, so rates can be checked at every step of the window.
+        """
+        if not len(keys):
+            return
+        times = np.asarray(times, dtype=np.float64)
+        # Distinct keys first, so the per-event work is array indexing
+        key_codes, distinct = pd.factorize(pd.Series(keys, dtype=object))
+        columns = self.columns(list(distinct))[key_codes]
+        buckets = np.floor(times / self.resolution).astype(np.int64)
+        order = np.argsort(buckets, kind='stable')
+        for group in np.split(order, np.flatnonzero(np.diff(buckets[order])) + 1):
+            bucket = int(buckets[group[0]])
+            if self.head is not None and bucket <= self.head - self.n_buckets:
+                self.dropped += len(group)
+                continue
+            self.advance(bucket)
+            counts = np.bincount(columns[group], minlength=len(self.totals))
+            self.counts[bucket % self.n_buckets] += counts
+            self.totals += counts
+            if on_step is not None:
+                on_step(float(times[group].max()))
+
+    def rates(self) -> Dict[tuple, float]:
+        """Events per second over the window for every key seen"""
+        return {key: float(self.totals[column]) / self.window for key, column in self.keys.items()}
+
+class RateAlerter:
+    """Alerts when a (Vulnerability Type, label) rate goes above its threshold; re-arms once it drops back"""
+
+    def __init__(self, default_rate: Optional[float] = None, rates: Optional[Dict[str, float]] = None,
+                 label: Optional[int] = 1):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self.label = label
+        self.active = set()
+
+    def threshold(self, key: tuple) -> Optional[float]:
+        vulnerability_type, label = key
+        if self.label is not None and label != self.label:
+            return None
+        return self.rates.get(vulnerability_type, self.default_rate)
+
+    def check(self, counter: SlidingWindowCounter, now: float) -> List[dict]:
+        alerts = []
+        for key, rate in counter.rates().items():
+            threshold = self.threshold(key)
+            if threshold is None:
+                continue
+            if rate > threshold and key not in self.active:
+                self.active.add(key)
+                alerts.append({'time': pd.Timestamp(now, unit='s').isoformat(timespec='seconds'), 'vulnerability_type': key[0],
+                               'label': int(key[1]), 'rate_per_second': rate, 'threshold': threshold,
+                               'window_seconds': counter.window})
+            elif rate <= threshold:
+                self.active.discard(key)
+        return alerts
+
+def run_stream(fd: int, classifier: StreamClassifier, counter: SlidingWindowCounter, alerter: RateAlerter,
+               predictions_out=None, alerts_out=sys.stderr, fmt: str = 'auto', batch_size: int = 10000,
+               follow: bool = False, event_time: bool = False, report_every: float = 0) -> dict:
+    """Classify every record from fd, keep the window counters current and write alerts as JSONL"""
+    parser = RecordParser(fmt)
+    stats = {'events': 0, 'batches': 0, 'alerts': 0}
+    start = last_report = time.perf_counter()
+    for lines in iter_line_batches(fd, batch_size, follow):
+        frame = parser.parse(lines)
+        if frame.empty:
+            continue
+        labels, probabilities = classifier.classify(frame['Text'])
+        arrival = time.time()
+        times = np.full(len(frame), arrival)
+        if event_time and 'Timestamp' in frame.columns:
+            # Records without a timestamp count at arrival time
+            # Normalise the unit first: pandas may parse to datetime64[us] rather than [ns]
+            event_times = frame['Timestamp'].to_numpy('datetime64[ns]').view('int64') / 1e9
+            times = np.where(frame['Timestamp'].notna().to_numpy(), event_times, arrival)
+        # read_csv turns the dataset's "None" type into NaN
+        vulnerability = (frame['Vulnerability Type'].fillna('None').astype(str) if 'Vulnerability Type' in frame.columns
+                         else pd.Series(['unknown'] * len(frame)))
+
+        def check(now: float):
+            for alert in alerter.check(counter, now):
+                alerts_out.write(json.dumps(alert) + '\n')
+                stats['alerts'] += 1
+
+        # Thresholds are checked at every step of the window, so a burst is seen whatever the batch size
+        counter.add(times, list(zip(vulnerability, labels.tolist())), on_step=check)
+        alerts_out.flush()
+        if predictions_out is not None:
+            output = pd.DataFrame({'ID': frame['ID'] if 'ID' in frame.columns else None,
+                                   'prediction': labels, 'probability': probabilities})
+            # to_json ends each batch with a newline
+            predictions_out.write(output.to_json(orient='records', lines=True))
+            predictions_out.flush()
+        stats['events'] += len(frame)
+        stats['batches'] += 1
+
+        if report_every and time.perf_counter() - last_report >= report_every:
+            last_report = time.perf_counter()
+            rate = stats['events'] / (last_report - start)
+            print(f"{stats['events']} events, {rate:,.0f} events/s, {stats['alerts']} alerts, "
+                  f"peak RSS {peak_rss_mb():.0f} MB", file=sys.stderr)
+    seconds = time.perf_counter() - start
+    stats.update({'seconds': seconds, 'events_per_second': stats['events'] / seconds if seconds else None,
+                  'late_events_dropped': counter.dropped, 'max_rss_mb': peak_rss_mb()})
+    return stats
+
+def parse_alert_rates(specs: List[str]) -> Dict[str, float]:
+    """['DDoS=5', 'Malware=0.5'] -> {'DDoS': 5.0, 'Malware': 0.5}"""
+    rates = {}
+    for spec in specs:
+        name, _, rate = spec.rpartition('=')
+        if not name:
+            raise ValueError(f"Expected TYPE=RATE, got {spec!r}")
+        rates[name] = float(rate)
+    return rates
+
+def main():
+    from serve import load_artifacts
+    parser = argparse.ArgumentParser(description='Classify a live incident feed and alert on rates')
+    parser.add_argument('source', nargs='?', default='-', help="JSONL or CSV file, or '-' for stdin")
+    parser.add_argument('--format', choices=['auto', 'jsonl', 'csv'], default='auto')
+    parser.add_argument('--follow', action='store_true', help='Keep reading as the file grows (tail -f)')
+    parser.add_argument('--results-dir', default='results', help='Where analysis.py saved the model')
+    parser.add_argument('--compact', action='store_true', help='Use the memory-mapped compact artifacts')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--window', type=float, default=60, help='Sliding window length in seconds')
+    parser.add_argument('--resolution', type=float, default=1, help='Counter bucket width in seconds')
+    parser.add_argument('--event-time', action='store_true',
+                        help='Count events at their Timestamp instead of arrival time')
+    parser.add_argument('--alert-rate', type=float, default=None,
+                        help='Alert when malicious events of any type exceed this many per second')
+    parser.add_argument('--alert', action='append', default=[], metavar='TYPE=RATE',
+                        help='Per Vulnerability Type threshold (events per second)')
+    parser.add_argument('--output', default=None, help="Write predictions as JSONL ('-' for stdout)")
+    parser.add_argument('--report-every', type=float, default=0, help='Print throughput every N seconds')
+    args = parser.parse_args()
+
+    model, vectorizer = load_artifacts(args.results_dir, args.compact)
+    classifier = StreamClassifier(model, vectorizer)
+    counter = SlidingWindowCounter(args.window, args.resolution)
+    alerter = RateAlerter(args.alert_rate, parse_alert_rates(args.alert))
+
+    fd = sys.stdin.fileno() if args.source == '-' else os.open(args.source, os.O_RDONLY)
+    output = None
+    if args.output == '-':
+        output = sys.stdout
+    elif args.output:
+        output = open(args.output, 'w')
+    try:
+        stats = run_stream(fd, classifier, counter, alerter, output, sys.stderr, args.format, args.batch_size,
+                           args.follow, args.event_time, args.report_every)
+    except KeyboardInterrupt:
+        return
+    finally:
+        if output not in (None, sys.stdout):
+            output.close()
+    print(json.dumps(stats), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
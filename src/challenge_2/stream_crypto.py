@@ -0,0 +1,175 @@
+import os
+import struct
+import argparse
+from typing import BinaryIO, Iterator, Optional
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from security import SecurityAnalysis
+
+# File layout:
+#   header: magic | version | chunk size | salt | nonce prefix
+#   frames: AES-256-GCM(chunk) + 16-byte tag, one per plaintext chunk
+# Every frame but the last holds exactly chunk_size bytes, so frame i starts at a
+# fixed offset and any chunk range can be decrypted without reading the rest.
+# The nonce is prefix || frame index and the associated data binds the header,
+# frame index and a final-frame flag, so frames cannot be reordered, dropped or truncated.
+MAGIC = b'ICSE'
+VERSION = 1
+HEADER = struct.Struct('>4sBI16s8s')
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+class StreamHeader:
+    def __init__(self, chunk_size: int, salt: bytes, nonce_prefix: bytes):
+        self.chunk_size = chunk_size
+        self.salt = salt
+        self.nonce_prefix = nonce_prefix
+        self.raw = HEADER.pack(MAGIC, VERSION, chunk_size, salt, nonce_prefix)
+
+    @classmethod
+    def read(cls, src: BinaryIO) -> 'StreamHeader':
+        raw = src.read(HEADER.size)
+        if len(raw) != HEADER.size:
+            raise ValueError("Not an encrypted stream: header is truncated")
+        magic, version, chunk_size, salt, nonce_prefix = HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not an encrypted stream or unsupported version")
+        return cls(chunk_size, salt, nonce_prefix)
+
+    @property
+    def frame_size(self) -> int:
+        return self.chunk_size + TAG_SIZE
+
+    def nonce(self, index: int) -> bytes:
+        return self.nonce_prefix + struct.pack('>I', index)
+
+    def associated_data(self, index: int, final: bool) -> bytes:
+        return self.raw + struct.pack('>I?', index, final)
+
+def _read_exact(src: BinaryIO, size: int) -> bytes:
+    """Read up to size bytes, looping over short reads from pipes and sockets"""
+    parts, remaining = [], size
+    while remaining:
+        part = src.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+def encrypt_stream(src: BinaryIO, dst: BinaryIO, password: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   security: Optional[SecurityAnalysis] = None) -> int:
+    """Encrypt src into dst chunk by chunk; returns the number of plaintext bytes"""
+    security = security or SecurityAnalysis()
+    header = StreamHeader(chunk_size, os.urandom(16), os.urandom(8))
+    aead = AESGCM(bytes(security.derive_key(password, header.salt)))
+    dst.write(header.raw)
+
+    total, index = 0, 0
+    chunk = _read_exact(src, chunk_size)
+    while True:
+        # Look one chunk ahead so the last frame can be flagged as final
+        next_chunk = _read_exact(src, chunk_size) if len(chunk) == chunk_size else b''
+        final = not next_chunk
+        dst.write(aead.encrypt(header.nonce(index), chunk, header.associated_data(index, final)))
+        total += len(chunk)
+        if final:
+            return total
+        chunk, index = next_chunk, index + 1
+
+def iter_decrypt_stream(src: BinaryIO, password: str,
+                        security: Optional[SecurityAnalysis] = None) -> Iterator[bytes]:
+    """Yield authenticated plaintext chunks from an encrypted stream"""
+    security = security or SecurityAnalysis()
+    header = StreamHeader.read(src)
+    aead = AESGCM(bytes(security.derive_key(password, header.salt)))
+
+    index = 0
+    frame = _read_exact(src, header.frame_size)
+    while True:
+        next_frame = _read_exact(src, header.frame_size) if len(frame) == header.frame_size else b''
+        final = not next_frame
+        try:
+            yield aead.decrypt(header.nonce(index), frame, header.associated_data(index, final))
+        except InvalidTag:
+            raise ValueError(f"Frame {index} failed authentication (wrong password or corrupted/truncated data)")
+        if final:
+            return
+        frame, index = next_frame, index + 1
+
+def decrypt_stream(src: BinaryIO, dst: BinaryIO, password: str,
+                   security: Optional[SecurityAnalysis] = None) -> int:
+    """Decrypt src into dst; returns the number of plaintext bytes"""
+    total = 0
+    for chunk in iter_decrypt_stream(src, password, security):
+        dst.write(chunk)
+        total += len(chunk)
+    return total
+
+def decrypt_range(src: BinaryIO, password: str, offset: int, length: int,
+                  security: Optional[SecurityAnalysis] = None) -> bytes:
+    """Decrypt plaintext bytes [offset, offset + length) by seeking to the frames that hold them"""
+    security = security or SecurityAnalysis()
+    src.seek(0)
+    header = StreamHeader.read(src)
+    aead = AESGCM(bytes(security.derive_key(password, header.salt)))
+
+    src.seek(0, os.SEEK_END)
+    body_size = src.tell() - HEADER.size
+    frame_count = max(1, -(-body_size // header.frame_size))
+    first = offset // header.chunk_size
+    last = min((offset + length - 1) // header.chunk_size, frame_count - 1) if length > 0 else first - 1
+
+    parts = []
+    for index in range(first, last + 1):
+        src.seek(HEADER.size + index * header.frame_size)
+        frame = _read_exact(src, header.frame_size)
+        final = index == frame_count - 1
+        try:
+            parts.append(aead.decrypt(header.nonce(index), frame, header.associated_data(index, final)))
+        except InvalidTag:
+            raise ValueError(f"Frame {index} failed authentication (wrong password or corrupted data)")
+    start = offset - first * header.chunk_size
+    return b''.join(parts)[start:start + length]
+
+def encrypt_file(input_path: str, output_path: str, password: str,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Encrypt a file of any size with constant memory"""
+    tmp_path = output_path + '.tmp'
+    with open(input_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        total = encrypt_stream(src, dst, password, chunk_size)
+    os.replace(tmp_path, output_path)
+    return total
+
+def decrypt_file(input_path: str, output_path: str, password: str) -> int:
+    """Decrypt a file written by encrypt_file; the output only appears once every frame authenticated"""
+    tmp_path = output_path + '.tmp'
+    try:
+        with open(input_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            total = decrypt_stream(src, dst, password)
+    except ValueError:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Chunked AES-GCM encryption of large files')
+    parser.add_argument('mode', choices=['encrypt', 'decrypt'])
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--password', default=os.environ.get('INCIDENT_ENCRYPTION_PASSWORD'),
+                        help='Defaults to $INCIDENT_ENCRYPTION_PASSWORD')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    if not args.password:
+        parser.error('a password is required (--password or $INCIDENT_ENCRYPTION_PASSWORD)')
+
+    if args.mode == 'encrypt':
+        total = encrypt_file(args.input, args.output, args.password, args.chunk_size)
+    else:
+        total = decrypt_file(args.input, args.output, args.password)
+    print(f"{args.mode.capitalize()}ed {total} bytes into {args.output}")
+
+if __name__ == "__main__":
+    main()
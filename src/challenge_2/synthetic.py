@@ -0,0 +1,130 @@
+import os
+import re
+import argparse
+from typing import Iterator
+import numpy as np
+import pandas as pd
+from ingest import DEFAULT_INPUT, TIMESTAMP_FORMAT, read_incidents
+
+# IPv4 address with an optional CIDR suffix, as embedded in incident texts
+IP_PATTERN = re.compile(r'\b(\d{1,3}(?:\.\d{1,3}){3})(/\d{1,2})?\b')
+
+def _ip_to_int(ip: str) -> int:
+    a, b, c, d = (int(part) for part in ip.split('.'))
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+def _ints_to_ips(values: np.ndarray) -> pd.Series:
+    """Vectorised uint32 -> dotted quad conversion"""
+    values = values.astype(np.uint32)
+    octets = [pd.Series(((values >> shift) & 0xFF).astype(str)) for shift in (24, 16, 8, 0)]
+    return octets[0].str.cat(octets[1:], sep='.')
+
+class IncidentProfile:
+    """Templates, IP patterns and label/vulnerability mix learned from a real incident file"""
+
+    def __init__(self, templates: list, ip_slots: list, combos: pd.DataFrame,
+                 start: pd.Timestamp, step: pd.Timedelta):
+        self.templates = templates   # list of literal parts around the IP slots
+        self.ip_slots = ip_slots     # per template: list of (ip_int, prefix_len or None)
+        self.combos = combos         # template_id, Label, Vulnerability Type, probability
+        self.start = start
+        self.step = step
+
+    @classmethod
+    def from_csv(cls, path: str = DEFAULT_INPUT) -> 'IncidentProfile':
+        df = read_incidents(path)
+        template_ids = {}
+        templates, ip_slots = [], []
+        row_templates = np.empty(len(df), dtype=np.int64)
+        for text, rows in df.groupby('Text', sort=False).indices.items():
+            parts = IP_PATTERN.split(text)
+            # re.split with two groups yields [literal, ip, cidr, literal, ip, cidr, ..., literal]
+            literals = parts[0::3]
+            slots = [(_ip_to_int(ip), int(cidr[1:]) if cidr else None)
+                     for ip, cidr in zip(parts[1::3], parts[2::3])]
+            key = tuple(literals)
+            if key not in template_ids:
+                template_ids[key] = len(templates)
+                templates.append(literals)
+                ip_slots.append(slots)
+            row_templates[rows] = template_ids[key]
+
+        combos = (pd.DataFrame({'template_id': row_templates, 'Label': df['Label'].to_numpy(),
+                                'Vulnerability Type': df['Vulnerability Type'].astype(object).to_numpy()})
+                  .value_counts(dropna=False).rename('count').reset_index())
+        combos['probability'] = combos['count'] / combos['count'].sum()
+
+        timestamps = df['Timestamp'].sort_values()
+        step = timestamps.diff().median() if len(timestamps) > 1 else pd.Timedelta(minutes=5)
+        return cls(templates, ip_slots, combos, timestamps.iloc[0], step)
+
+    def generate(self, n_rows: int, chunksize: int = 500000, seed: int = 42,
+                 ip_variation: float = 0.5, start_id: int = 1) -> Iterator[pd.DataFrame]:
+        """Yield synthetic incident chunks with the same columns as incidents.csv"""
+        rng = np.random.default_rng(seed)
+        produced = 0
+        while produced < n_rows:
+            size = min(chunksize, n_rows - produced)
+            picks = rng.choice(len(self.combos), size=size, p=self.combos['probability'].to_numpy())
+            combo = self.combos.iloc[picks].reset_index(drop=True)
+            template_ids = combo['template_id'].to_numpy()
+
+            texts = pd.Series(index=range(size), dtype=object)
+            for template_id in np.unique(template_ids):
+                rows = np.flatnonzero(template_ids == template_id)
+                texts.iloc[rows] = self._render(template_id, len(rows), rng, ip_variation).to_numpy()
+
+            ids = np.arange(start_id + produced, start_id + produced + size)
+            timestamps = pd.DatetimeIndex(self.start + self.step * (ids - 1))
+            yield pd.DataFrame({
+                'ID': ids,
+                'Text': texts,
+                'Label': combo['Label'].to_numpy(),
+                'Vulnerability Type': combo['Vulnerability Type'].to_numpy(),
+                'Timestamp': timestamps.strftime(TIMESTAMP_FORMAT),
+            })
+            produced += size
+
+    def _render(self, template_id: int, count: int, rng, ip_variation: float) -> pd.Series:
+        """Build `count` texts for one template, varying host bits of its IPs"""
+        literals = self.templates[template_id]
+        text = pd.Series([literals[0]] * count, dtype=object)
+        for (ip, prefix), literal in zip(self.ip_slots[template_id], literals[1:]):
+            values = np.full(count, ip, dtype=np.int64)
+            if prefix is None:
+                # Keep the observed /24 and randomise the host part for a share of rows
+                vary = rng.random(count) < ip_variation
+                values[vary] = (ip & 0xFFFFFF00) | rng.integers(1, 255, size=int(vary.sum()))
+                suffix = ''
+            else:
+                suffix = f'/{prefix}'
+            text = text + _ints_to_ips(values) + suffix + literal
+        return text
+
+def write_synthetic_csv(path: str, n_rows: int, profile: IncidentProfile = None,
+                        chunksize: int = 500000, seed: int = 42, ip_variation: float = 0.5) -> str:
+    """Stream a synthetic incident CSV to disk without holding it in memory"""
+    profile = profile or IncidentProfile.from_csv()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    for i, chunk in enumerate(profile.generate(n_rows, chunksize, seed, ip_variation)):
+        chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic incidents modelled on incidents.csv')
+    parser.add_argument('output')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='Real incident file to learn templates from')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--ip-variation', type=float, default=0.5,
+                        help='Share of rows whose IP host part is randomised')
+    args = parser.parse_args()
+
+    profile = IncidentProfile.from_csv(args.input)
+    write_synthetic_csv(args.output, args.rows, profile, seed=args.seed, ip_variation=args.ip_variation)
+    print(f"Wrote {args.rows} synthetic incidents to {args.output}")
+
+if __name__ == "__main__":
+    main()
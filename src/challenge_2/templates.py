@@ -0,0 +1,336 @@
+import os
+import time
+import argparse
+from itertools import islice
+from typing import Callable, List, Optional
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from ingest import DEFAULT_INPUT
+from preprocessing import TextPreprocessor
+
+# Words, IPs, CIDRs and paths each stay one token, so a changed address touches one token
+TOKEN_PATTERN = r'[\w.:/-]+'
+# Prime above 2**32; hash coefficients stay below 2**31 so a * x + b fits in uint64
+PRIME = np.uint64(4294967311)
+TEXTS_PER_BLOCK = 4096
+
+class TemplateClusters:
+    """MinHash/LSH clustering of near-duplicate incident texts into templates
+
+    Texts whose estimated Jaccard similarity (over word tokens) reaches `threshold` in any LSH band
+    are linked, and linked texts form one template. New texts are matched against template
+    representatives, so the fitted object doubles as a template lookup for inference.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, threshold: float = 0.6, seed: int = 42):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 31, num_perm, dtype=np.uint64)
+        self.templates = None
+        self.template_ids = None
+        self.representative_rows = None
+
+    def signatures(self, texts: pd.Series) -> np.ndarray:
+        """(n, num_perm) MinHash signatures of distinct texts; token hashes are computed once per token"""
+        texts = pd.Series(texts, dtype=object).reset_index(drop=True)
+        signatures = np.full((len(texts), self.num_perm), PRIME, dtype=np.uint64)
+        tokens = texts.astype(str).str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+        if tokens.empty:
+            return signatures
+        text_index = tokens.index.to_numpy()
+        codes, vocabulary = pd.factorize(tokens)
+        token_hashes = pd.util.hash_array(vocabulary.to_numpy(object)) & np.uint64(0xFFFFFFFF)
+        table = (token_hashes[:, None] * self.a + self.b) % PRIME
+
+        # explode keeps each text's tokens together, so minima reduce over contiguous runs
+        starts = np.flatnonzero(np.diff(text_index, prepend=-1))
+        for block in range(0, len(starts), TEXTS_PER_BLOCK):
+            block_starts = starts[block:block + TEXTS_PER_BLOCK]
+            end = starts[block + TEXTS_PER_BLOCK] if block + TEXTS_PER_BLOCK < len(starts) else len(codes)
+            values = table[codes[block_starts[0]:end]]
+            signatures[text_index[block_starts]] = np.minimum.reduceat(values, block_starts - block_starts[0], axis=0)
+        return signatures
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """(n, bands) hashes of each band of rows"""
+        rows = signatures.reshape(len(signatures), self.bands, -1)
+        keys = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for column in range(rows.shape[2]):
+            # Wrapping uint64 arithmetic is the intended hash mix
+            keys = keys * np.uint64(1000003) ^ rows[:, :, column]
+        return keys
+
+    def _similar(self, signatures: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 other: Optional[np.ndarray] = None) -> np.ndarray:
+        """Estimated Jaccard similarity of row pairs, in blocks to bound memory"""
+        other = signatures if other is None else other
+        similarity = np.empty(len(left))
+        for start in range(0, len(left), 65536):
+            end = start + 65536
+            similarity[start:end] = (signatures[left[start:end]] == other[right[start:end]]).mean(axis=1)
+        return similarity
+
+    def fit(self, texts: pd.Series) -> np.ndarray:
+        """Cluster the texts and return each row's template ID (0 is the most frequent template)"""
+        codes, uniques = pd.factorize(pd.Series(texts).astype(str), use_na_sentinel=False)
+        counts = np.bincount(codes, minlength=len(uniques))
+        signatures = self.signatures(pd.Series(uniques, dtype=object))
+        keys = self.band_keys(signatures)
+
+        # Texts sharing a band key are candidates; neighbours in sorted order are enough to link a bucket
+        left, right = [], []
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind='stable')
+            same = keys[order[1:], band] == keys[order[:-1], band]
+            left.append(order[:-1][same])
+            right.append(order[1:][same])
+        left, right = np.concatenate(left), np.concatenate(right)
+        if len(left):
+            pairs = np.unique(np.stack([left, right], axis=1), axis=0)
+            left, right = pairs[:, 0], pairs[:, 1]
+            keep = self._similar(signatures, left, right) >= self.threshold
+            left, right = left[keep], right[keep]
+        graph = sp.coo_matrix((np.ones(len(left)), (left, right)), shape=(len(uniques), len(uniques)))
+        _, components = connected_components(graph, directed=False)
+
+        # Template IDs by descending row count; the most frequent text represents its template
+        sizes = np.bincount(components, weights=counts)
+        rank = np.empty(len(sizes), dtype=np.int64)
+        rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+        text_templates = rank[components]
+        order = np.lexsort((-counts, text_templates))
+        first = order[np.flatnonzero(np.diff(text_templates[order], prepend=-1))]
+
+        self.templates = pd.DataFrame({
+            'template_id': np.arange(len(first)),
+            'representative': pd.Series(uniques, dtype=object).iloc[first].to_numpy(),
+            'rows': np.bincount(text_templates, weights=counts).astype(np.int64),
+            'variants': np.bincount(text_templates),
+        })
+        self._index_representatives(signatures[first], keys[first])
+        self.template_ids = text_templates[codes]
+        # Position of each representative's first row in the fitted texts
+        self.representative_rows = np.unique(codes, return_index=True)[1][first]
+        return self.template_ids
+
+    def _index_representatives(self, signatures: np.ndarray, keys: np.ndarray):
+        self.representative_signatures = signatures
+        self._band_order = np.argsort(keys, axis=0, kind='stable')
+        self._band_keys = np.take_along_axis(keys, self._band_order, axis=0)
+
+    def assign(self, texts) -> np.ndarray:
+        """Template ID of each text, -1 when it matches no template's representative"""
+        if self.templates is None:
+            raise ValueError('Fit the clusters first')
+        codes, uniques = pd.factorize(pd.Series(list(texts), dtype=object).astype(str), use_na_sentinel=False)
+        signatures = self.signatures(pd.Series(uniques, dtype=object))
+        keys = self.band_keys(signatures)
+        best = np.full(len(uniques), -1, dtype=np.int64)
+        best_similarity = np.full(len(uniques), self.threshold - 1e-9)
+        for band in range(self.bands):
+            position = np.searchsorted(self._band_keys[:, band], keys[:, band])
+            position = np.minimum(position, len(self._band_keys) - 1)
+            found = np.flatnonzero(self._band_keys[position, band] == keys[:, band])
+            if not len(found):
+                continue
+            candidates = self._band_order[position[found], band]
+            similarity = self._similar(signatures, found, candidates, self.representative_signatures)
+            better = similarity > best_similarity[found]
+            best[found[better]] = candidates[better]
+            best_similarity[found[better]] = similarity[better]
+        return best[codes]
+
+    def compression(self) -> dict:
+        rows = int(self.templates['rows'].sum())
+        return {'rows': rows, 'unique_texts': int(self.templates['variants'].sum()),
+                'templates': len(self.templates), 'compression_ratio': rows / max(len(self.templates), 1)}
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        joblib.dump({'params': (self.num_perm, self.bands, self.threshold), 'a': self.a, 'b': self.b,
+                     'templates': self.templates, 'signatures': self.representative_signatures}, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'TemplateClusters':
+        state = joblib.load(path)
+        clusters = cls(*state['params'])
+        clusters.a, clusters.b = state['a'], state['b']
+        clusters.templates = state['templates']
+        signatures = state['signatures']
+        clusters._index_representatives(signatures, clusters.band_keys(signatures))
+        return clusters
+
+def weighted_templates(template_ids: np.ndarray, labels, representatives: pd.Series) -> pd.DataFrame:
+    """One row per (template, label) with its row count, for weighted vectorizing and training"""
+    grouped = (pd.DataFrame({'template_id': template_ids, 'Label': np.asarray(labels)})
+               .groupby(['template_id', 'Label']).size().rename('weight').reset_index())
+    grouped['text'] = representatives.to_numpy()[grouped['template_id'].to_numpy()]
+    return grouped
+
+def fit_weighted_vectorizer(texts: pd.Series, weights: np.ndarray, max_features: Optional[int] = 1000):
+    """TfidfVectorizer whose vocabulary and IDF count each text `weight` times, as if fit on every row"""
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+    counter = CountVectorizer()
+    counts = counter.fit_transform(texts)
+    weights = np.asarray(weights, dtype=np.float64)
+    term_totals = np.asarray(counts.T @ weights).ravel()
+    document_frequency = np.asarray((counts > 0).T @ weights).ravel()
+    keep = np.argsort(-term_totals, kind='stable')[:max_features] if max_features else np.arange(counts.shape[1])
+    keep = np.sort(keep)
+
+    vectorizer = TfidfVectorizer(vocabulary=counter.get_feature_names_out()[keep])
+    vectorizer.fit(texts)
+    # Smoothed IDF as TfidfVectorizer computes it, over weighted document counts
+    vectorizer.idf_ = np.log((1 + weights.sum()) / (1 + document_frequency[keep])) + 1
+    return vectorizer
+
+class TemplateCache:
+    """Memoises predictions per template so repeated near-duplicate texts skip the model
+
+    Entries are keyed by (template, preprocessed text): the model only ever sees the preprocessed
+    text, so a cached answer is exactly what the model would return, whatever order texts arrive in.
+    Variants differing only in digits (IPs, ports) share an entry; "Failed" vs "Successful" do not.
+    At most cache_size entries are kept; the oldest are evicted first.
+    """
+
+    def __init__(self, clusters: TemplateClusters, predict: Callable[[List[str]], list],
+                 preprocessor: Optional[TextPreprocessor] = None, cache_size: int = 100000):
+        self.clusters = clusters
+        self.predict = predict
+        self.preprocessor = preprocessor or TextPreprocessor()
+        self.cache_size = cache_size
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def predict_batch(self, texts: List[str]) -> list:
+        """Predict once per uncached (template, processed text) pair"""
+        texts = list(texts)
+        template_ids = self.clusters.assign(texts)
+        processed = self.preprocessor.transform(texts).tolist()
+        results = [None] * len(texts)
+        # Key -> rows sharing it; texts matching no template are deduplicated but not cached
+        pending = {}
+        for i, template_id in enumerate(template_ids):
+            key = (int(template_id), processed[i])
+            cached = self.cache.get(key) if template_id >= 0 else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(key, []).append(i)
+        self.misses += len(pending)
+        self.hits += len(texts) - len(pending)
+        if pending:
+            keys = list(pending)
+            predictions = self.predict([texts[pending[key][0]] for key in keys])
+            fresh = {}
+            for key, result in zip(keys, predictions):
+                for i in pending[key]:
+                    results[i] = result
+                if key[0] >= 0:
+                    fresh[key] = result
+            self._remember(fresh)
+        return results
+
+    def _remember(self, fresh: dict):
+        if self.cache_size <= 0 or not fresh:
+            return
+        fresh = dict(islice(fresh.items(), max(0, len(fresh) - self.cache_size), None))
+        overflow = len(self.cache) + len(fresh) - self.cache_size
+        if overflow > 0:
+            for key in list(islice(iter(self.cache), overflow)):
+                del self.cache[key]
+        self.cache.update(fresh)
+
+def benchmark(df: pd.DataFrame, test_size: float = 0.2, random_state: int = 42,
+              max_features: int = 1000, clusters: Optional[TemplateClusters] = None) -> dict:
+    """Row-level TF-IDF + LogisticRegression against the template-weighted pipeline, from raw text"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    train, test = train_test_split(df[['Text', 'Label']], test_size=test_size, random_state=random_state)
+    y_test = test['Label'].to_numpy()
+
+    start = time.perf_counter()
+    preprocessor = TextPreprocessor()
+    vectorizer = TfidfVectorizer(max_features=max_features)
+    X_train = vectorizer.fit_transform(preprocessor.transform(train['Text']))
+    model = LogisticRegression(max_iter=1000).fit(X_train, train['Label'])
+    row_train_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    row_pred = model.predict(vectorizer.transform(preprocessor.transform(test['Text'])))
+    row_predict_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clusters = clusters or TemplateClusters()
+    template_ids = clusters.fit(train['Text'])
+    cluster_seconds = time.perf_counter() - start
+    preprocessor = TextPreprocessor()
+    weighted = weighted_templates(template_ids, train['Label'],
+                                  preprocessor.transform(clusters.templates['representative']))
+    template_vectorizer = fit_weighted_vectorizer(weighted['text'], weighted['weight'], max_features)
+    template_model = LogisticRegression(max_iter=1000).fit(
+        template_vectorizer.transform(weighted['text']), weighted['Label'], sample_weight=weighted['weight'])
+    template_train_seconds = time.perf_counter() - start
+
+    def predict(texts):
+        return template_model.predict(template_vectorizer.transform(preprocessor.transform(texts))).tolist()
+
+    cache = TemplateCache(clusters, predict, preprocessor)
+    start = time.perf_counter()
+    template_pred = np.array(cache.predict_batch(test['Text'].tolist()))
+    template_predict_seconds = time.perf_counter() - start
+
+    return {
+        **clusters.compression(),
+        'training_rows_per_template': len(train) / len(weighted),
+        'cluster_seconds': cluster_seconds,
+        'row_train_seconds': row_train_seconds,
+        'template_train_seconds': template_train_seconds,
+        'train_speedup': row_train_seconds / template_train_seconds,
+        'row_predict_seconds': row_predict_seconds,
+        'template_predict_seconds': template_predict_seconds,
+        'predict_speedup': row_predict_seconds / template_predict_seconds,
+        'cache_hit_rate': cache.hits / max(cache.hits + cache.misses, 1),
+        'row_accuracy': float((row_pred == y_test).mean()),
+        'template_accuracy': float((template_pred == y_test).mean()),
+        'prediction_agreement': float((row_pred == template_pred).mean()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Cluster near-duplicate incidents into templates')
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--rows', type=int, default=None, help='Only read the first N rows')
+    parser.add_argument('--threshold', type=float, default=0.6, help='Estimated Jaccard similarity to link texts')
+    parser.add_argument('--output', default='results/templates.joblib', help='Where to save the fitted templates')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare row-level and template-weighted training and inference')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input, usecols=['Text', 'Label'], nrows=args.rows)
+    clusters = TemplateClusters(threshold=args.threshold)
+    if args.benchmark:
+        for name, value in benchmark(df, clusters=clusters).items():
+            print(f"{name}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
+        return
+
+    start = time.perf_counter()
+    clusters.fit(df['Text'])
+    stats = clusters.compression()
+    print(f"{stats['rows']} rows, {stats['unique_texts']} distinct texts -> {stats['templates']} templates "
+          f"(compression {stats['compression_ratio']:.1f}x) in {time.perf_counter() - start:.1f}s")
+    print(clusters.templates.head(20).to_string(index=False))
+    clusters.save(args.output)
+    print(f"\nTemplates saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
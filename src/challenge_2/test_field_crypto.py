@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from field_crypto import FieldEncryptor, encrypt_file, decrypt_file
+
+@pytest.fixture
+def incidents(tmp_path):
+    path = tmp_path / 'incidents.csv'
+    pd.DataFrame({
+        'ID': [1, 2, 3],
+        'Text': ['first', None, 'third'],
+        'Label': [1, 0, 1],
+        'Vulnerability Type': ['DDoS', 'Malware', 'Phishing'],
+        'Timestamp': ['2024-09-21 14:00:00'] * 3,
+        'Score': [0.5, np.nan, 1.25],
+    }).to_csv(path, index=False)
+    return path
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.csv'])
+def test_file_round_trip_keeps_ints_and_nulls(incidents, tmp_path, suffix):
+    encrypted = str(tmp_path / f'encrypted{suffix}')
+    decrypted = str(tmp_path / 'decrypted.csv')
+    columns = ['ID', 'Label', 'Text', 'Score']
+    encrypt_file(str(incidents), encrypted, 'password', columns, workers=1)
+    decrypt_file(encrypted, decrypted, 'password', workers=1)
+    pd.testing.assert_frame_equal(pd.read_csv(decrypted), pd.read_csv(incidents))
+
+def test_frame_round_trip_restores_dtypes():
+    df = pd.DataFrame({'ID': np.array([7, 8], dtype='int64'), 'Label': np.array([1, 0], dtype='int8'),
+                       'Score': [np.nan, 2.5]}, index=[10, 11])
+    with FieldEncryptor('password', columns=['ID', 'Label', 'Score'], workers=1) as encryptor:
+        encrypted = encryptor.encrypt_frame(df)
+        assert encrypted['ID_ciphertext'].notna().all()
+        assert encrypted['Score_iv'].isna().tolist() == [True, False]
+        pd.testing.assert_frame_equal(encryptor.decrypt_frame(encrypted), df)
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.csv'])
+def test_first_chunk_all_null_column(tmp_path, suffix):
+    source = tmp_path / 'incidents.csv'
+    pd.DataFrame({
+        'ID': range(10),
+        'Text': [f'incident {i}' for i in range(10)],
+        'Vulnerability Type': [None] * 4 + ['DDoS', 'Malware'] * 3,
+    }).to_csv(source, index=False)
+    encrypted = str(tmp_path / f'encrypted{suffix}')
+    decrypted = str(tmp_path / 'decrypted.csv')
+    assert encrypt_file(str(source), encrypted, 'password', ['Vulnerability Type'], workers=1, chunksize=4) == 10
+    decrypt_file(encrypted, decrypted, 'password', workers=1, chunksize=4)
+    pd.testing.assert_frame_equal(pd.read_csv(decrypted), pd.read_csv(source))
+
+def test_cipher_helper_leaves_cwd_untouched(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FieldEncryptor('password', workers=1) as encryptor:
+        encryptor.encrypt_frame(pd.DataFrame({'Text': ['a']}))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,58 @@
+import io
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from stream_classifier import RateAlerter, SlidingWindowCounter, run_stream
+
+class PositiveClassifier:
+    def classify(self, texts):
+        return np.ones(len(texts), dtype=np.int64), np.ones(len(texts))
+
+def _write_feed(path, timestamps):
+    pd.DataFrame({'ID': range(1, len(timestamps) + 1), 'Text': 'probe', 'Label': 1, 'Vulnerability Type': 'DDoS',
+                  'Timestamp': pd.DatetimeIndex(timestamps).strftime('%Y-%m-%d %H:%M:%S')}).to_csv(path, index=False)
+
+def _run(path, counter, alerter, batch_size):
+    alerts = io.StringIO()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        stats = run_stream(fd, PositiveClassifier(), counter, alerter, alerts_out=alerts,
+                           batch_size=batch_size, event_time=True)
+    finally:
+        os.close(fd)
+    return stats, [json.loads(line) for line in alerts.getvalue().splitlines()]
+
+def test_event_time_rates(tmp_path):
+    path = tmp_path / 'events.csv'
+    _write_feed(path, pd.date_range('2024-09-21 14:00:00', periods=120, freq='s'))
+    counter = SlidingWindowCounter(window=60)
+    stats, alerts = _run(path, counter, RateAlerter(default_rate=0.5), batch_size=1000)
+
+    # One event per second: the last 60 seconds hold 60 events; events that aged out are not late
+    assert counter.rates() == {('DDoS', 1): 1.0}
+    assert stats['late_events_dropped'] == 0
+    # The 31st event takes the rate over 0.5/s
+    assert len(alerts) == 1
+    assert alerts[0]['rate_per_second'] == pytest.approx(31 / 60)
+    assert alerts[0]['time'] == '2024-09-21T14:00:30'
+
+@pytest.mark.parametrize('batch_size', [50, 10000])
+def test_burst_alerts_do_not_depend_on_batch_size(tmp_path, batch_size):
+    path = tmp_path / 'events.csv'
+    start = pd.Timestamp('2024-09-21 14:00:00')
+    burst = start + pd.to_timedelta(np.arange(1000) // 100, unit='s')
+    trickle = start + pd.to_timedelta(100 + np.arange(100), unit='s')
+    _write_feed(path, burst.append(trickle))
+    stats, alerts = _run(path, SlidingWindowCounter(window=60), RateAlerter(default_rate=5), batch_size)
+
+    assert len(alerts) == 1
+    assert stats['late_events_dropped'] == 0
+
+def test_late_events_are_dropped():
+    counter = SlidingWindowCounter(window=10)
+    counter.add(np.array([100.0]), [('DDoS', 1)])
+    counter.add(np.array([50.0, 95.0]), [('DDoS', 1)] * 2)
+    assert counter.dropped == 1
+    assert counter.rates() == {('DDoS', 1): 0.2}
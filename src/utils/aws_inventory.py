@@ -0,0 +1,130 @@
+import time
+import threading
+import boto3
+from botocore.config import Config
+
+DEFAULT_TTL = 300
+# A lookup miss refetches its kind at most this often (seconds), however many threads miss at once
+MISS_REFETCH_INTERVAL = 1.0
+CLIENT_CONFIG = Config(connect_timeout=5, read_timeout=5, retries={'max_attempts': 2})
+
+# Inventory kind -> (describe operation, result key, id field)
+RESOURCES = {
+    'instances': ('describe_instances', 'Reservations', 'InstanceId'),
+    'security_groups': ('describe_security_groups', 'SecurityGroups', 'GroupId'),
+    'subnets': ('describe_subnets', 'Subnets', 'SubnetId'),
+    'network_acls': ('describe_network_acls', 'NetworkAcls', 'NetworkAclId'),
+}
+
+def _paginate(client, operation, result_key, **kwargs):
+    """All items of a describe call, following pagination when the operation supports it"""
+    if client.can_paginate(operation):
+        pages = client.get_paginator(operation).paginate(**kwargs)
+    else:
+        pages = [getattr(client, operation)(**kwargs)]
+    for page in pages:
+        yield from page.get(result_key, [])
+
+class AwsInventory:
+    """EC2 instances, security groups, subnets and network ACLs fetched in batch and cached with a TTL"""
+
+    def __init__(self, client=None, ttl=DEFAULT_TTL, clock=time.monotonic, miss_interval=MISS_REFETCH_INTERVAL):
+        self.client = client or boto3.client('ec2', config=CLIENT_CONFIG)
+        self.ttl = ttl
+        self.miss_interval = miss_interval
+        self.clock = clock
+        self._indexes = {}
+        self._fetched_at = {}
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def _fetch(self, kind):
+        operation, result_key, id_field = RESOURCES[kind]
+        items = list(_paginate(self.client, operation, result_key))
+        self.refreshes += 1
+        if kind == 'instances':
+            # Instances come grouped by reservation
+            items = [instance for reservation in items for instance in reservation.get('Instances', [])]
+        return {item[id_field]: item for item in items}
+
+    def _index(self, kind):
+        """ID -> description for one resource kind, refetched once the TTL has expired"""
+        with self._lock:
+            fetched_at = self._fetched_at.get(kind)
+            if fetched_at is None or self.clock() - fetched_at > self.ttl:
+                self._indexes[kind] = self._fetch(kind)
+                self._fetched_at[kind] = self.clock()
+            return self._indexes[kind]
+
+    def _get(self, kind, resource_id):
+        """Look up one resource; a miss refetches in case it was just created, unless the kind is already fresh"""
+        item = self._index(kind).get(resource_id)
+        if item is not None:
+            return item
+        with self._lock:
+            # Threads that missed while another refetched find a fresh index and skip the API call
+            fetched_at = self._fetched_at.get(kind)
+            if fetched_at is None or self.clock() - fetched_at >= self.miss_interval:
+                self._indexes[kind] = self._fetch(kind)
+                self._fetched_at[kind] = self.clock()
+            return self._indexes[kind].get(resource_id)
+
+    def invalidate(self, *kinds):
+        """Drop cached kinds (all when none given), e.g. after modifying a security group"""
+        with self._lock:
+            for kind in kinds or list(RESOURCES):
+                self._fetched_at.pop(kind, None)
+                self._indexes.pop(kind, None)
+
+    def instances(self, states=('running',)):
+        instances = self._index('instances').values()
+        if states is None:
+            return list(instances)
+        return [instance for instance in instances if instance.get('State', {}).get('Name') in states]
+
+    def instance(self, instance_id):
+        return self._get('instances', instance_id)
+
+    def security_group(self, group_id):
+        return self._get('security_groups', group_id)
+
+    def security_groups(self, group_ids=None):
+        groups = self._index('security_groups')
+        if group_ids is None:
+            return list(groups.values())
+        return [groups[group_id] for group_id in group_ids if group_id in groups]
+
+    def security_group_by_name(self, group_name):
+        for group in self._index('security_groups').values():
+            if group.get('GroupName') == group_name:
+                return group
+        return None
+
+    def subnet(self, subnet_id):
+        return self._get('subnets', subnet_id)
+
+    def network_acl_for_subnet(self, subnet_id):
+        """The network ACL associated with a subnet, falling back to the VPC default ACL"""
+        acls = self._index('network_acls').values()
+        for acl in acls:
+            if any(association.get('SubnetId') == subnet_id for association in acl.get('Associations', [])):
+                return acl
+        subnet = self.subnet(subnet_id)
+        if subnet is not None:
+            for acl in acls:
+                if acl.get('VpcId') == subnet.get('VpcId') and acl.get('IsDefault'):
+                    return acl
+        return None
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def get_inventory(client=None, ttl=DEFAULT_TTL):
+    """Process-wide inventory shared by the utils scripts; a new one when a client is given"""
+    global _shared
+    if client is not None:
+        return AwsInventory(client, ttl)
+    with _shared_lock:
+        if _shared is None:
+            _shared = AwsInventory(ttl=ttl)
+        return _shared
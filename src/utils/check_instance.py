@@ -2,19 +2,57 @@ import boto3
 from botocore.exceptions import ClientError
 from botocore.config import Config
 import requests
-import socket
 import paramiko
 import os
 from dotenv import load_dotenv
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from aws_inventory import get_inventory
+from port_scanner import check_port, scan_all
 
-def check_port(host, port):
-    """Test if a port is open"""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(2)
-    result = sock.connect_ex((host, port))
-    sock.close()
-    return result == 0
+API_PORT = 8000
+API_SECURITY_GROUP = 'voyager-api-sg'
+
+# Endpoints probed on every instance, by name
+API_ENDPOINTS = {
+    'health': '/health',
+    'api root': '/',
+}
+
+def _time_left(deadline, cap):
+    """Timeout for the next network call: the per-call cap, shortened to what is left of the global deadline"""
+    if deadline is None:
+        return cap
+    return max(0.1, min(cap, deadline - time.monotonic()))
+
+def probe_endpoint(url, timeout=5):
+    """GET one URL and describe the outcome as a dict"""
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=timeout)
+        return {'url': url, 'ok': True, 'status': response.status_code,
+                'body': response.text[:200], 'elapsed_seconds': time.perf_counter() - start}
+    except requests.exceptions.ConnectionError:
+        error = 'Connection refused - API might not be running'
+    except requests.exceptions.Timeout:
+        error = 'Timeout'
+    except Exception as e:
+        error = str(e)
+    return {'url': url, 'ok': False, 'error': error, 'elapsed_seconds': time.perf_counter() - start}
+
+def probe_api(public_ip, public_dns, port=API_PORT, timeout=5, deadline=None, executor=None):
+    """Probe every API endpoint on both the public IP and DNS name, concurrently when given an executor"""
+    urls = []
+    for name, path in API_ENDPOINTS.items():
+        for host in (public_ip, public_dns):
+            if host:
+                urls.append((name, f"http://{host}:{port}{path}"))
+    if executor is None:
+        results = [probe_endpoint(url, _time_left(deadline, timeout)) for _, url in urls]
+    else:
+        futures = [executor.submit(probe_endpoint, url, _time_left(deadline, timeout)) for _, url in urls]
+        results = [future.result() for future in futures]
+    return [dict(result, name=name) for (name, _), result in zip(urls, results)]
 
 def check_and_start_api(instance, key_path):
     """Check API status without SSH"""
@@ -22,77 +60,255 @@ def check_and_start_api(instance, key_path):
         print("\nChecking API accessibility:")
         print(f"Instance Public IP: {instance.public_ip_address}")
         print(f"Instance Public DNS: {instance.public_dns_name}")
-        
-        # Test different endpoints
-        endpoints = {
-            'health': '/health',
-            'api root': '/',
-            # Add other endpoints you want to test
-        }
-        
-        for name, path in endpoints.items():
-            try:
-                # Try both IP and DNS
-                urls = [
-                    f"http://{instance.public_ip_address}:8000{path}",
-                    f"http://{instance.public_dns_name}:8000{path}"
-                ]
-                
-                for url in urls:
-                    print(f"\nTesting {name} endpoint: {url}")
-                    response = requests.get(url, timeout=5)
-                    print(f"✅ {name} endpoint responding:")
-                    print(f"   Status: {response.status_code}")
-                    print(f"   Response: {response.text[:200]}...")  # First 200 chars
-                    
-            except requests.exceptions.ConnectionError as e:
-                print(f"❌ Cannot connect to {url}")
-                print(f"   Error: Connection refused - API might not be running")
-            except requests.exceptions.Timeout:
-                print(f"❌ Timeout connecting to {url}")
-            except Exception as e:
-                print(f"❌ Error testing {url}: {str(e)}")
-        
+
+        for result in probe_api(instance.public_ip_address, instance.public_dns_name):
+            print(f"\nTesting {result['name']} endpoint: {result['url']}")
+            if result['ok']:
+                print(f"✅ {result['name']} endpoint responding:")
+                print(f"   Status: {result['status']}")
+                print(f"   Response: {result['body']}...")  # First 200 chars
+            else:
+                print(f"❌ Cannot reach {result['url']}")
+                print(f"   Error: {result['error']}")
+
         # Test port 8000 directly
-        if check_port(instance.public_ip_address, 8000):
+        if check_port(instance.public_ip_address, API_PORT):
             print("✅ Port 8000 is open")
         else:
             print("❌ Port 8000 is not open")
-        
+
         return True
-        
+
     except Exception as e:
         print(f"❌ Error in check_and_start_api: {str(e)}")
         return False
 
-def fix_security_group(security_group_id: str) -> bool:
-    """Add port 8000 to security group if it's not already open"""
+def fix_security_group(security_group_id: str, client=None, port=API_PORT) -> bool:
+    """Add the API port to security group if it's not already open"""
     try:
-        ec2 = boto3.client('ec2')
-        
-        # Add inbound rule for port 8000
+        # Use the caller's (e.g. the inventory's) client so injected or stubbed clients are honoured
+        ec2 = client or boto3.client('ec2')
+
+        # Add inbound rule for the API port
         response = ec2.authorize_security_group_ingress(
             GroupId=security_group_id,
             IpPermissions=[
                 {
                     'IpProtocol': 'tcp',
-                    'FromPort': 8000,
-                    'ToPort': 8000,
+                    'FromPort': port,
+                    'ToPort': port,
                     'IpRanges': [{'CidrIp': '0.0.0.0/0', 'Description': 'Allow API access'}]
                 }
             ]
         )
-        print(f"✅ Successfully added port 8000 to security group {security_group_id}")
+        print(f"✅ Successfully added port {port} to security group {security_group_id}")
         return True
-        
+
     except Exception as e:
         if 'InvalidPermission.Duplicate' in str(e):
-            print(f"ℹ️ Port 8000 is already configured in security group {security_group_id}")
+            print(f"ℹ️ Port {port} is already configured in security group {security_group_id}")
             return True
         print(f"❌ Error updating security group: {str(e)}")
         return False
 
-def diagnose_instance():
+def port_open_to_world(ip_permissions, port=API_PORT):
+    """Whether any rule opens the port to 0.0.0.0/0"""
+    return any(
+        permission.get('FromPort', 0) <= port <= permission.get('ToPort', 0)
+        and any(ip_range.get('CidrIp') == '0.0.0.0/0' for ip_range in permission.get('IpRanges', []))
+        for permission in ip_permissions
+    )
+
+def security_group_report(inventory, group, port=API_PORT, fix=True):
+    """Inbound rules of one security group and whether the API port is public"""
+    security_group = inventory.security_group(group['GroupId'])
+    if security_group is None:
+        raise ValueError(f"security group {group['GroupId']} not found")
+    permissions = security_group.get('IpPermissions', [])
+    rules = [
+        {'from_port': permission.get('FromPort', 'All'), 'to_port': permission.get('ToPort', 'All'),
+         'protocol': permission.get('IpProtocol', 'All'), 'cidr': ip_range.get('CidrIp', 'N/A')}
+        for permission in permissions
+        for ip_range in permission.get('IpRanges', [])
+    ]
+    report = {'group_id': group['GroupId'], 'group_name': group['GroupName'], 'inbound_rules': rules,
+              'port_open': port_open_to_world(permissions, port), 'fix_attempted': False, 'fixed': False}
+    if not report['port_open'] and fix and group['GroupName'] == API_SECURITY_GROUP:
+        # Only fix the API security group
+        report['fix_attempted'] = True
+        report['fixed'] = fix_security_group(group['GroupId'], inventory.client, port)
+        if report['fixed']:
+            inventory.invalidate('security_groups')
+    return report
+
+def network_acl_report(inventory, subnet_id):
+    network_acl = inventory.network_acl_for_subnet(subnet_id)
+    return {'subnet_id': subnet_id, 'network_acl_id': network_acl['NetworkAclId'] if network_acl else None}
+
+def diagnose_one(instance, inventory, port=API_PORT, fix=True, deadline=None,
+                 port_timeout=2, http_timeout=5, executor=None, port_scan=None):
+    """Run every check for one instance (a describe_instances dict) and return a structured report"""
+    start = time.perf_counter()
+    public_ip = instance.get('PublicIpAddress')
+    public_dns = instance.get('PublicDnsName') or None
+    report = {
+        'instance_id': instance['InstanceId'],
+        'instance_type': instance.get('InstanceType'),
+        'launch_time': str(instance.get('LaunchTime')),
+        'public_ip': public_ip,
+        'public_dns': public_dns,
+        'port': port,
+        'status': 'ok',
+        'security_groups': [],
+        'network_acl': None,
+        'port_open': None,
+        'endpoints': [],
+        'recommendations': [],
+        'errors': [],
+    }
+
+    def step(name, fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            report['errors'].append(f"{name}: {e}")
+            report['status'] = 'error'
+            return None
+
+    # Network probes do not depend on the AWS metadata checks, so start them first
+    network = None
+    if public_ip and executor is not None:
+        network = executor.submit(step, 'connectivity', _connectivity, public_ip, public_dns, port, deadline,
+                                  port_timeout, http_timeout, port_scan)
+
+    for group in instance.get('SecurityGroups', []):
+        group_report = step(f"security group {group['GroupId']}", security_group_report, inventory, group, port, fix)
+        if group_report is not None:
+            report['security_groups'].append(group_report)
+    if instance.get('SubnetId'):
+        report['network_acl'] = step('network acl', network_acl_report, inventory, instance['SubnetId'])
+
+    if public_ip:
+        result = network.result() if network is not None else step(
+            'connectivity', _connectivity, public_ip, public_dns, port, deadline, port_timeout, http_timeout,
+            port_scan)
+        if result is not None:
+            report['port_open'], report['endpoints'] = result
+
+    port_public = any(group['port_open'] for group in report['security_groups'])
+    if not public_ip:
+        report['recommendations'].append("Instance needs a public IP address")
+    if report['security_groups'] and not port_public:
+        report['recommendations'].append(f"Add inbound rule for port {port} in security group")
+    if public_ip and report['port_open'] is False:
+        report['recommendations'].append("Check if API service is running on the instance")
+        report['recommendations'].append("Verify API is listening on 0.0.0.0 and not just localhost")
+    report['elapsed_seconds'] = time.perf_counter() - start
+    return report
+
+def _connectivity(public_ip, public_dns, port, deadline, port_timeout, http_timeout, port_scan=None):
+    if port_scan is not None:
+        # Result of the fleet-wide async scan started by diagnose_instances
+        port_open = port_scan.result().get((public_ip, port), {}).get('open', False)
+    else:
+        port_open = check_port(public_ip, port, _time_left(deadline, port_timeout))
+    return port_open, probe_api(public_ip, public_dns, port, http_timeout, deadline)
+
+def _timed_out_report(instance):
+    return {'instance_id': instance['InstanceId'], 'public_ip': instance.get('PublicIpAddress'),
+            'public_dns': instance.get('PublicDnsName') or None, 'status': 'timeout',
+            'errors': ['Diagnosis did not finish before the deadline'], 'recommendations': []}
+
+def diagnose_instances(instances, inventory, port=API_PORT, fix=True, max_workers=16,
+                       deadline_seconds=60, port_timeout=2, http_timeout=5):
+    """Diagnose instances concurrently; instances not done by the deadline get a 'timeout' report"""
+    instances = list(instances)
+    deadline = time.monotonic() + deadline_seconds
+    # Network probes get their own pool: instance checks block on their probes, so sharing one pool could
+    # leave every worker waiting on probes that never get a thread
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    probe_executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        # One concurrent scan covers the API port of every instance; submitted first so it never waits behind
+        # the per-instance probes that consume it
+        targets = [(instance['PublicIpAddress'], port) for instance in instances if instance.get('PublicIpAddress')]
+        port_scan = probe_executor.submit(scan_all, targets, max_workers * 16,
+                                          _time_left(deadline, port_timeout)) if targets else None
+        futures = [executor.submit(diagnose_one, instance, inventory, port, fix, deadline,
+                                   port_timeout, http_timeout, probe_executor, port_scan)
+                   for instance in instances]
+        wait(futures, timeout=max(0, deadline - time.monotonic()))
+        reports = []
+        for instance, future in zip(instances, futures):
+            if future.done() and not future.cancelled():
+                reports.append(future.result())
+            else:
+                future.cancel()
+                reports.append(_timed_out_report(instance))
+        return reports
+    finally:
+        # Do not block on stragglers past the deadline; their sockets time out on their own
+        executor.shutdown(wait=False, cancel_futures=True)
+        probe_executor.shutdown(wait=False, cancel_futures=True)
+
+def print_report(report):
+    """Print one instance report in the original diagnose_instance layout"""
+    print("\n1. Basic Instance Information:")
+    print(f"   Instance ID: {report['instance_id']}")
+    if report['status'] == 'timeout':
+        print("   ❌ Diagnosis timed out")
+        return
+    print(f"   Instance Type: {report['instance_type']}")
+    print(f"   Launch Time: {report['launch_time']}")
+    print(f"   Public IP: {report['public_ip']}")
+    print(f"   Public DNS: {report['public_dns']}")
+
+    print("\n2. Public IP Configuration:")
+    if report['public_ip']:
+        print(f"   ✅ Public IP is configured: {report['public_ip']}")
+    else:
+        print("   ❌ No public IP assigned")
+
+    print("\n3. Security Group Configuration:")
+    for group in report['security_groups']:
+        print(f"\n   Security Group: {group['group_name']} ({group['group_id']})")
+        print("   Inbound Rules:")
+        for rule in group['inbound_rules']:
+            print(f"   - Port {rule['from_port']}-{rule['to_port']} ({rule['protocol']}) from {rule['cidr']}")
+        if group['port_open']:
+            print(f"   ✅ Port {report['port']} is open in {group['group_name']}")
+        else:
+            print(f"   ❌ Port {report['port']} is not publicly accessible in {group['group_name']}")
+            if group['fix_attempted']:
+                print("   ✅ Security group updated successfully" if group['fixed']
+                      else "   ❌ Failed to update security group")
+
+    print("\n4. Network ACL Configuration:")
+    if report['network_acl']:
+        print(f"   Subnet ID: {report['network_acl']['subnet_id']}")
+        print(f"   Network ACL ID: {report['network_acl']['network_acl_id']}")
+
+    if report['public_ip']:
+        print("\n5. Connectivity Tests:")
+        print(f"   Port {report['port']} accessibility: {'✅ Open' if report['port_open'] else '❌ Closed'}")
+        for endpoint in report['endpoints']:
+            if endpoint['ok']:
+                print(f"   {endpoint['url']}: ✅ Responding (Status: {endpoint['status']})")
+            else:
+                print(f"   {endpoint['url']}: ❌ Not responding ({endpoint['error']})")
+
+    for error in report['errors']:
+        print(f"   ❌ {error}")
+
+    print("\n6. Recommendations:")
+    for recommendation in report['recommendations']:
+        print(f"   - {recommendation}")
+    if not report['recommendations'] and not report['errors']:
+        print("   ✅ No issues found")
+    print(f"\n   Diagnosed in {report['elapsed_seconds']:.2f}s")
+
+def diagnose_instance(inventory=None, port=API_PORT, fix=True, max_workers=16, deadline_seconds=60):
+    """Diagnose every running instance concurrently, print the reports and return them"""
     try:
         # Load environment variables
         load_dotenv()
@@ -100,121 +316,22 @@ def diagnose_instance():
         if not key_path:
             print("❌ Error: EC2_KEY_PATH not set in .env file")
             return
-        
-        # Rest of your existing diagnose_instance code...
-        config = Config(
-            connect_timeout=5,
-            read_timeout=5,
-            retries={'max_attempts': 2}
-        )
-        
-        ec2 = boto3.resource('ec2', config=config)
-        ec2_client = boto3.client('ec2')
-        
-        instances = ec2.instances.filter(
-            Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]
-        )
-        
+
+        # Instances, security groups and ACLs come from a few batched, cached describe calls
+        inventory = inventory or get_inventory()
+        instances = inventory.instances(states=('running',))
+
         print("\nDiagnosing EC2 Instance Configuration:")
         print("-" * 80)
-        
-        found_instances = False
-        for instance in instances:
-            found_instances = True
-            print("\n1. Basic Instance Information:")
-            print(f"   Instance ID: {instance.id}")
-            print(f"   Instance Type: {instance.instance_type}")
-            print(f"   Launch Time: {instance.launch_time}")
-            print(f"   Public IP: {instance.public_ip_address}")
-            print(f"   Public DNS: {instance.public_dns_name}")
-            
-            # Check if instance has public IP
-            print("\n2. Public IP Configuration:")
-            if instance.public_ip_address:
-                print(f"   ✅ Public IP is configured: {instance.public_ip_address}")
-            else:
-                print("   ❌ No public IP assigned")
-            
-            # Check Security Groups
-            print("\n3. Security Group Configuration:")
-            needs_security_fix = False
-            for sg in instance.security_groups:
-                security_group = ec2.SecurityGroup(sg['GroupId'])
-                print(f"\n   Security Group: {sg['GroupName']} ({sg['GroupId']})")
-                
-                # Check inbound rules
-                print("   Inbound Rules:")
-                for permission in security_group.ip_permissions:
-                    from_port = permission.get('FromPort', 'All')
-                    to_port = permission.get('ToPort', 'All')
-                    ip_protocol = permission.get('IpProtocol', 'All')
-                    
-                    for ip_range in permission.get('IpRanges', []):
-                        print(f"   - Port {from_port}-{to_port} ({ip_protocol}) from {ip_range.get('CidrIp', 'N/A')}")
-                
-                # Check specifically for port 8000
-                port_8000_open = any(
-                    permission.get('FromPort', 0) <= 8000 <= permission.get('ToPort', 0)
-                    and any(ip_range.get('CidrIp') == '0.0.0.0/0' for ip_range in permission.get('IpRanges', []))
-                    for permission in security_group.ip_permissions
-                )
-                
-                if not port_8000_open:
-                    print(f"   ❌ Port 8000 is not publicly accessible in {sg['GroupName']}")
-                    if sg['GroupName'] == 'voyager-api-sg':  # Only fix the API security group
-                        needs_security_fix = True
-                        print("   🔧 Attempting to fix security group configuration...")
-                        if fix_security_group(sg['GroupId']):
-                            print("   ✅ Security group updated successfully")
-                        else:
-                            print("   ❌ Failed to update security group")
-                else:
-                    print(f"   ✅ Port 8000 is open in {sg['GroupName']}")
-            
-            # Check Network ACLs
-            print("\n4. Network ACL Configuration:")
-            subnet_id = instance.subnet_id
-            subnet = ec2.Subnet(subnet_id)
-            network_acl_id = ec2_client.describe_network_acls(
-                Filters=[{'Name': 'association.subnet-id', 'Values': [subnet_id]}]
-            )['NetworkAcls'][0]['NetworkAclId']
-            print(f"   Subnet ID: {subnet_id}")
-            print(f"   Network ACL ID: {network_acl_id}")
-            
-            # Test connectivity
-            print("\n5. Connectivity Tests:")
-            if instance.public_ip_address:
-                # Test port 8000
-                port_open = check_port(instance.public_ip_address, 8000)
-                print(f"   Port 8000 accessibility: {'✅ Open' if port_open else '❌ Closed'}")
-                
-                # Test API endpoint
-                try:
-                    health_url = f"http://{instance.public_ip_address}:8000/health"
-                    response = requests.get(health_url, timeout=5)
-                    print(f"   API health endpoint: ✅ Responding (Status: {response.status_code})")
-                except requests.exceptions.RequestException as e:
-                    print(f"   API health endpoint: ❌ Not responding ({str(e)})")
-            
-            # After connectivity tests, add API service check
-            print("\n6. API Service Status:")
-            if instance.public_ip_address:
-                if check_and_start_api(instance, key_path):
-                    print("   ✅ API service check completed")
-                else:
-                    print("   ❌ API service check failed")
-            
-            print("\n7. Recommendations:")
-            if not instance.public_ip_address:
-                print("   - Instance needs a public IP address")
-            if not port_8000_open:
-                print("   - Add inbound rule for port 8000 in security group")
-            if instance.public_ip_address and not port_open:
-                print("   - Check if API service is running on the instance")
-                print("   - Verify API is listening on 0.0.0.0 and not just localhost")
-
-        if not found_instances:
+
+        reports = diagnose_instances(instances, inventory, port=port, fix=fix, max_workers=max_workers,
+                                     deadline_seconds=deadline_seconds)
+        for report in reports:
+            print_report(report)
+
+        if not reports:
             print("No running EC2 instances found.")
+        return reports
 
     except ClientError as e:
         print(f"AWS Error: {e}")
@@ -224,4 +341,4 @@ def diagnose_instance():
 if __name__ == "__main__":
     diagnose_instance()
 
-# Use this after creating your instance with the instance ID returned 
\ No newline at end of file
+# Use this after creating your instance with the instance ID returned
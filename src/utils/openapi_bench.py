@@ -0,0 +1,241 @@
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+from test_public_access import APITester, DEFAULT_SPEC, print_load_report
+
+def load_spec(spec_path: str = DEFAULT_SPEC) -> dict:
+    with open(spec_path) as f:
+        return json.load(f)
+
+def resolve(spec: dict, schema: Optional[dict]) -> dict:
+    """Follow local $ref pointers ('#/components/schemas/...')"""
+    while schema and '$ref' in schema:
+        node = spec
+        for part in schema['$ref'].lstrip('#/').split('/'):
+            node = node[part]
+        # Sibling keys next to a $ref (e.g. an inline example) take precedence
+        schema = {**node, **{k: v for k, v in schema.items() if k != '$ref'}}
+    return schema or {}
+
+def generate_value(spec: dict, schema: Optional[dict], depth: int = 0) -> Any:
+    """A value that satisfies the schema, preferring the spec's own examples"""
+    schema = resolve(spec, schema)
+    if 'example' in schema:
+        return schema['example']
+    if schema.get('examples'):
+        examples = schema['examples']
+        return examples[0] if isinstance(examples, list) else next(iter(examples.values())).get('value')
+    if 'default' in schema:
+        return schema['default']
+    if schema.get('enum'):
+        return schema['enum'][0]
+    for combinator in ('oneOf', 'anyOf', 'allOf'):
+        if schema.get(combinator):
+            return generate_value(spec, schema[combinator][0], depth + 1)
+
+    schema_type = schema.get('type')
+    if schema_type == 'object' or 'properties' in schema:
+        if depth > 8:
+            return {}
+        return {name: generate_value(spec, prop, depth + 1) for name, prop in schema.get('properties', {}).items()}
+    if schema_type == 'array':
+        return [generate_value(spec, schema.get('items'), depth + 1)]
+    if schema_type == 'integer':
+        return 1
+    if schema_type == 'number':
+        return 1.0
+    if schema_type == 'boolean':
+        return False
+    if schema.get('format') == 'binary':
+        return b'{"benchmark": true}'
+    # Strings, and the odd non-standard type in the spec
+    return 'string'
+
+def _media_example(spec: dict, media: dict) -> Any:
+    if 'example' in media:
+        return media['example']
+    if media.get('examples'):
+        return next(iter(media['examples'].values())).get('value')
+    schema = resolve(spec, media.get('schema'))
+    if 'example' in schema:
+        return schema['example']
+    return generate_value(spec, schema) if schema else None
+
+def operations(spec: dict) -> List[dict]:
+    """Every operation in the spec as an APITester route with generated parameters and body"""
+    routes = []
+    for path, path_item in spec.get('paths', {}).items():
+        for method, operation in path_item.items():
+            if method.lower() not in ('get', 'post', 'put', 'patch', 'delete'):
+                continue
+            route = {'path': path, 'method': method.upper(), 'secured': bool(operation.get('security'))}
+            params = {}
+            for parameter in operation.get('parameters', []):
+                if parameter.get('in') == 'query':
+                    # Swagger 2 style parameters carry the type inline instead of a schema
+                    params[parameter['name']] = generate_value(spec, parameter.get('schema', parameter))
+            if params:
+                route['params'] = params
+
+            content = operation.get('requestBody', {}).get('content', {})
+            if 'application/json' in content:
+                route['data'] = _media_example(spec, content['application/json'])
+            elif 'multipart/form-data' in content:
+                fields = generate_value(spec, content['multipart/form-data'].get('schema'))
+                route['files'] = {name: ('benchmark.json', value if isinstance(value, bytes) else str(value).encode(),
+                                         'application/json')
+                                  for name, value in fields.items()}
+            routes.append(route)
+    return routes
+
+def _required_fields(spec: dict, operation: dict) -> List[str]:
+    schema = resolve(spec, operation.get('requestBody', {}).get('content', {})
+                     .get('application/json', {}).get('schema'))
+    return schema.get('required', [])
+
+def _stub_response(spec: dict, operation: dict) -> Tuple[int, str, bytes]:
+    """First 2xx response of an operation, rendered from its examples or schema"""
+    for code, response in sorted(operation.get('responses', {'200': {}}).items()):
+        if not code.startswith('2'):
+            continue
+        for content_type, media in response.get('content', {}).items():
+            body = _media_example(spec, media)
+            if body is None:
+                body = {} if 'json' in content_type else ''
+            if isinstance(body, (dict, list)):
+                return int(code), content_type, json.dumps(body).encode()
+            return int(code), content_type, str(body).encode()
+        return int(code), 'application/json', b'{}'
+    return 200, 'application/json', b'{}'
+
+def make_stub_handler(spec: dict, latency_ms: float = 0):
+    """A request handler answering every operation in the spec with an example response"""
+    routes = {}
+    for path, path_item in spec.get('paths', {}).items():
+        for method, operation in path_item.items():
+            routes[(method.upper(), path)] = (operation, _stub_response(spec, operation),
+                                              _required_fields(spec, operation))
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status: int, content_type: str, body: bytes):
+            # Headers and body in one write, so Nagle's algorithm does not delay small responses
+            head = (f"HTTP/1.1 {status} {self.responses.get(status, ('',))[0]}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n").encode()
+            self.wfile.write(head + body)
+            self.log_request(status)
+
+        def _handle(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw_body = self.rfile.read(length) if length else b''
+            entry = routes.get((self.command, urlsplit(self.path).path))
+            if entry is None:
+                return self._reply(404, 'application/json', b'{"error": "not found"}')
+            operation, (status, content_type, body), required = entry
+            if operation.get('security') and not self.headers.get('Authorization'):
+                return self._reply(401, 'application/json', b'{"error": "unauthorized"}')
+            if required:
+                try:
+                    payload = json.loads(raw_body or b'{}')
+                except ValueError:
+                    return self._reply(400, 'application/json', b'{"error": "invalid JSON"}')
+                missing = [field for field in required if field not in payload]
+                if missing:
+                    return self._reply(422, 'application/json', json.dumps({'missing': missing}).encode())
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            self._reply(status, content_type, body)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def run_stub_server(spec_path: str = DEFAULT_SPEC, host: str = '127.0.0.1', port: int = 0,
+                    latency_ms: float = 0):
+    """Serve the spec's stub in a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), make_stub_handler(load_spec(spec_path), latency_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def benchmark_spec(base_url: str, spec_path: str = DEFAULT_SPEC, duration: float = 10, concurrency: int = 8,
+                   rps: Optional[float] = None, api_key: Optional[str] = None, isolated: bool = False,
+                   report_path: Optional[str] = None) -> dict:
+    """Load-test every operation in the spec; isolated runs each route alone for `duration` seconds"""
+    routes = operations(load_spec(spec_path))
+    tester = APITester(base_url, api_key=api_key, pool_size=concurrency)
+    if not isolated:
+        report = tester.load_test(routes, duration, concurrency, rps)
+    else:
+        report = {'base_url': base_url, 'mode': 'isolated', 'target_rps': rps, 'concurrency': concurrency,
+                  'duration_seconds': 0.0, 'routes': {}}
+        for route in routes:
+            route_report = tester.load_test([route], duration, concurrency, rps)
+            report['routes'].update(route_report['routes'])
+            report['duration_seconds'] += route_report['duration_seconds']
+        report['total'] = {
+            'requests': sum(stats['requests'] for stats in report['routes'].values()),
+            'errors': sum(stats['errors'] for stats in report['routes'].values()),
+        }
+        report['total']['error_rate'] = (report['total']['errors'] / report['total']['requests']
+                                         if report['total']['requests'] else 0.0)
+        report['total']['throughput_rps'] = report['total']['requests'] / report['duration_seconds']
+    report['spec'] = spec_path
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every operation of an OpenAPI spec')
+    parser.add_argument('--spec', default=DEFAULT_SPEC)
+    parser.add_argument('--base-url', default=None, help='Target server (defaults to the first server in the spec)')
+    parser.add_argument('--stub', action='store_true', help='Benchmark a local stub generated from the spec')
+    parser.add_argument('--stub-latency-ms', type=float, default=0)
+    parser.add_argument('--serve', action='store_true', help='Only run the stub server until interrupted')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=None)
+    parser.add_argument('--isolated', action='store_true', help='Benchmark routes one at a time')
+    parser.add_argument('--api-key', default=None)
+    parser.add_argument('--report', default='openapi_benchmark_report.json')
+    args = parser.parse_args()
+
+    if args.serve or args.stub:
+        server, base_url = run_stub_server(args.spec, port=args.port, latency_ms=args.stub_latency_ms)
+        print(f"🧪 Stub server for {args.spec} at {base_url}")
+        if args.serve:
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                server.shutdown()
+                return
+        # The stub accepts any bearer token
+        api_key = args.api_key or 'stub'
+    else:
+        base_url = args.base_url or load_spec(args.spec)['servers'][0]['url']
+        api_key = args.api_key
+
+    report = benchmark_spec(base_url, args.spec, args.duration, args.concurrency, args.rps, api_key,
+                            args.isolated, args.report)
+    if args.isolated:
+        for name, stats in sorted(report['routes'].items()):
+            latency = stats['latency_ms']
+            print(f"   {name:<40} {stats['throughput_rps']:8.1f} rps  p50 {latency['p50']:7.1f}ms  "
+                  f"p99 {latency['p99']:7.1f}ms  errors {stats['error_rate']:.1%}")
+    else:
+        print_load_report(report)
+    print(f"\nReport saved to {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import socket
+import time
+import argparse
+from typing import AsyncIterator, Iterable, List, Optional
+
+DEFAULT_CONCURRENCY = 256
+
+def _parse_status(line: bytes) -> Optional[int]:
+    # b'HTTP/1.1 200 OK\r\n' -> 200
+    parts = line.split()
+    if len(parts) >= 2 and parts[0].startswith(b'HTTP/') and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+async def probe(host: str, port: int, timeout: float = 2, http_path: Optional[str] = None,
+                http_timeout: float = 5) -> dict:
+    """Connect to host:port and, when it is open and http_path is set, send a GET on the same connection"""
+    result = {'host': host, 'port': port, 'open': False, 'error': None, 'connect_seconds': None}
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        result['error'] = 'timeout'
+        return result
+    except OSError as e:
+        result['error'] = e.strerror or str(e)
+        return result
+    result['open'] = True
+    result['connect_seconds'] = time.perf_counter() - start
+
+    try:
+        if http_path is not None:
+            result['http_status'] = None
+            start = time.perf_counter()
+            writer.write(f"GET {http_path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                         f"Connection: close\r\n\r\n".encode())
+            try:
+                await asyncio.wait_for(writer.drain(), http_timeout)
+                status_line = await asyncio.wait_for(reader.readline(), http_timeout)
+                result['http_status'] = _parse_status(status_line)
+                result['http_seconds'] = time.perf_counter() - start
+                if result['http_status'] is None:
+                    result['error'] = 'not an HTTP response'
+            except asyncio.TimeoutError:
+                result['error'] = 'http timeout'
+            except OSError as e:
+                result['error'] = e.strerror or str(e)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+    return result
+
+async def scan(targets: Iterable[tuple], concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 2,
+               http_path: Optional[str] = None, http_timeout: float = 5) -> AsyncIterator[dict]:
+    """Probe (host, port) or (host, port, timeout) targets concurrently, yielding results as they finish"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(target):
+        host, port, target_timeout = (*target, timeout)[:3]
+        async with semaphore:
+            return await probe(host, port, target_timeout, http_path, http_timeout)
+
+    tasks = [asyncio.ensure_future(bounded(target)) for target in targets]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer may stop early; do not leave probes running
+        for task in tasks:
+            task.cancel()
+
+async def _collect(targets, concurrency, timeout, http_path, http_timeout) -> List[dict]:
+    return [result async for result in scan(targets, concurrency, timeout, http_path, http_timeout)]
+
+def scan_all(targets: Iterable[tuple], concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 2,
+             http_path: Optional[str] = None, http_timeout: float = 5) -> dict:
+    """Blocking wrapper for scripts and worker threads: {(host, port): result}"""
+    results = asyncio.run(_collect(list(targets), concurrency, timeout, http_path, http_timeout))
+    return {(result['host'], result['port']): result for result in results}
+
+def check_port(host, port, timeout=2):
+    """Blocking single-target check, the baseline the scanner replaces"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        return sock.connect_ex((host, port)) == 0
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+def _probe_blocking(host, port, timeout=2, http_path=None):
+    """Sequential baseline: check_port followed by a blocking GET, as the old diagnostics did"""
+    if not check_port(host, port, timeout):
+        return False
+    if http_path is not None:
+        with socket.create_connection((host, port), timeout) as sock:
+            sock.sendall(f"GET {http_path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+            sock.recv(1024)
+    return True
+
+async def _start_listeners(count: int, http: bool, latency: float) -> list:
+    async def handle(reader, writer):
+        try:
+            if http:
+                await reader.readline()
+                # Stand-in for network round trip and handler time
+                await asyncio.sleep(latency)
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok')
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return [await asyncio.start_server(handle, '127.0.0.1', 0, backlog=1024) for _ in range(count)]
+
+def _free_ports(count: int) -> List[int]:
+    # Bind and release ephemeral ports to get ports with nothing listening
+    sockets = [socket.socket() for _ in range(count)]
+    for sock in sockets:
+        sock.bind(('127.0.0.1', 0))
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+def benchmark(open_ports: int = 200, closed_ports: int = 200, concurrency: int = DEFAULT_CONCURRENCY,
+              http: bool = True, latency: float = 0.01) -> dict:
+    """Compare the async scanner with sequential probing against localhost listeners"""
+    http_path = '/health' if http else None
+
+    async def run():
+        servers = await _start_listeners(open_ports, http, latency)
+        try:
+            targets = [('127.0.0.1', server.sockets[0].getsockname()[1]) for server in servers]
+            targets += [('127.0.0.1', port) for port in _free_ports(closed_ports)]
+
+            start = time.perf_counter()
+            results = await _collect(targets, concurrency, 2, http_path, 5)
+            scan_seconds = time.perf_counter() - start
+
+            # The blocking baseline runs in a thread so the listeners keep serving
+            start = time.perf_counter()
+            await asyncio.to_thread(lambda: [_probe_blocking(host, port, 2, http_path) for host, port in targets])
+            sequential_seconds = time.perf_counter() - start
+        finally:
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+        return {
+            'targets': len(targets),
+            'open': sum(result['open'] for result in results),
+            'http_ok': sum(result.get('http_status') == 200 for result in results),
+            'scan_seconds': scan_seconds,
+            'sequential_seconds': sequential_seconds,
+            'targets_per_second': len(targets) / scan_seconds,
+            'speedup': sequential_seconds / scan_seconds,
+        }
+    return asyncio.run(run())
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent TCP port and HTTP health scanner')
+    parser.add_argument('targets', nargs='*', help='host:port pairs')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--timeout', type=float, default=2)
+    parser.add_argument('--http-path', default=None, help='Send GET <path> to open ports, e.g. /health')
+    parser.add_argument('--benchmark', action='store_true', help='Benchmark against localhost listeners')
+    parser.add_argument('--latency', type=float, default=0.01, help='Simulated response latency for --benchmark')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        for key, value in benchmark(concurrency=args.concurrency, latency=args.latency).items():
+            print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+        return
+
+    targets = []
+    for target in args.targets:
+        host, _, port = target.rpartition(':')
+        targets.append((host, int(port)))
+
+    async def run():
+        async for result in scan(targets, args.concurrency, args.timeout, args.http_path):
+            status = '✅ open' if result['open'] else f"❌ closed ({result['error']})"
+            if 'http_status' in result:
+                status += f", HTTP {result['http_status']}"
+            print(f"{result['host']}:{result['port']} {status}")
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
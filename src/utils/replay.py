@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+import requests
+from dotenv import load_dotenv
+from test_public_access import APITester, LatencyRecorder, percentile
+
+# A workload line looks like
+#   {"id": "r1", "timestamp": 1727000000.25, "method": "POST", "path": "/predict",
+#    "data": {"input": "..."}, "params": {...}, "headers": {...}}
+# timestamp (epoch seconds or ISO 8601) is only needed to preserve timing; "body" is accepted for "data".
+TIMING_MODES = ('asap', 'preserve')
+
+def _parse_timestamp(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+def iter_workload(path: str, stats: Optional[dict] = None) -> Iterator[dict]:
+    """Stream request records from a JSONL file, skipping blank, malformed and non-request lines"""
+    stats = stats if stats is not None else {}
+    stats.setdefault('skipped', 0)
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                stats['skipped'] += 1
+                continue
+            if not isinstance(record, dict) or 'path' not in record:
+                stats['skipped'] += 1
+                continue
+            record.setdefault('id', line_number)
+            record['line'] = line_number
+            record['method'] = record.get('method', 'GET').upper()
+            if 'data' not in record and 'body' in record:
+                record['data'] = record['body']
+            try:
+                record['timestamp'] = _parse_timestamp(record.get('timestamp'))
+            except ValueError:
+                stats['skipped'] += 1
+                continue
+            yield record
+
+class Replayer:
+    """Replays a JSONL workload against APITester's base URL with bounded concurrency"""
+
+    def __init__(self, tester: APITester, concurrency: int = 16, timing: str = 'asap', speed: float = 1.0,
+                 max_body_chars: int = 2000):
+        if timing not in TIMING_MODES:
+            raise ValueError(f"timing must be one of {TIMING_MODES}")
+        self.tester = tester
+        self.concurrency = concurrency
+        self.timing = timing
+        # speed > 1 compresses the original inter-arrival gaps, e.g. 10 replays an hour in 6 minutes
+        self.speed = speed
+        self.max_body_chars = max_body_chars
+        self.recorder = LatencyRecorder()
+        self._write_lock = threading.Lock()
+
+    def _send(self, record: dict, scheduled: float, output) -> None:
+        started = time.perf_counter()
+        result = {'id': record['id'], 'line': record['line'], 'method': record['method'], 'path': record['path'],
+                  'lag_ms': (started - scheduled) * 1000}
+        name = f"{record['method']} /{record['path'].lstrip('/')}"
+        extra = {key: record[key] for key in ('params', 'headers') if key in record}
+        try:
+            response = self.tester.request(record['path'], record['method'], record.get('data'), **extra)
+            result['elapsed_ms'] = (time.perf_counter() - started) * 1000
+            result['status'] = response.status_code
+            result['response'] = response.text[:self.max_body_chars]
+            self.recorder.record(name, result['elapsed_ms'], status=response.status_code)
+        except requests.exceptions.RequestException as e:
+            result['elapsed_ms'] = (time.perf_counter() - started) * 1000
+            result['error'] = f"{type(e).__name__}: {e}"
+            self.recorder.record(name, result['elapsed_ms'], error=type(e).__name__)
+        line = json.dumps(result) + '\n'
+        with self._write_lock:
+            output.write(line)
+
+    def replay(self, workload_path: str, output_path: str, limit: Optional[int] = None) -> dict:
+        """Send every request in the workload and write one JSONL result per request"""
+        stats = {}
+        # Bounds the records read ahead of the senders, so memory does not grow with the file
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+        first_timestamp = None
+        start = time.perf_counter()
+        sent = 0
+
+        def send(record, scheduled, output):
+            try:
+                self._send(record, scheduled, output)
+            finally:
+                in_flight.release()
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w') as output, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for record in iter_workload(workload_path, stats):
+                if limit is not None and sent >= limit:
+                    break
+                scheduled = time.perf_counter()
+                if self.timing == 'preserve' and record['timestamp'] is not None:
+                    if first_timestamp is None:
+                        first_timestamp = record['timestamp']
+                    scheduled = start + (record['timestamp'] - first_timestamp) / self.speed
+                    time.sleep(max(0.0, scheduled - time.perf_counter()))
+                in_flight.acquire()
+                executor.submit(send, record, scheduled, output)
+                sent += 1
+
+        elapsed = time.perf_counter() - start
+        return {'workload': workload_path, 'output': output_path, 'base_url': self.tester.base_url,
+                'timing': self.timing, 'speed': self.speed, 'concurrency': self.concurrency,
+                'sent': sent, 'skipped_lines': stats['skipped'], 'duration_seconds': elapsed,
+                **self.recorder.report(elapsed)}
+
+def load_latencies(results_path: str) -> dict:
+    """Route -> list of latencies (ms) from a replay results file"""
+    latencies = {}
+    with open(results_path) as f:
+        for line in f:
+            result = json.loads(line)
+            if 'status' in result:
+                name = f"{result['method']} /{result['path'].lstrip('/')}"
+                latencies.setdefault(name, []).append(result['elapsed_ms'])
+    return latencies
+
+def compare_runs(baseline_path: str, candidate_path: str) -> dict:
+    """Per-route latency percentiles of two replay results files side by side"""
+    baseline, candidate = load_latencies(baseline_path), load_latencies(candidate_path)
+    comparison = {}
+    for name in sorted(set(baseline) | set(candidate)):
+        row = {}
+        for label, runs in (('baseline', baseline), ('candidate', candidate)):
+            values = sorted(runs.get(name, []))
+            row[label] = {'requests': len(values), 'p50': percentile(values, 50),
+                          'p95': percentile(values, 95), 'p99': percentile(values, 99)}
+        if row['baseline']['p50'] and row['candidate']['p50']:
+            row['p50_ratio'] = row['candidate']['p50'] / row['baseline']['p50']
+            row['p99_ratio'] = row['candidate']['p99'] / row['baseline']['p99']
+        comparison[name] = row
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a JSONL workload of API requests')
+    parser.add_argument('workload')
+    parser.add_argument('--output', default='replay_results.jsonl')
+    parser.add_argument('--base-url', default=None, help='Defaults to API_ENDPOINT from .env')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--timing', choices=TIMING_MODES, default='asap')
+    parser.add_argument('--speed', type=float, default=1.0, help='With --timing preserve, replay N times faster')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--compare', metavar='BASELINE_RESULTS', help='Compare latencies with an earlier replay')
+    args = parser.parse_args()
+
+    load_dotenv()
+    base_url = args.base_url or os.getenv('API_ENDPOINT')
+    if not base_url:
+        print("❌ Error: pass --base-url or set API_ENDPOINT in .env")
+        return
+
+    tester = APITester(base_url, api_key=os.getenv('API_KEY'), pool_size=args.concurrency)
+    report = Replayer(tester, args.concurrency, args.timing, args.speed).replay(args.workload, args.output,
+                                                                               args.limit)
+    total = report['total']
+    print(f"✅ Replayed {report['sent']} requests in {report['duration_seconds']:.1f}s "
+          f"({report['skipped_lines']} lines skipped), results in {args.output}")
+    if total['requests']:
+        print(f"   p50 {total['latency_ms']['p50']:.1f}ms  p95 {total['latency_ms']['p95']:.1f}ms  "
+              f"p99 {total['latency_ms']['p99']:.1f}ms  errors {total['error_rate']:.1%}")
+    if args.compare:
+        print(json.dumps(compare_runs(args.compare, args.output), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import boto3
 from dotenv import load_dotenv
 import os
+from aws_inventory import get_inventory
+from port_scanner import scan_all
 
 def setup_security_group():
     try:
@@ -70,16 +72,18 @@ def setup_security_group():
         print(f"Error with security group setup: {str(e)}")
         return None
 
-def verify_public_access(security_group_id):
+def verify_public_access(security_group_id, inventory=None, hosts=None):
     try:
-        ec2 = boto3.client('ec2')
-        response = ec2.describe_security_groups(
-            GroupIds=[security_group_id]
-        )
+        # Served from the shared inventory cache instead of another describe_security_groups call
+        inventory = inventory or get_inventory()
+        security_group = inventory.security_group(security_group_id)
+        if security_group is None:
+            print(f"Error verifying public access: security group {security_group_id} not found")
+            return False
         
         # Verify required ports are open
         required_ports = [80, 443, 8000]
-        permissions = response['SecurityGroups'][0]['IpPermissions']
+        permissions = security_group['IpPermissions']
         
         for port in required_ports:
             port_open = False
@@ -93,6 +97,15 @@ def verify_public_access(security_group_id):
                 print(f"Warning: Port {port} is not publicly accessible")
                 return False
         
+        # Optionally confirm the rules from the outside by scanning the given hosts
+        if hosts:
+            results = scan_all([(host, port) for host in hosts for port in required_ports])
+            unreachable = [target for target, result in results.items() if not result['open']]
+            for host, port in sorted(unreachable):
+                print(f"Warning: Port {port} on {host} is not reachable")
+            if unreachable:
+                return False
+        
         print("All required ports are publicly accessible")
         return True
         
@@ -1,22 +1,131 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
-from typing import Dict, Any
+import argparse
+import itertools
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 import os
 from dotenv import load_dotenv
 
+DEFAULT_SPEC = '../../local-swagger.json'
+
+# Routes of the incident classifier API served by src/challenge_2/serve.py
+DEFAULT_ROUTES = [
+    {'path': 'health', 'method': 'GET'},
+    {'path': 'predict', 'method': 'POST', 'data': {'input': 'test message'}},
+]
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+def voyager_routes(spec_path: str = DEFAULT_SPEC) -> List[dict]:
+    """GET routes and JSON POST routes with an example body from the Voyager OpenAPI spec"""
+    with open(spec_path) as f:
+        spec = json.load(f)
+    routes = []
+    for path, operations in spec.get('paths', {}).items():
+        for method, operation in operations.items():
+            if method.lower() == 'get' and not any(p.get('required') for p in operation.get('parameters', [])):
+                routes.append({'path': path, 'method': 'GET'})
+            elif method.lower() == 'post':
+                content = operation.get('requestBody', {}).get('content', {}).get('application/json', {})
+                example = content.get('example', content.get('schema', {}).get('example'))
+                if example is not None:
+                    routes.append({'path': path, 'method': 'POST', 'data': example})
+    return routes
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class LatencyRecorder:
+    """Thread-safe per-route latency, status and error accounting"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, route: str, latency_ms: float, status: Optional[int] = None, error: Optional[str] = None):
+        with self.lock:
+            stats = self.routes.setdefault(route, {'latencies': [], 'statuses': {}, 'errors': {}})
+            stats['latencies'].append(latency_ms)
+            if status is not None:
+                stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            if error is not None:
+                stats['errors'][error] = stats['errors'].get(error, 0) + 1
+
+    @staticmethod
+    def summarize(latencies: List[float], failures: int, seconds: float) -> dict:
+        values = sorted(latencies)
+        histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for value in values:
+            histogram[bisect_left(HISTOGRAM_BUCKETS_MS, value)] += 1
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return {
+            'requests': len(values),
+            'errors': failures,
+            'error_rate': failures / len(values) if values else 0.0,
+            'throughput_rps': len(values) / seconds if seconds > 0 else None,
+            'latency_ms': {
+                'min': values[0] if values else None,
+                'mean': sum(values) / len(values) if values else None,
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': values[-1] if values else None,
+            },
+            'histogram_ms': dict(zip(labels, histogram)),
+        }
+
+    def report(self, seconds: float) -> dict:
+        """Per-route and overall summaries over a run of the given length"""
+        with self.lock:
+            routes = {name: dict(stats) for name, stats in self.routes.items()}
+        summary = {}
+        all_latencies, all_failures = [], 0
+        for name, stats in sorted(routes.items()):
+            failures = sum(stats['errors'].values()) + sum(
+                count for status, count in stats['statuses'].items() if not 200 <= status < 300)
+            summary[name] = self.summarize(stats['latencies'], failures, seconds)
+            summary[name]['statuses'] = {str(status): count for status, count in stats['statuses'].items()}
+            summary[name]['error_types'] = stats['errors']
+            all_latencies += stats['latencies']
+            all_failures += failures
+        return {'total': self.summarize(all_latencies, all_failures, seconds), 'routes': summary}
+
 class APITester:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, api_key: Optional[str] = None, pool_size: int = 32, timeout: float = 10):
         self.base_url = base_url.rstrip('/')
         self.test_results: Dict[str, Any] = {}
+        self.timeout = timeout
+        # One pooled keep-alive session for every request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def url(self, endpoint: str) -> str:
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def request(self, endpoint: str, method: str = 'GET', data: dict = None, **kwargs) -> requests.Response:
+        """Send one request through the pooled session"""
+        kwargs.setdefault('timeout', self.timeout)
+        if method.upper() == 'GET':
+            return self.session.get(self.url(endpoint), **kwargs)
+        return self.session.request(method.upper(), self.url(endpoint), json=data, **kwargs)
 
     def test_endpoint(self, endpoint: str, method: str = 'GET', data: dict = None) -> bool:
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
         try:
-            if method.upper() == 'GET':
-                response = requests.get(url, timeout=10)
-            else:
-                response = requests.post(url, json=data, timeout=10)
+            response = self.request(endpoint, method, data)
             
             self.test_results[endpoint] = {
                 'status_code': response.status_code,
@@ -31,21 +140,19 @@ class APITester:
             }
             return False
 
-    def run_all_tests(self) -> bool:
-        """Run all API tests and return overall success status"""
-        endpoints = [
-            {'path': 'health', 'method': 'GET'},
-            {'path': 'predict', 'method': 'POST', 'data': {'input': 'test message'}}
-        ]
+    def run_all_tests(self, endpoints: Optional[List[dict]] = None) -> bool:
+        """Run all API tests concurrently and return overall success status"""
+        endpoints = endpoints or DEFAULT_ROUTES
+
+        with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+            outcomes = list(executor.map(
+                lambda endpoint: self.test_endpoint(endpoint['path'], endpoint.get('method', 'GET'),
+                                                    endpoint.get('data')),
+                endpoints))
 
         all_successful = True
-        for endpoint in endpoints:
+        for endpoint, success in zip(endpoints, outcomes):
             print(f"\nTesting endpoint: {endpoint['path']}")
-            success = self.test_endpoint(
-                endpoint['path'],
-                endpoint.get('method', 'GET'),
-                endpoint.get('data')
-            )
             if success:
                 print(f"✅ {endpoint['path']} test passed")
             else:
@@ -54,6 +161,68 @@ class APITester:
 
         return all_successful
 
+    def _timed_request(self, recorder: LatencyRecorder, route: dict, scheduled: Optional[float] = None):
+        # Open-loop latency counts from the scheduled send time, so queueing delay is not hidden
+        start = scheduled if scheduled is not None else time.perf_counter()
+        name = f"{route.get('method', 'GET').upper()} /{route['path'].lstrip('/')}"
+        try:
+            extra = {key: route[key] for key in ('params', 'files') if key in route}
+            response = self.request(route['path'], route.get('method', 'GET'), route.get('data'), **extra)
+            response.content  # read the body so the connection goes back to the pool
+            recorder.record(name, (time.perf_counter() - start) * 1000, status=response.status_code)
+        except requests.exceptions.RequestException as e:
+            recorder.record(name, (time.perf_counter() - start) * 1000, error=type(e).__name__)
+
+    def load_test(self, routes: Optional[List[dict]] = None, duration: float = 10, concurrency: int = 8,
+                  rps: Optional[float] = None, report_path: Optional[str] = None) -> dict:
+        """Drive routes round-robin for `duration` seconds.
+
+        With rps set, requests are sent on a fixed schedule (open loop) by up to `concurrency` workers;
+        otherwise `concurrency` workers send back to back (closed loop).
+        """
+        routes = routes or DEFAULT_ROUTES
+        recorder = LatencyRecorder()
+        next_route = itertools.cycle(routes).__next__
+        route_lock = threading.Lock()
+        start = time.perf_counter()
+        deadline = start + duration
+
+        if rps:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for i in itertools.count():
+                    scheduled = start + i / rps
+                    if scheduled >= deadline:
+                        break
+                    time.sleep(max(0.0, scheduled - time.perf_counter()))
+                    executor.submit(self._timed_request, recorder, next_route(), scheduled)
+        else:
+            def worker():
+                while time.perf_counter() < deadline:
+                    with route_lock:
+                        route = next_route()
+                    self._timed_request(recorder, route)
+
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - start
+        report = {
+            'base_url': self.base_url,
+            'mode': 'open_loop' if rps else 'closed_loop',
+            'target_rps': rps,
+            'concurrency': concurrency,
+            'duration_seconds': elapsed,
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **recorder.report(elapsed),
+        }
+        if report_path:
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+        return report
+
     def generate_kaggle_notebook(self) -> str:
         """Generate Kaggle-compatible test code"""
         notebook_code = """
@@ -84,7 +253,28 @@ test_api_endpoint()
         
         return notebook_code
 
+def print_load_report(report: dict):
+    print(f"\nLoad test ({report['mode']}, concurrency {report['concurrency']}"
+          f"{', target ' + str(report['target_rps']) + ' rps' if report['target_rps'] else ''}):")
+    for name, stats in list(report['routes'].items()) + [('TOTAL', report['total'])]:
+        latency = stats['latency_ms']
+        if not stats['requests']:
+            continue
+        print(f"   {name:<40} {stats['requests']:>7} req  {stats['throughput_rps']:8.1f} rps  "
+              f"p50 {latency['p50']:7.1f}ms  p95 {latency['p95']:7.1f}ms  p99 {latency['p99']:7.1f}ms  "
+              f"errors {stats['error_rate']:.1%}")
+
 def main():
+    parser = argparse.ArgumentParser(description='Test public access to the API, optionally under load')
+    parser.add_argument('--load-test', action='store_true', help='Run the load test instead of the smoke tests')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=None, help='Target request rate (open loop)')
+    parser.add_argument('--voyager', action='store_true', help='Also drive the Voyager routes from the spec')
+    parser.add_argument('--spec', default=DEFAULT_SPEC)
+    parser.add_argument('--report', default='load_test_report.json')
+    args = parser.parse_args()
+
     # Load environment variables from .env file
     load_dotenv()
     
@@ -97,7 +287,14 @@ def main():
         return
     
     print(f"Using API endpoint: {API_ENDPOINT}")
-    tester = APITester(API_ENDPOINT)
+    tester = APITester(API_ENDPOINT, api_key=os.getenv('API_KEY'), pool_size=args.concurrency)
+
+    if args.load_test:
+        routes = DEFAULT_ROUTES + (voyager_routes(args.spec) if args.voyager else [])
+        report = tester.load_test(routes, args.duration, args.concurrency, args.rps, args.report)
+        print_load_report(report)
+        print(f"\nReport saved to {args.report}")
+        return
     
     print("\nTesting API public access...")
     success = tester.run_all_tests()